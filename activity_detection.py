@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+"""
+Activity detection for Dino Tamagotchi
+Keeps one osascript process resident and asks it what the user is doing
+(and how long they've been idle), instead of launching a fresh process for
+every sample.
+"""
+
+import json
+import queue
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from collections import namedtuple
+
+# One detection sample: what's frontmost and, for a browser, which tab is active
+ActivityProbe = namedtuple('ActivityProbe', ['app', 'bundle_id', 'browser', 'url', 'title'],
+                           defaults=(None, None, None, None, ""))
+
+# Bundle ids of browsers we know how to read tabs from (firefox has no scripting support)
+BROWSER_BUNDLE_IDS = {
+    'com.google.Chrome': 'chrome',
+    'com.apple.Safari': 'safari',
+    'org.mozilla.firefox': 'firefox'
+}
+
+# Reported while the screen is locked or the user is away; maps to idle like any unknown app
+AWAY_PROBE = ActivityProbe(app='loginwindow', bundle_id='com.apple.loginwindow')
+
+# JXA worker: reads one JSON request per line on stdin, answers one JSON line on stdout
+WORKER_SCRIPT = r'''
+ObjC.import('Foundation');
+ObjC.import('CoreGraphics');
+
+var stdin = $.NSFileHandle.fileHandleWithStandardInput;
+var stdout = $.NSFileHandle.fileHandleWithStandardOutput;
+var BROWSERS = {chrome: 'Google Chrome', safari: 'Safari'};
+var BROWSER_BUNDLE_IDS = %s;
+
+function reply(message) {
+    stdout.writeData($(JSON.stringify(message) + '\n').dataUsingEncoding($.NSUTF8StringEncoding));
+}
+
+function frontmostApp() {
+    var proc = Application('System Events').processes.whose({frontmost: true})[0];
+    return {app: proc.name(), bundle_id: proc.bundleIdentifier()};
+}
+
+function browserTab(browser) {
+    var app = Application(BROWSERS[browser]);
+    if (!app.running() || app.windows.length === 0) {
+        return {url: null, title: null};
+    }
+    var win = app.windows[0];
+    if (browser === 'safari') {
+        return {url: win.currentTab.url(), title: win.currentTab.name()};
+    }
+    return {url: win.activeTab.url(), title: win.activeTab.title()};
+}
+
+function probe() {
+    var front = frontmostApp();
+    var browser = BROWSER_BUNDLE_IDS[front.bundle_id] || null;
+    var tab = (browser && BROWSERS[browser]) ? browserTab(browser) : {url: null, title: null};
+    return {app: front.app, bundle_id: front.bundle_id, browser: browser, url: tab.url, title: tab.title};
+}
+
+function idleSeconds() {
+    // kCGEventSourceStateCombinedSessionState, kCGAnyInputEventType
+    return $.CGEventSourceSecondsSinceLastEventType(0, 0xFFFFFFFF);
+}
+
+function handle(request) {
+    try {
+        if (request.cmd === 'probe') {
+            return {id: request.id, ok: true, result: probe()};
+        }
+        if (request.cmd === 'idle') {
+            return {id: request.id, ok: true, result: idleSeconds()};
+        }
+        return {id: request.id, ok: false, error: 'unknown command: ' + request.cmd};
+    } catch (e) {
+        return {id: request.id, ok: false, error: String(e)};
+    }
+}
+
+var buffer = '';
+while (true) {
+    var data = stdin.availableData;
+    if (data.length === 0) {
+        break;
+    }
+    buffer += $.NSString.alloc.initWithDataEncoding(data, $.NSUTF8StringEncoding).js;
+    var newline;
+    while ((newline = buffer.indexOf('\n')) >= 0) {
+        var line = buffer.slice(0, newline);
+        buffer = buffer.slice(newline + 1);
+        if (line) {
+            reply(handle(JSON.parse(line)));
+        }
+    }
+}
+''' % json.dumps(BROWSER_BUNDLE_IDS)
+
+
+class OsascriptWorker:
+    """Resident osascript process that answers detection requests over a pipe
+
+    command is the worker to launch; anything speaking the same JSON-lines
+    protocol will do (the tests use a small Python script).
+    """
+
+    def __init__(self, timeout=5, command=None):
+        self.timeout = timeout
+        self.command = command or ['osascript', '-l', 'JavaScript', '-e', WORKER_SCRIPT]
+        self.process = None
+        self.responses = None
+        self.next_id = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Launch the worker process and its stdout reader"""
+        self.process = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, bufsize=1
+        )
+        self.responses = queue.Queue()
+        threading.Thread(target=self._read_responses,
+                         args=(self.process, self.responses), daemon=True).start()
+        print("🔍 Detection worker started")
+
+    def _read_responses(self, process, responses):
+        """Forward each JSON line the worker prints to the response queue"""
+        for line in process.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(message, dict):
+                responses.put(message)
+        responses.put(None)  # Worker exited
+
+    def stop(self):
+        """Shut the worker down"""
+        process, self.process = self.process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+            process.wait(timeout=1)
+        except Exception:
+            process.kill()
+
+    def request(self, cmd, **params):
+        """Send one request and wait for its answer, restarting the worker if needed"""
+        with self.lock:
+            try:
+                if self.process is None or self.process.poll() is not None:
+                    self.start()
+
+                self.next_id += 1
+                request_id = self.next_id
+                self.process.stdin.write(json.dumps(dict(params, cmd=cmd, id=request_id)) + '\n')
+                self.process.stdin.flush()
+
+                deadline = time.monotonic() + self.timeout
+                while True:
+                    response = self.responses.get(timeout=max(0, deadline - time.monotonic()))
+                    if response is None:
+                        raise OSError("worker exited")
+                    if response.get('id') == request_id:
+                        break
+            except (OSError, ValueError, queue.Empty) as e:
+                print(f"Detection worker error: {str(e) or 'timed out'}")
+                self.stop()
+                return None
+
+        if not response.get('ok'):
+            print(f"Detection error: {response.get('error')}")
+            return None
+        return response.get('result')
+
+    def probe(self):
+        """Frontmost app, bundle id, browser and active tab in one round trip (None on failure)"""
+        result = self.request('probe')
+        if not result:
+            return None
+        return ActivityProbe(
+            app=result.get('app'),
+            bundle_id=result.get('bundle_id'),
+            browser=result.get('browser'),
+            url=result.get('url') or None,
+            title=result.get('title') or ""
+        )
+
+    def idle_seconds(self):
+        """Seconds since the last keyboard/mouse input, read by the worker (0 if it can't answer)"""
+        result = self.request('idle')
+        return result if isinstance(result, (int, float)) else 0
+
+
+class FakeDetectionBackend:
+    """Scripted stand-in for OsascriptWorker, for running on Linux and in tests"""
+
+    def __init__(self, current=None):
+        self.current = current or ActivityProbe()
+        self.requests = 0
+        self.idle = 0
+
+    def set_frontmost(self, app, bundle_id=None, url=None, title=""):
+        """Pretend the user switched to app (and, for a browser, to url)"""
+        browser = BROWSER_BUNDLE_IDS.get(bundle_id)
+        self.current = ActivityProbe(app, bundle_id, browser, url if browser else None,
+                                     title if browser else "")
+
+    def stop(self):
+        pass
+
+    def probe(self):
+        self.requests += 1
+        return self.current
+
+    def idle_seconds(self):
+        return self.idle
+
+
+def create_detection_backend(timeout=5):
+    """Pick the real osascript worker on macOS and the fake backend elsewhere"""
+    if sys.platform == 'darwin':
+        return OsascriptWorker(timeout=timeout)
+    return FakeDetectionBackend()
+
+
+def _quartz_idle_seconds():
+    import Quartz
+    return Quartz.CGEventSourceSecondsSinceLastEventType(
+        Quartz.kCGEventSourceStateCombinedSessionState, Quartz.kCGAnyInputEventType)
+
+
+def _ioreg_idle_seconds():
+    """HIDIdleTime (nanoseconds) from the IOHIDSystem registry entry, which needs no pyobjc"""
+    try:
+        output = subprocess.run(['ioreg', '-c', 'IOHIDSystem', '-d', '4', '-k', 'HIDIdleTime'],
+                                capture_output=True, text=True, timeout=2).stdout
+    except (OSError, subprocess.SubprocessError):
+        return 0
+    match = re.search(r'"HIDIdleTime" = (\d+)', output)
+    return int(match.group(1)) / 1e9 if match else 0
+
+
+_idle_source = None
+
+
+def user_idle_seconds():
+    """Seconds since the last keyboard/mouse input (Quartz, else ioreg), or 0 when neither is available
+
+    For callers without a detection backend; with one, use its idle_seconds(),
+    which answers from the resident worker instead of starting ioreg each time.
+    """
+    global _idle_source
+    if _idle_source is None:
+        try:
+            import Quartz  # noqa: F401 (pyobjc-framework-Quartz is optional)
+            _idle_source = _quartz_idle_seconds
+        except ImportError:
+            if shutil.which('ioreg'):
+                _idle_source = _ioreg_idle_seconds
+            else:
+                print("⚠️ Idle detection unavailable (no Quartz or ioreg): polling won't pause while you're away")
+                _idle_source = lambda: 0
+    return _idle_source()
+
+
+class AdaptivePollScheduler:
+    """Poll interval that is short right after a change and backs off while nothing changes
+
+    Polling pauses entirely while the screen is locked or the user has been idle
+    for idle_pause seconds (0 disables the idle check).
+    """
+
+    def __init__(self, min_interval=2, max_interval=30, backoff=2.0, idle_pause=300,
+                 idle_seconds=user_idle_seconds):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.idle_pause = idle_pause
+        self.idle_seconds = idle_seconds
+        self.interval = min_interval
+        self.last_key = None
+        self.screen_locked = False
+
+    def configure(self, min_interval=None, max_interval=None, backoff=None, idle_pause=None):
+        """Apply new bounds (None keeps the current value)"""
+        if min_interval is not None:
+            self.min_interval = min_interval
+        if max_interval is not None:
+            self.max_interval = max_interval
+        if backoff is not None:
+            self.backoff = backoff
+        if idle_pause is not None:
+            self.idle_pause = idle_pause
+        self.max_interval = max(self.min_interval, self.max_interval)
+        self.interval = max(self.min_interval, min(self.max_interval, self.interval))
+
+    def record(self, probe):
+        """Reset to the fast interval on a change, otherwise back off"""
+        key = (probe.app, probe.url)
+        if key != self.last_key:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+        self.last_key = key
+
+    def is_paused(self):
+        if self.screen_locked:
+            return True
+        return bool(self.idle_pause) and self.idle_seconds() >= self.idle_pause
+
+
+class ActivitySource:
+    """Delivers detection samples to a callback, polling the backend between pushes
+
+    Anything that knows the user switched apps can call notify() to get a sample
+    taken right away instead of waiting for the next poll. Without a scheduler the
+    backend is polled every interval seconds; with one, the scheduler decides.
+    """
+
+    def __init__(self, backend, interval=30, scheduler=None):
+        self.backend = backend
+        self.interval = interval
+        self.scheduler = scheduler
+        self.events = queue.Queue()
+        self.last_probe = None
+        self.away = False
+        self.running = False
+
+    def wait_time(self):
+        if self.scheduler is None:
+            return self.interval
+        # While away there's nothing to sample, so only wake to recheck presence
+        return self.scheduler.max_interval if self.away else self.scheduler.interval
+
+    def is_paused(self):
+        return self.scheduler is not None and self.scheduler.is_paused()
+
+    def notify(self, probe=None):
+        """Push an activity change; without a probe the backend is asked on wakeup"""
+        self.events.put(probe)
+
+    def next_sample(self):
+        """Block until a push event arrives or the poll interval passes, then return a probe
+
+        A pushed probe equal to the last sample (the app in front activated
+        again) is dropped; polls are always returned, since each one reports
+        time spent.
+        """
+        while True:
+            try:
+                probe = self.events.get(timeout=self.wait_time())
+            except queue.Empty:
+                if not self.is_paused():
+                    self.away = False
+                    return self.backend.probe()  # Regular poll
+                if not self.away:
+                    self.away = True
+                    return AWAY_PROBE
+                continue
+
+            # Coalesce a burst of switches into the latest one
+            while True:
+                try:
+                    probe = self.events.get_nowait()
+                except queue.Empty:
+                    break
+            if probe is None:
+                self.away = False
+                return self.backend.probe()
+            if probe != self.last_probe:
+                self.away = probe is AWAY_PROBE
+                return probe
+
+    def start(self, callback):
+        """Run callback(probe) for every sample on a daemon thread"""
+        self.running = True
+
+        def run():
+            while self.running:
+                try:
+                    probe = self.next_sample()
+                    if probe is not None and self.running:
+                        self.last_probe = probe
+                        if self.scheduler is not None:
+                            self.scheduler.record(probe)
+                        callback(probe)
+                except Exception as e:
+                    print(f"Monitoring error: {e}")
+                    time.sleep(self.wait_time())
+
+        self.notify()  # Take the first sample immediately
+        threading.Thread(target=run, daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        self.notify()
+
+
+class WorkspaceActivitySource(ActivitySource):
+    """ActivitySource fed by NSWorkspace app-activation notifications on macOS
+
+    Polling still runs at the interval to catch tab changes inside a browser.
+    """
+
+    def __init__(self, backend, interval=30, scheduler=None):
+        super().__init__(backend, interval, scheduler)
+        self.observer = None
+        self.lock_observers = []
+
+    def start(self, callback):
+        from AppKit import NSWorkspace, NSWorkspaceDidActivateApplicationNotification
+        from Foundation import NSDistributedNotificationCenter
+
+        def on_activate(notification):
+            app = notification.userInfo()['NSWorkspaceApplicationKey']
+            bundle_id = app.bundleIdentifier()
+            if bundle_id in BROWSER_BUNDLE_IDS:
+                self.notify()  # Need the active tab, so let the worker probe
+            else:
+                self.notify(ActivityProbe(app=app.localizedName(), bundle_id=bundle_id))
+
+        def on_lock(notification):
+            if self.scheduler is not None:
+                self.scheduler.screen_locked = True
+            self.notify(AWAY_PROBE)
+
+        def on_unlock(notification):
+            if self.scheduler is not None:
+                self.scheduler.screen_locked = False
+            self.notify()
+
+        center = NSWorkspace.sharedWorkspace().notificationCenter()
+        self.observer = center.addObserverForName_object_queue_usingBlock_(
+            NSWorkspaceDidActivateApplicationNotification, None, None, on_activate)
+
+        distributed = NSDistributedNotificationCenter.defaultCenter()
+        self.lock_observers = [
+            distributed.addObserverForName_object_queue_usingBlock_(name, None, None, handler)
+            for name, handler in [('com.apple.screenIsLocked', on_lock),
+                                  ('com.apple.screenIsUnlocked', on_unlock)]
+        ]
+        super().start(callback)
+
+    def stop(self):
+        if self.observer is not None:
+            from AppKit import NSWorkspace
+            from Foundation import NSDistributedNotificationCenter
+            NSWorkspace.sharedWorkspace().notificationCenter().removeObserver_(self.observer)
+            for observer in self.lock_observers:
+                NSDistributedNotificationCenter.defaultCenter().removeObserver_(observer)
+            self.observer = None
+            self.lock_observers = []
+        super().stop()
+
+
+class ScriptedActivitySource(ActivitySource):
+    """ActivitySource replaying a scripted list of (delay_seconds, probe) push events, for tests"""
+
+    def __init__(self, backend, script, interval=30, scheduler=None):
+        super().__init__(backend, interval, scheduler)
+        self.script = list(script)
+
+    def start(self, callback):
+        def feed():
+            for delay, probe in self.script:
+                time.sleep(delay)
+                if not self.running:
+                    return
+                self.notify(probe)
+
+        super().start(callback)
+        threading.Thread(target=feed, daemon=True).start()
+
+
+def create_activity_source(backend, interval=30, scheduler=None):
+    """Use workspace notifications when AppKit is available, plain polling otherwise"""
+    if sys.platform == 'darwin':
+        try:
+            import AppKit  # noqa: F401 (ships with rumps via pyobjc)
+            return WorkspaceActivitySource(backend, interval, scheduler)
+        except ImportError:
+            print("⚠️ AppKit not available, falling back to polling")
+    return ActivitySource(backend, interval, scheduler)
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Categorization benchmark for Dino Tamagotchi
+Runs each app variant's website categorization over generated browsing
+corpora and rule sets of growing size, reporting ns/lookup, allocations and
+cache hit rate.
+
+Usage:
+    python3 bench_categorization.py                      # 10k/100k URLs, 10..10,000 rules
+    python3 bench_categorization.py --sizes 1000000      # the big corpus
+    python3 bench_categorization.py --variants supabase_dino --rules 10 10000
+"""
+
+import argparse
+import ast
+import os
+import random
+import time
+import tracemalloc
+from urllib.parse import urlparse
+
+from website_categorizer import CategoryMatcher, CategoryCache
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# The special cases website_tracking_dino / dumpling_currency_dino apply after every category misses
+VARIANT_FALLBACK_RULES = [
+    ('url', ['login', 'auth', 'signin'], 'work'),
+    ('domain', ['gov', 'edu'], 'productive')
+]
+
+VARIANTS = {
+    'supabase_dino': [],
+    'website_tracking_dino': VARIANT_FALLBACK_RULES,
+    'dumpling_currency_dino': VARIANT_FALLBACK_RULES
+}
+
+WORDS = ['home', 'watch', 'feed', 'search', 'docs', 'learn', 'cart', 'news', 'post', 'api',
+         'settings', 'inbox', 'profile', 'video', 'issues', 'pull', 'wiki', 'blog', 'login', 'guide']
+TLDS = ['.com', '.org', '.io', '.net', '.dev', '.co.uk', '.edu', '.gov']
+
+
+def load_variant_categories(variant):
+    """Read a variant's website_categories literal straight from its source file"""
+    with open(os.path.join(HERE, f"{variant}.py")) as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Assign) and len(node.targets) == 1 and
+                isinstance(node.targets[0], ast.Attribute) and
+                node.targets[0].attr == 'website_categories'):
+            return ast.literal_eval(node.value)
+    raise ValueError(f"No website_categories found in {variant}.py")
+
+
+def random_label(rng, length=None):
+    return ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(length or rng.randint(4, 10)))
+
+
+def grow_rules(categories, rule_count, rng):
+    """Copy of categories padded with synthetic domain/keyword rules up to rule_count"""
+    grown = {name: {**config, 'domains': list(config.get('domains', [])),
+                    'keywords': list(config.get('keywords', []))}
+             for name, config in categories.items()}
+    names = list(grown)
+    total = sum(len(c['domains']) + len(c['keywords']) for c in grown.values())
+    while total < rule_count:
+        config = grown[rng.choice(names)]
+        if rng.random() < 0.8:
+            config['domains'].append(random_label(rng) + rng.choice(TLDS))
+        else:
+            config['keywords'].append(random_label(rng, 7))
+        total += 1
+    return grown
+
+
+def generate_corpus(categories, size, rng, domain_pool=2000, pages_per_domain=8, zipf_s=1.1):
+    """(urls, titles) revisiting pages with Zipf-like popularity; about half the domains hit a rule"""
+    rule_domains = [d for c in categories.values() for d in c.get('domains', [])
+                    if '.' in d and not d.endswith('.') and '/' not in d]
+    pool = []
+    for i in range(domain_pool):
+        if rule_domains and i % 2 == 0:
+            domain = rng.choice(rule_domains)
+            if rng.random() < 0.3:
+                domain = random_label(rng, 5) + '.' + domain
+        else:
+            domain = random_label(rng) + rng.choice(TLDS)
+        pool.append(('www.' if rng.random() < 0.4 else '') + domain)
+
+    pages = []
+    for host in pool:
+        for _ in range(pages_per_domain):
+            path = '/'.join(rng.choice(WORDS) for _ in range(rng.randint(0, 3)))
+            title = ' '.join(rng.choice(WORDS).title() for _ in range(rng.randint(1, 5)))
+            pages.append((f"https://{host}/{path}", title))
+
+    weights = [1.0 / (rank + 1) ** zipf_s for rank in range(len(pages))]
+    visits = rng.choices(pages, weights=weights, k=size)
+    return [url for url, _ in visits], [title for _, title in visits]
+
+
+def legacy_categorize(categories, fallback_rules, url, title=""):
+    """The nested-loop categorize_website every variant used before the compiled matcher"""
+    if not url:
+        return 'other'
+    domain = urlparse(url.lower()).netloc.replace('www.', '')
+    full_url = (url + " " + title).lower()
+    for category, config in categories.items():
+        for domain_pattern in config['domains']:
+            if domain_pattern in domain:
+                return category
+        for keyword in config.get('keywords', []):
+            if keyword in full_url:
+                return category
+    for field, terms, category in fallback_rules:
+        haystack = domain if field == 'domain' else full_url
+        if any(term in haystack for term in terms):
+            return category
+    return 'other'
+
+
+def time_lookups(lookup, urls, titles):
+    start = time.perf_counter_ns()
+    for url, title in zip(urls, titles):
+        lookup(url, title)
+    return (time.perf_counter_ns() - start) / max(1, len(urls))
+
+
+def measure_allocations(lookup, urls, titles):
+    """(peak KiB, allocated blocks per lookup) while running lookup over urls"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for url, title in zip(urls, titles):
+        lookup(url, title)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sum(max(0, stat.count_diff) for stat in after.compare_to(before, 'filename'))
+    return peak / 1024, blocks / max(1, len(urls))
+
+
+def run_case(variant, rule_count, size, rng, legacy_sample, alloc_sample):
+    fallback_rules = VARIANTS[variant]
+    categories = grow_rules(load_variant_categories(variant), rule_count, rng)
+    urls, titles = generate_corpus(categories, size, rng)
+
+    build_start = time.perf_counter()
+    matcher = CategoryMatcher(categories, fallback_rules=fallback_rules)
+    build_ms = (time.perf_counter() - build_start) * 1000
+
+    cache = CategoryCache(maxsize=1024, ttl=3600)
+
+    def cached(url, title):
+        return cache.categorize(matcher, url, title, version=1)
+
+    def legacy(url, title):
+        return legacy_categorize(categories, fallback_rules, url, title)
+
+    rows = []
+    ns = time_lookups(matcher.match, urls, titles)
+    peak, blocks = measure_allocations(matcher.match, urls[:alloc_sample], titles[:alloc_sample])
+    rows.append(('compiled', ns, peak, blocks, None))
+
+    ns = time_lookups(cached, urls, titles)
+    hit_rate = cache.stats()['hit_rate']
+    peak, blocks = measure_allocations(cached, urls[:alloc_sample], titles[:alloc_sample])
+    rows.append(('cached', ns, peak, blocks, hit_rate))
+
+    start = time.perf_counter_ns()
+    matcher.match_many(urls, titles)
+    rows.append(('batch', (time.perf_counter_ns() - start) / size, None, None, None))
+
+    sample = min(size, legacy_sample)
+    ns = time_lookups(legacy, urls[:sample], titles[:sample])
+    peak, blocks = measure_allocations(legacy, urls[:alloc_sample], titles[:alloc_sample])
+    rows.append(('legacy', ns, peak, blocks, None))
+
+    # The compiled matcher must agree with the loops it replaced
+    mismatches = sum(matcher.match(u, t) != legacy(u, t)
+                     for u, t in zip(urls[:alloc_sample], titles[:alloc_sample]))
+    return build_ms, rows, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark website categorization")
+    parser.add_argument('--variants', nargs='+', default=list(VARIANTS), choices=list(VARIANTS))
+    parser.add_argument('--rules', nargs='+', type=int, default=[10, 100, 1000, 10000])
+    parser.add_argument('--sizes', nargs='+', type=int, default=[10000, 100000])
+    parser.add_argument('--legacy-sample', type=int, default=10000,
+                        help="lookups timed for the legacy loops (they get slow with big rule sets)")
+    parser.add_argument('--alloc-sample', type=int, default=2000,
+                        help="lookups traced with tracemalloc")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'variant':<24}{'rules':>7}{'urls':>9}  {'mode':<9}{'ns/lookup':>11}"
+          f"{'peak KiB':>10}{'blocks/op':>10}{'hit rate':>10}")
+    for variant in args.variants:
+        for rule_count in args.rules:
+            for size in args.sizes:
+                rng = random.Random(args.seed)
+                build_ms, rows, mismatches = run_case(variant, rule_count, size, rng,
+                                                      args.legacy_sample, args.alloc_sample)
+                for mode, ns, peak, blocks, hit_rate in rows:
+                    print(f"{variant:<24}{rule_count:>7}{size:>9}  {mode:<9}{ns:>11.0f}"
+                          f"{'' if peak is None else f'{peak:.1f}':>10}"
+                          f"{'' if blocks is None else f'{blocks:.2f}':>10}"
+                          f"{'' if hit_rate is None else f'{hit_rate:.1%}':>10}")
+                note = f"  ⚠️ {mismatches} mismatches vs legacy" if mismatches else ""
+                print(f"{'':<24}{'':>7}{'':>9}  matcher built in {build_ms:.1f} ms{note}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,4 +5,9 @@ SUPABASE_URL = "https://your-project-id.supabase.co"
 SUPABASE_KEY = "your-anon-key-here"
 
 # Optional: Set to False for demo mode without real database
-USE_SUPABASE = True
\ No newline at end of file
+USE_SUPABASE = True
+
+# Optional: push friend updates over Supabase Realtime instead of polling
+USE_REALTIME = False
+# Optional: Realtime websocket override, e.g. "ws://localhost:4000/socket" for realtime_standin.py
+REALTIME_URL = None
@@ -84,6 +84,16 @@ chmod +x "$MACOS_DIR/installer"
 # Copy resources
 cp DinoTamagotchi.icns "$RESOURCES_DIR/" 2>/dev/null || echo "No icon found"
 cp supabase_dino.py "$BUNDLE_DIR/"
+cp activity_detection.py "$BUNDLE_DIR/"
+cp website_categorizer.py "$BUNDLE_DIR/"
+cp state_journal.py "$BUNDLE_DIR/"
+cp local_store.py "$BUNDLE_DIR/"
+cp supabase_sync.py "$BUNDLE_DIR/"
+cp friend_realtime.py "$BUNDLE_DIR/"
+cp leaderboard.py "$BUNDLE_DIR/"
+cp menu_view.py "$BUNDLE_DIR/"
+cp scheduler.py "$BUNDLE_DIR/"
+cp dino_state.py "$BUNDLE_DIR/"
 cp requirements.txt "$BUNDLE_DIR/"
 cp install.sh "$BUNDLE_DIR/"
 chmod +x "$BUNDLE_DIR/install.sh"
@@ -95,7 +105,7 @@ echo "✅ Created: $APP_BUNDLE"
 echo "📱 Users can now double-click the .app to install!"
 
 # Create ZIP with the app bundle
-zip -r "DinoTamagotchi-Installer.zip" "$APP_BUNDLE" supabase_dino.py requirements.txt install.sh README.txt
+zip -r "DinoTamagotchi-Installer.zip" "$APP_BUNDLE" supabase_dino.py activity_detection.py website_categorizer.py state_journal.py local_store.py supabase_sync.py friend_realtime.py leaderboard.py menu_view.py scheduler.py dino_state.py requirements.txt install.sh README.txt
 
 echo "📦 Created: DinoTamagotchi-Installer.zip"
 echo "📏 Size: $(du -h DinoTamagotchi-Installer.zip | cut -f1)"
\ No newline at end of file
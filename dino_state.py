@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Shared dino state for Dino Tamagotchi
+Stats, dumplings and time totals are changed at once by the activity
+source, the scheduler's jobs, menu callbacks and the Tk dashboard.
+DinoState keeps them behind one lock: read-modify-write changes go through
+transaction() so none of them is lost, and snapshot() returns a consistent
+copy of every field for syncing, saving or drawing.
+"""
+
+import copy
+import threading
+from contextlib import contextmanager
+
+
+class DinoState:
+    """Named fields behind one re-entrant lock
+
+    Single reads and writes (state.health, state.health = 90) are atomic on
+    their own; anything that reads a field and writes it back, or changes
+    several fields together, belongs in a transaction:
+
+        with state.transaction():
+            if state.dumplings >= 5:
+                state.dumplings -= 5
+    """
+
+    def __init__(self, **fields):
+        object.__setattr__(self, '_fields', dict(fields))
+        object.__setattr__(self, '_lock', threading.RLock())
+
+    def __getattr__(self, name):
+        try:
+            return self._fields[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        with self._lock:
+            if name not in self._fields:
+                raise AttributeError(f"unknown state field: {name}")
+            self._fields[name] = value
+
+    @contextmanager
+    def transaction(self):
+        """Hold the lock: no other thread reads or writes state until the block ends"""
+        with self._lock:
+            yield self
+
+    def update(self, **changes):
+        """Set several fields at once"""
+        with self._lock:
+            for name, value in changes.items():
+                setattr(self, name, value)
+
+    def snapshot(self):
+        """Consistent copy of every field (nested values like time_spent are copied too)"""
+        with self._lock:
+            return copy.deepcopy(self._fields)
+
+
+class StateField:
+    """Class attribute that reads and writes one field of the instance's `state`
+
+    Lets an app keep using self.health while the value lives in its DinoState.
+    """
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return getattr(instance.state, self.name)
+
+    def __set__(self, instance, value):
+        setattr(instance.state, self.name, value)
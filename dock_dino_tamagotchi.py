@@ -9,6 +9,7 @@ import json
 import os
 from PIL import Image, ImageDraw, ImageFont
 import io
+from menu_view import MenuView
 
 class DockDinoTamagotchi(rumps.App):
     def __init__(self):
@@ -61,7 +62,9 @@ class DockDinoTamagotchi(rumps.App):
         # Load saved data
         self.load_data()
         
-        # Create dynamic menu
+        # Create the menu once; later updates only change titles
+        self.menu_view = MenuView()
+        self.build_menu()
         self.update_menu()
         
         # Start monitoring
@@ -144,28 +147,30 @@ class DockDinoTamagotchi(rumps.App):
         except Exception as e:
             print(f"Error updating dock icon: {e}")
     
-    def update_menu(self):
-        """Dynamically update menu with current stats and time tracking"""
-        # Calculate total session time
-        session_time = self.format_time((datetime.now() - self.session_start).total_seconds())
-        
-        # Health bar visualization
-        health_bar = self.create_bar(self.health, "❤️", "💔")
-        happiness_bar = self.create_bar(self.happiness, "😊", "😢")
-        energy_bar = self.create_bar(self.energy, "⚡", "😴")
+    def build_menu(self):
+        """Create the menu once; update_menu() only retitles its stat items"""
+        self.health_item = rumps.MenuItem("🦕 Health", callback=None)
+        self.happiness_item = rumps.MenuItem("😊 Happiness", callback=None)
+        self.energy_item = rumps.MenuItem("⚡ Energy", callback=None)
+        self.session_item = rumps.MenuItem("⏰ Session", callback=None)
+        self.working_item = rumps.MenuItem("  💼 Working", callback=None)
+        self.coding_item = rumps.MenuItem("  💻 Coding", callback=None)
+        self.designing_item = rumps.MenuItem("  🎨 Designing", callback=None)
+        self.browsing_item = rumps.MenuItem("  😴 Browsing", callback=None)
+        self.gaming_item = rumps.MenuItem("  🎮 Gaming", callback=None)
         
         self.menu = [
-            rumps.MenuItem(f"🦕 Health: {health_bar} {self.health}%", callback=None),
-            rumps.MenuItem(f"😊 Happiness: {happiness_bar} {self.happiness}%", callback=None),
-            rumps.MenuItem(f"⚡ Energy: {energy_bar} {self.energy}%", callback=None),
+            self.health_item,
+            self.happiness_item,
+            self.energy_item,
             rumps.separator,
-            rumps.MenuItem(f"⏰ Session: {session_time}", callback=None),
+            self.session_item,
             rumps.MenuItem("📊 Time Breakdown:", callback=None),
-            rumps.MenuItem(f"  💼 Working: {self.format_time(self.time_spent['working'])}", callback=None),
-            rumps.MenuItem(f"  💻 Coding: {self.format_time(self.time_spent['coding'])}", callback=None),
-            rumps.MenuItem(f"  🎨 Designing: {self.format_time(self.time_spent['designing'])}", callback=None),
-            rumps.MenuItem(f"  😴 Browsing: {self.format_time(self.time_spent['browsing'])}", callback=None),
-            rumps.MenuItem(f"  🎮 Gaming: {self.format_time(self.time_spent['gaming'])}", callback=None),
+            self.working_item,
+            self.coding_item,
+            self.designing_item,
+            self.browsing_item,
+            self.gaming_item,
             rumps.separator,
             rumps.MenuItem("Toggle Desktop Widget", callback=self.toggle_desktop_widget),
             rumps.separator,
@@ -177,6 +182,28 @@ class DockDinoTamagotchi(rumps.App):
             rumps.MenuItem("Quit", callback=rumps.quit_application)
         ]
     
+    def update_menu(self):
+        """Update the menu's stats and time tracking (only changed titles are pushed)"""
+        # Calculate total session time
+        session_time = self.format_time((datetime.now() - self.session_start).total_seconds())
+        
+        # Health bar visualization
+        health_bar = self.create_bar(self.health, "❤️", "💔")
+        happiness_bar = self.create_bar(self.happiness, "😊", "😢")
+        energy_bar = self.create_bar(self.energy, "⚡", "😴")
+        
+        self.menu_view.render([
+            (self.health_item, f"🦕 Health: {health_bar} {self.health}%"),
+            (self.happiness_item, f"😊 Happiness: {happiness_bar} {self.happiness}%"),
+            (self.energy_item, f"⚡ Energy: {energy_bar} {self.energy}%"),
+            (self.session_item, f"⏰ Session: {session_time}"),
+            (self.working_item, f"  💼 Working: {self.format_time(self.time_spent['working'])}"),
+            (self.coding_item, f"  💻 Coding: {self.format_time(self.time_spent['coding'])}"),
+            (self.designing_item, f"  🎨 Designing: {self.format_time(self.time_spent['designing'])}"),
+            (self.browsing_item, f"  😴 Browsing: {self.format_time(self.time_spent['browsing'])}"),
+            (self.gaming_item, f"  🎮 Gaming: {self.format_time(self.time_spent['gaming'])}"),
+        ])
+    
     def create_bar(self, value, full_emoji, empty_emoji):
         """Create a visual bar representation"""
         bars = 5
@@ -1,17 +1,45 @@
 #!/usr/bin/env python3
 
 import rumps
-import subprocess
-import time
-import threading
 from datetime import datetime, timedelta
-import json
-import os
 import random
 import re
+from collections import deque
 from urllib.parse import urlparse
+from activity_detection import create_detection_backend, create_activity_source
+from website_categorizer import CategoryMatcher, CategoryCache
+from state_journal import WriteBehindSaver
+from local_store import LocalStore, RECENT_VISITS
+from menu_view import MenuView
+from scheduler import Scheduler, seconds_until
+from dino_state import DinoState, StateField
 
 class DumplingDino(rumps.App):
+    # (happiness, health) gained per 3 seconds spent in an app state
+    APP_STATE_EFFECTS = {
+        'working': (1, 0.5),
+        'coding': (2, 1),
+        'designing': (2, 0.5),
+        'gaming': (3, 0),
+    }
+    
+    # Stats shared by every thread live in self.state; these read and write through to it
+    current_state = StateField()
+    current_website = StateField()
+    current_website_category = StateField()
+    happiness = StateField()
+    energy = StateField()
+    health = StateField()
+    dumplings = StateField()
+    total_dumplings_earned = StateField()
+    dumpling_earning_session = StateField()
+    dumpling_streaks = StateField()
+    productive_time_today = StateField()
+    time_spent = StateField()
+    website_time = StateField()
+    daily_websites = StateField()
+    social_media_streak = StateField()
+    
     def __init__(self):
         super(DumplingDino, self).__init__("🦕", quit_button=None)
         
@@ -86,53 +114,62 @@ class DumplingDino(rumps.App):
             }
         }
         
-        # Core stats
-        self.current_state = 'idle'
-        self.current_website = None
-        self.current_website_category = None
-        self.happiness = 50
-        self.energy = 50
-        self.health = 100
-        
-        # DUMPLING SYSTEM! 🥟
-        self.dumplings = 0
-        self.total_dumplings_earned = 0
-        self.dumpling_earning_session = 0  # dumplings earned this session
+        # Compiled once; the special cases run after every category misses
+        self.category_matcher = CategoryMatcher(self.website_categories, fallback_rules=[
+            ('url', ['login', 'auth', 'signin'], 'work'),
+            ('domain', ['gov', 'edu'], 'productive')
+        ])
+        self.category_cache = CategoryCache(maxsize=1024, ttl=3600)
+        
+        # Core stats, dumplings (treats), time totals and recent visits; the activity
+        # source, the scheduler and menu callbacks all change them, so they live in
+        # self.state and every read-modify-write runs in a transaction
+        self.state = DinoState(
+            current_state='idle',
+            current_website=None,
+            current_website_category=None,
+            happiness=50,
+            energy=50,
+            health=100,
+            # DUMPLING SYSTEM! 🥟
+            dumplings=0,
+            total_dumplings_earned=0,
+            dumpling_earning_session=0,  # dumplings earned this session
+            dumpling_streaks={
+                'coding': 0,
+                'productive_browsing': 0,
+                'daily_goal': 0
+            },
+            productive_time_today=0,  # for daily goals
+            time_spent={
+                'idle': 0,
+                'working': 0,
+                'coding': 0,
+                'designing': 0,
+                'browsing_productive': 0,
+                'browsing_work': 0,
+                'browsing_social': 0,
+                'browsing_news': 0,
+                'browsing_entertainment': 0,
+                'browsing_shopping': 0,
+                'browsing_other': 0,
+                'gaming': 0
+            },
+            # Website-specific tracking (latest visits only; the full log and its
+            # hourly rollups live in the store, so memory stays flat)
+            website_time={},
+            daily_websites=deque(maxlen=RECENT_VISITS),
+            social_media_streak=0
+        )
         self.last_dumpling_time = datetime.now()
-        self.dumpling_streaks = {
-            'coding': 0,
-            'productive_browsing': 0,
-            'daily_goal': 0
-        }
         
         # Enhanced time tracking
         self.session_start = datetime.now()
         self.state_start_time = datetime.now()
         self.website_start_time = datetime.now()
-        self.productive_time_today = 0  # for daily goals
-        
-        self.time_spent = {
-            'idle': 0,
-            'working': 0,
-            'coding': 0,
-            'designing': 0,
-            'browsing_productive': 0,
-            'browsing_work': 0,
-            'browsing_social': 0,
-            'browsing_news': 0,
-            'browsing_entertainment': 0,
-            'browsing_shopping': 0,
-            'browsing_other': 0,
-            'gaming': 0
-        }
-        
-        # Website-specific tracking
-        self.website_time = {}
-        self.daily_websites = []
         
         # Health tracking
         self.browsing_streak = 0
-        self.social_media_streak = 0
         self.last_health_warning = None
         self.last_break_reminder = None
         self.last_website_report = None
@@ -141,8 +178,22 @@ class DumplingDino(rumps.App):
         # Notification settings
         self.notifications_enabled = True
         
-        # Load saved data
+        # Resident osascript worker for activity detection
+        self.detector = create_detection_backend(timeout=2)
+        
+        # Stats, time totals and visits live in the local database (old save files are imported once)
+        self.store_app = 'dumpling_currency_dino'
+        self.store = LocalStore()
+        self.store.migrate_legacy_files(self.store_app, "dumpling_dino_data.json")
+        self.menu_view = MenuView()
+        
+        # State changes only mark the save dirty; it is written in the background
+        self.saver = WriteBehindSaver(self.save_data, interval=5)
+        self.saver.install_signal_handlers()
+        
+        # Load saved data, re-scoring saved visits in case category rules changed
         self.load_data()
+        self.rescore_website_history()
         
         # Create menu
         self.create_static_menu()
@@ -152,6 +203,9 @@ class DumplingDino(rumps.App):
                                     f"Current balance: 🥟 {self.dumplings} dumplings",
                                     "Earn dumplings by being productive! Check the store (coming soon)!")
         
+        # One thread runs the periodic checks and delayed state resets
+        self.scheduler = Scheduler()
+        
         # Start monitoring
         self.start_monitoring()
         self.start_health_monitoring()
@@ -164,15 +218,13 @@ class DumplingDino(rumps.App):
     def start_dumpling_monitoring(self):
         """Monitor and award dumplings based on activity"""
         def dumpling_monitor():
-            while True:
-                try:
-                    self.calculate_dumpling_earnings()
-                    self.check_dumpling_milestones()
-                except Exception as e:
-                    print(f"Dumpling monitor error: {e}")
-                time.sleep(60)  # Check every minute
+            try:
+                self.calculate_dumpling_earnings()
+                self.check_dumpling_milestones()
+            except Exception as e:
+                print(f"Dumpling monitor error: {e}")
         
-        threading.Thread(target=dumpling_monitor, daemon=True).start()
+        self.scheduler.every('dumplings', 60, dumpling_monitor, delay=0)  # Check every minute
     
     def calculate_dumpling_earnings(self):
         """Calculate and award dumplings based on current activity"""
@@ -184,33 +236,35 @@ class DumplingDino(rumps.App):
         
         dumplings_earned = 0
         
-        # Base earning rates by activity
-        if self.current_state == 'coding':
-            dumplings_earned = 2.0 * time_since_last  # 2 dumplings per minute coding
-            self.dumpling_streaks['coding'] += time_since_last
-        elif self.current_state == 'working':
-            dumplings_earned = 1.0 * time_since_last  # 1 dumpling per minute working
-        elif self.current_state == 'designing':
-            dumplings_earned = 1.5 * time_since_last  # 1.5 dumplings per minute designing
-        elif self.current_state.startswith('browsing_'):
-            # Website-specific rates
-            if self.current_website_category in self.website_categories:
-                rate = self.website_categories[self.current_website_category]['dumpling_rate']
-                dumplings_earned = rate * time_since_last
-                
-                if self.current_website_category == 'productive':
-                    self.dumpling_streaks['productive_browsing'] += time_since_last
-        
-        # Bonus multipliers
-        # Coding streak bonus
-        if self.dumpling_streaks['coding'] > 30:  # 30+ minutes coding
-            dumplings_earned *= 1.5
-        
-        # Health bonus
-        if self.health > 80:
-            dumplings_earned *= 1.2
-        elif self.health < 30:
-            dumplings_earned *= 0.5
+        # One transaction, so the activity source can't switch state or health mid-calculation
+        with self.state.transaction():
+            # Base earning rates by activity
+            if self.current_state == 'coding':
+                dumplings_earned = 2.0 * time_since_last  # 2 dumplings per minute coding
+                self.dumpling_streaks['coding'] += time_since_last
+            elif self.current_state == 'working':
+                dumplings_earned = 1.0 * time_since_last  # 1 dumpling per minute working
+            elif self.current_state == 'designing':
+                dumplings_earned = 1.5 * time_since_last  # 1.5 dumplings per minute designing
+            elif self.current_state.startswith('browsing_'):
+                # Website-specific rates
+                if self.current_website_category in self.website_categories:
+                    rate = self.website_categories[self.current_website_category]['dumpling_rate']
+                    dumplings_earned = rate * time_since_last
+                    
+                    if self.current_website_category == 'productive':
+                        self.dumpling_streaks['productive_browsing'] += time_since_last
+            
+            # Bonus multipliers
+            # Coding streak bonus
+            if self.dumpling_streaks['coding'] > 30:  # 30+ minutes coding
+                dumplings_earned *= 1.5
+            
+            # Health bonus
+            if self.health > 80:
+                dumplings_earned *= 1.2
+            elif self.health < 30:
+                dumplings_earned *= 0.5
         
         # Round and apply
         if dumplings_earned > 0:
@@ -225,9 +279,11 @@ class DumplingDino(rumps.App):
     
     def award_dumplings(self, amount, reason):
         """Award dumplings and send notification"""
-        self.dumplings += amount
-        self.total_dumplings_earned += amount
-        self.dumpling_earning_session += amount
+        with self.state.transaction():
+            self.dumplings += amount
+            self.total_dumplings_earned += amount
+            self.dumpling_earning_session += amount
+            total = self.dumplings
         
         # Celebration notification for significant earnings
         if (not self.last_dumpling_celebration or 
@@ -236,19 +292,22 @@ class DumplingDino(rumps.App):
             if amount >= 5:
                 self.send_native_notification(
                     f"🥟 +{amount} Dumplings Earned!",
-                    f"Total: 🥟 {self.dumplings} dumplings",
+                    f"Total: 🥟 {total} dumplings",
                     f"Great work! Reason: {reason}"
                 )
                 self.last_dumpling_celebration = datetime.now()
         
-        print(f"🥟 +{amount} dumplings! Total: {self.dumplings} | Reason: {reason}")
+        print(f"🥟 +{amount} dumplings! Total: {total} | Reason: {reason}")
     
     def lose_dumplings(self, amount, reason):
         """Lose dumplings for distracting activities"""
-        if self.dumplings > 0:
+        with self.state.transaction():
+            if self.dumplings <= 0:
+                return
             lost = min(amount, self.dumplings)
             self.dumplings -= lost
-            print(f"🥟 -{lost} dumplings lost. Total: {self.dumplings} | Reason: {reason}")
+            total = self.dumplings
+        print(f"🥟 -{lost} dumplings lost. Total: {total} | Reason: {reason}")
     
     def check_dumpling_milestones(self):
         """Check and celebrate dumpling milestones"""
@@ -294,8 +353,8 @@ class DumplingDino(rumps.App):
         self.dumplings_item = rumps.MenuItem(f"🥟 Dumplings: {self.dumplings}")
         self.session_earnings_item = rumps.MenuItem(f"📈 Session Earned: +{self.dumpling_earning_session}")
         
-        self.health_item = rumps.MenuItem(f"🦕 Health: ❤️❤️❤️❤️❤️ {self.health}%")
-        self.happiness_item = rumps.MenuItem(f"😊 Happiness: 😊😊😊😊😊 {self.happiness}%")
+        self.health_item = rumps.MenuItem(f"🦕 Health: ❤️❤️❤️❤️❤️ {self.health:.0f}%")
+        self.happiness_item = rumps.MenuItem(f"😊 Happiness: 😊😊😊😊😊 {self.happiness:.0f}%")
         self.energy_item = rumps.MenuItem(f"⚡ Energy: ⚡⚡⚡⚡⚡ {self.energy}%")
         
         self.session_item = rumps.MenuItem("⏰ Session: 0m")
@@ -347,12 +406,20 @@ class DumplingDino(rumps.App):
             self.notifications_toggle,
             rumps.MenuItem("Reset Day", callback=self.reset),
             rumps.separator,
-            rumps.MenuItem("Quit", callback=rumps.quit_application)
+            rumps.MenuItem("Quit", callback=self.quit_app)
         ]
         
         # Initial update
         self.update_all_menu_items()
     
+    def quit_app(self, sender):
+        """Stop background jobs and the detection worker, flush pending saves and quit"""
+        self.scheduler.stop()
+        self.activity_source.stop()
+        self.detector.stop()
+        self.saver.stop()
+        rumps.quit_application()
+    
     @rumps.clicked("🏪 Dumpling Store (Coming Soon!)")
     def show_store_preview(self, sender):
         """Show store preview with future features"""
@@ -365,12 +432,13 @@ class DumplingDino(rumps.App):
     @rumps.clicked("Dumpling Stats 🥟")
     def show_dumpling_stats(self, sender):
         """Show detailed dumpling statistics"""
-        earning_rate = self.dumpling_earning_session / max(1, (datetime.now() - self.session_start).total_seconds() / 3600)  # per hour
+        state = self.state.snapshot()
+        earning_rate = state['dumpling_earning_session'] / max(1, (datetime.now() - self.session_start).total_seconds() / 3600)  # per hour
         
         self.send_native_notification(
             "🥟 Your Dumpling Stats",
-            f"Balance: {self.dumplings} | Total Earned: {self.total_dumplings_earned}",
-            f"Session: +{self.dumpling_earning_session} | Rate: {earning_rate:.1f}/hour"
+            f"Balance: {state['dumplings']} | Total Earned: {state['total_dumplings_earned']}",
+            f"Session: +{state['dumpling_earning_session']} | Rate: {earning_rate:.1f}/hour"
         )
     
     @rumps.clicked("🔔 Notifications: ON")
@@ -387,69 +455,46 @@ class DumplingDino(rumps.App):
     
     def start_notification_scheduler(self):
         """Enhanced notification scheduler with dumpling insights"""
-        def notification_scheduler():
-            while True:
-                try:
-                    now = datetime.now()
-                    
-                    # Daily dumpling goal check
-                    if now.hour == 17 and now.minute < 5:  # 5 PM reminder
-                        daily_goal = 50  # 50 dumplings per day
-                        if self.dumpling_earning_session < daily_goal:
-                            remaining = daily_goal - self.dumpling_earning_session
-                            self.send_native_notification(
-                                "🎯 Daily Dumpling Goal",
-                                f"🥟 {remaining} more dumplings to hit daily goal!",
-                                "Keep coding and learning to reach your target!"
-                            )
-                    
-                    # Streak celebrations
-                    if self.dumpling_streaks['coding'] >= 60:  # 1 hour coding streak
+        def daily_goal_check():
+            try:
+                now = datetime.now()
+                
+                # Daily dumpling goal check (skipped if the Mac slept through 5 PM)
+                if now.hour == 17 and now.minute < 5:  # 5 PM reminder
+                    daily_goal = 50  # 50 dumplings per day
+                    earned = self.dumpling_earning_session
+                    if earned < daily_goal:
+                        remaining = daily_goal - earned
                         self.send_native_notification(
-                            "🔥 Coding Streak!",
-                            f"🥟 Bonus earnings activated!",
-                            f"{self.dumpling_streaks['coding']:.0f} minutes of coding - you're on fire!"
+                            "🎯 Daily Dumpling Goal",
+                            f"🥟 {remaining} more dumplings to hit daily goal!",
+                            "Keep coding and learning to reach your target!"
                         )
+                    
+            except Exception as e:
+                print(f"Daily goal check error: {e}")
+            return seconds_until(17)  # 5 PM tomorrow, by the wall clock
+        
+        def notification_scheduler():
+            try:
+                # Streak celebrations
+                with self.state.transaction():
+                    coding_streak = self.dumpling_streaks['coding']
+                    if coding_streak >= 60:  # 1 hour coding streak
                         self.dumpling_streaks['coding'] = 0  # Reset to avoid spam
-                        
-                except Exception as e:
-                    print(f"Notification scheduler error: {e}")
                 
-                time.sleep(300)  # Check every 5 minutes
+                if coding_streak >= 60:
+                    self.send_native_notification(
+                        "🔥 Coding Streak!",
+                        f"🥟 Bonus earnings activated!",
+                        f"{coding_streak:.0f} minutes of coding - you're on fire!"
+                    )
+                    
+            except Exception as e:
+                print(f"Notification scheduler error: {e}")
         
-        threading.Thread(target=notification_scheduler, daemon=True).start()
-    
-    def get_current_browser_url(self):
-        """Get the current URL from Chrome using AppleScript"""
-        try:
-            chrome_script = '''
-            tell application "Google Chrome"
-                if exists window 1 then
-                    set currentURL to URL of active tab of window 1
-                    set currentTitle to title of active tab of window 1
-                    return currentURL & "|" & currentTitle
-                else
-                    return ""
-                end if
-            end tell
-            '''
-            
-            result = subprocess.run(['osascript', '-e', chrome_script], 
-                                  capture_output=True, text=True, timeout=2)
-            
-            if result.returncode == 0 and result.stdout.strip():
-                url_and_title = result.stdout.strip()
-                if "|" in url_and_title:
-                    url, title = url_and_title.split("|", 1)
-                    return url.strip(), title.strip()
-                else:
-                    return url_and_title.strip(), ""
-            
-            return None, None
-            
-        except Exception as e:
-            print(f"Error getting browser URL: {e}")
-            return None, None
+        self.scheduler.every('notifications', 300, notification_scheduler, delay=0)  # Check every 5 minutes
+        self.scheduler.every('daily_goal', 24 * 3600, daily_goal_check, delay=seconds_until(17))
     
     def categorize_website(self, url, title=""):
         """Categorize a website based on URL and title"""
@@ -457,32 +502,32 @@ class DumplingDino(rumps.App):
             return 'other'
         
         try:
-            parsed = urlparse(url.lower())
-            domain = parsed.netloc.replace('www.', '')
-            path = parsed.path.lower()
-            full_url = (url + " " + title).lower()
-            
-            for category, config in self.website_categories.items():
-                for domain_pattern in config['domains']:
-                    if domain_pattern in domain:
-                        return category
-                
-                for keyword in config['keywords']:
-                    if keyword in full_url:
-                        return category
-            
-            if any(term in full_url for term in ['login', 'auth', 'signin']):
-                return 'work'
-            
-            if any(term in domain for term in ['gov', 'edu']):
-                return 'productive'
-                
-            return 'other'
+            # Keyed by the matcher's rules, so rebuilding it with new rules drops stale results
+            matcher = self.category_matcher
+            return self.category_cache.categorize(matcher, url, title, matcher.rules_version)
             
         except Exception as e:
             print(f"Error categorizing website: {e}")
             return 'other'
     
+    def categorize_many(self, urls, titles=None):
+        """Categorize a batch of URLs with the compiled tables"""
+        urls = list(urls)
+        try:
+            return self.category_matcher.match_many(urls, titles)
+        except Exception as e:
+            print(f"Error categorizing websites: {e}")
+            return ['other'] * len(urls)
+    
+    def rescore_website_history(self):
+        """Re-categorize today's website visits if the category rules changed since they were scored"""
+        try:
+            self.store.recategorize_visits(self.store_app, self.categorize_many, self.category_matcher.rules_version)
+            self.daily_websites = deque(self.store.visits(self.store_app, limit=RECENT_VISITS),
+                                        maxlen=RECENT_VISITS)
+        except Exception as e:
+            print(f"Error re-scoring website history: {e}")
+    
     def get_website_display_info(self, category):
         """Get display info for a website category"""
         if category in self.website_categories:
@@ -490,70 +535,72 @@ class DumplingDino(rumps.App):
         return '🌐', 'browsing_other'
     
     def update_all_menu_items(self):
-        """Update all menu items with current data including dumplings"""
+        """Update all menu items with current data including dumplings (only changed titles are pushed)"""
         try:
-            status_text = self.get_current_status()
-            self.status_item.title = f"Status: {status_text}"
-            
-            # Update dumpling display
-            self.dumplings_item.title = f"🥟 Dumplings: {self.dumplings}"
-            self.session_earnings_item.title = f"📈 Session Earned: +{self.dumpling_earning_session:.1f}"
-            
-            # Website info
-            if self.current_website:
-                try:
-                    domain = urlparse(self.current_website).netloc.replace('www.', '')
-                    category_emoji = self.website_categories.get(self.current_website_category, {}).get('emoji', '🌐')
-                    
-                    # Show dumpling rate for current website
-                    dumpling_rate = self.website_categories.get(self.current_website_category, {}).get('dumpling_rate', 0)
-                    rate_display = f" (+{dumpling_rate}/min)" if dumpling_rate > 0 else f" ({dumpling_rate}/min)" if dumpling_rate < 0 else ""
-                    
-                    self.website_item.title = f"{category_emoji} {domain}{rate_display}"
-                except:
-                    self.website_item.title = "🌐 Website: Unknown"
-            else:
-                self.website_item.title = "🌐 Website: None"
-            
-            session_time = self.format_time((datetime.now() - self.session_start).total_seconds())
-            
-            health_bar = self.create_bar(self.health, "❤️", "💔")
-            happiness_bar = self.create_bar(self.happiness, "😊", "😢") 
-            energy_bar = self.create_bar(self.energy, "⚡", "😴")
-            
-            self.health_item.title = f"🦕 Health: {health_bar} {self.health}%"
-            self.happiness_item.title = f"😊 Happiness: {happiness_bar} {self.happiness}%"
-            self.energy_item.title = f"⚡ Energy: {energy_bar} {self.energy}%"
-            
-            self.session_item.title = f"⏰ Session: {session_time}"
-            
-            # Enhanced time breakdown with dumpling earning potential
-            self.productive_item.title = f"  📖 Productive Sites: {self.format_time(self.time_spent['browsing_productive'])} (🥟+1.0/min)"
-            self.work_item.title = f"  💼 Work Sites: {self.format_time(self.time_spent['browsing_work'])} (🥟+0.8/min)"
-            self.social_item.title = f"  📱 Social Media: {self.format_time(self.time_spent['browsing_social'])} (🥟-0.2/min)"
-            self.news_item.title = f"  📰 News Sites: {self.format_time(self.time_spent['browsing_news'])} (🥟+0.1/min)"
-            self.entertainment_item.title = f"  🍿 Entertainment: {self.format_time(self.time_spent['browsing_entertainment'])} (🥟-0.1/min)"
-            self.shopping_item.title = f"  🛒 Shopping: {self.format_time(self.time_spent['browsing_shopping'])} (🥟0/min)"
-            self.other_browsing_item.title = f"  🌐 Other Browsing: {self.format_time(self.time_spent['browsing_other'])}"
-            
-            self.coding_item.title = f"  💻 Coding: {self.format_time(self.time_spent['coding'])} (🥟+2.0/min)"
-            self.designing_item.title = f"  🎨 Designing: {self.format_time(self.time_spent['designing'])} (🥟+1.5/min)"
-            
-            # Update menu bar icon with dumpling indicator
-            health_indicator = ""
-            if self.health < 30:
-                health_indicator = "🚨"
-            elif self.health < 60:
-                health_indicator = "⚠️"
-            
-            # Show dumpling count in menu bar for milestones
-            dumpling_indicator = ""
-            if self.dumplings >= 100:
-                dumpling_indicator = "💰"
-            elif self.dumplings >= 50:
-                dumpling_indicator = "🥟"
+            # Titles are built from one consistent view of the stats, then pushed outside the lock
+            with self.state.transaction():
+                status_text = self.get_current_status()
+                
+                # Website info
+                if self.current_website:
+                    try:
+                        domain = urlparse(self.current_website).netloc.replace('www.', '')
+                        category_emoji = self.website_categories.get(self.current_website_category, {}).get('emoji', '🌐')
+                        
+                        # Show dumpling rate for current website
+                        dumpling_rate = self.website_categories.get(self.current_website_category, {}).get('dumpling_rate', 0)
+                        rate_display = f" (+{dumpling_rate}/min)" if dumpling_rate > 0 else f" ({dumpling_rate}/min)" if dumpling_rate < 0 else ""
+                        
+                        website_text = f"{category_emoji} {domain}{rate_display}"
+                    except:
+                        website_text = "🌐 Website: Unknown"
+                else:
+                    website_text = "🌐 Website: None"
+                
+                session_time = self.format_time((datetime.now() - self.session_start).total_seconds())
+                
+                health_bar = self.create_bar(self.health, "❤️", "💔")
+                happiness_bar = self.create_bar(self.happiness, "😊", "😢") 
+                energy_bar = self.create_bar(self.energy, "⚡", "😴")
+                
+                # Menu bar icon with dumpling indicator
+                health_indicator = ""
+                if self.health < 30:
+                    health_indicator = "🚨"
+                elif self.health < 60:
+                    health_indicator = "⚠️"
+                
+                # Show dumpling count in menu bar for milestones
+                dumpling_indicator = ""
+                if self.dumplings >= 100:
+                    dumpling_indicator = "💰"
+                elif self.dumplings >= 50:
+                    dumpling_indicator = "🥟"
+                
+                titles = [
+                    (self, f"{self.states[self.current_state]}{health_indicator}{dumpling_indicator}"),
+                    (self.status_item, f"Status: {status_text}"),
+                    # Dumpling display
+                    (self.dumplings_item, f"🥟 Dumplings: {self.dumplings}"),
+                    (self.session_earnings_item, f"📈 Session Earned: +{self.dumpling_earning_session:.1f}"),
+                    (self.website_item, website_text),
+                    (self.health_item, f"🦕 Health: {health_bar} {self.health:.0f}%"),
+                    (self.happiness_item, f"😊 Happiness: {happiness_bar} {self.happiness:.0f}%"),
+                    (self.energy_item, f"⚡ Energy: {energy_bar} {self.energy}%"),
+                    (self.session_item, f"⏰ Session: {session_time}"),
+                    # Enhanced time breakdown with dumpling earning potential
+                    (self.productive_item, f"  📖 Productive Sites: {self.format_time(self.time_spent['browsing_productive'])} (🥟+1.0/min)"),
+                    (self.work_item, f"  💼 Work Sites: {self.format_time(self.time_spent['browsing_work'])} (🥟+0.8/min)"),
+                    (self.social_item, f"  📱 Social Media: {self.format_time(self.time_spent['browsing_social'])} (🥟-0.2/min)"),
+                    (self.news_item, f"  📰 News Sites: {self.format_time(self.time_spent['browsing_news'])} (🥟+0.1/min)"),
+                    (self.entertainment_item, f"  🍿 Entertainment: {self.format_time(self.time_spent['browsing_entertainment'])} (🥟-0.1/min)"),
+                    (self.shopping_item, f"  🛒 Shopping: {self.format_time(self.time_spent['browsing_shopping'])} (🥟0/min)"),
+                    (self.other_browsing_item, f"  🌐 Other Browsing: {self.format_time(self.time_spent['browsing_other'])}"),
+                    (self.coding_item, f"  💻 Coding: {self.format_time(self.time_spent['coding'])} (🥟+2.0/min)"),
+                    (self.designing_item, f"  🎨 Designing: {self.format_time(self.time_spent['designing'])} (🥟+1.5/min)"),
+                ]
             
-            self.title = f"{self.states[self.current_state]}{health_indicator}{dumpling_indicator}"
+            self.menu_view.render(titles)
             
         except Exception as e:
             print(f"Error updating menu: {e}")
@@ -606,71 +653,58 @@ class DumplingDino(rumps.App):
             return f"{hours}h {minutes}m"
     
     def start_monitoring(self):
-        def monitor():
-            while True:
-                try:
-                    self.check_current_activity()
-                except Exception as e:
-                    print(f"Monitor error: {e}")
-                time.sleep(3)
-        
-        threading.Thread(target=monitor, daemon=True).start()
+        self.activity_source = create_activity_source(self.detector, interval=3)
+        self.activity_source.start(self.check_current_activity)
     
     def start_health_monitoring(self):
         """Enhanced health monitoring with dumpling warnings"""
         def health_monitor():
-            while True:
-                try:
-                    now = datetime.now()
-                    
-                    # Social media addiction warning with dumpling loss
-                    if self.social_media_streak > 900:  # 15 minutes
-                        self.send_native_notification(
-                            "📱 Social Media Alert!",
-                            f"🥟 Losing dumplings! {self.format_time(self.social_media_streak)} on social media",
-                            "Your dumpling earning rate is negative! Switch to productive activities!"
-                        )
+            try:
+                now = datetime.now()
+                
+                with self.state.transaction():
+                    social_streak = self.social_media_streak
+                    if social_streak > 900:
                         self.social_media_streak = 0
-                    
-                    # Health warnings
-                    if self.health < 30 and (not self.last_health_warning or 
-                       now - self.last_health_warning > timedelta(minutes=10)):
-                        dumpling_bonus = min(10, self.dumplings * 0.1)
-                        self.send_native_notification(
-                            "🚨 Health Critical!",
-                            f"🥟 Earn {dumpling_bonus:.0f} bonus dumplings for recovery!",
-                            "Take a break or do productive activities to restore health!"
-                        )
-                        self.last_health_warning = now
-                        
-                except Exception as e:
-                    print(f"Health monitor error: {e}")
+                    health, dumplings = self.health, self.dumplings
                 
-                time.sleep(30)
+                # Social media addiction warning with dumpling loss
+                if social_streak > 900:  # 15 minutes
+                    self.send_native_notification(
+                        "📱 Social Media Alert!",
+                        f"🥟 Losing dumplings! {self.format_time(social_streak)} on social media",
+                        "Your dumpling earning rate is negative! Switch to productive activities!"
+                    )
+                
+                # Health warnings
+                if health < 30 and (not self.last_health_warning or 
+                   now - self.last_health_warning > timedelta(minutes=10)):
+                    dumpling_bonus = min(10, dumplings * 0.1)
+                    self.send_native_notification(
+                        "🚨 Health Critical!",
+                        f"🥟 Earn {dumpling_bonus:.0f} bonus dumplings for recovery!",
+                        "Take a break or do productive activities to restore health!"
+                    )
+                    self.last_health_warning = now
+                    
+            except Exception as e:
+                print(f"Health monitor error: {e}")
         
-        threading.Thread(target=health_monitor, daemon=True).start()
+        self.scheduler.every('health', 30, health_monitor, delay=0)
     
     # ... (keeping all the website tracking methods from previous version)
     
-    def check_current_activity(self):
+    def check_current_activity(self, probe=None):
         """Enhanced activity checking with website monitoring"""
         try:
-            app_script = '''
-            tell application "System Events"
-                set frontApp to name of first application process whose frontmost is true
-                return frontApp
-            end tell
-            '''
-            
-            app_result = subprocess.run(['osascript', '-e', app_script], 
-                                      capture_output=True, text=True)
-            
-            if app_result.returncode == 0:
-                app_name = app_result.stdout.strip().lower()
+            if probe is None:
+                probe = self.detector.probe()
+            
+            if probe and probe.app:
+                app_name = probe.app.lower()
                 
-                if any(browser in app_name for browser in ['chrome', 'safari', 'firefox']):
-                    url, title = self.get_current_browser_url()
-                    self.update_browsing_state(url, title, app_name)
+                if probe.browser or any(browser in app_name for browser in ['chrome', 'safari', 'firefox']):
+                    self.update_browsing_state(probe.url, probe.title, app_name)
                 else:
                     self.update_non_browsing_state(app_name)
                 
@@ -679,49 +713,58 @@ class DumplingDino(rumps.App):
     
     def update_browsing_state(self, url, title, browser):
         """Update state based on current website"""
-        self.track_time_spent()
-        
-        old_website = self.current_website
-        self.current_website = url
-        
-        if url:
-            category = self.categorize_website(url, title)
-            self.current_website_category = category
+        # One transaction, so a feed or reset can't land between tracking the last
+        # stretch and switching to the new website
+        with self.state.transaction():
+            # Apply the effects of the app state and website we were in for the time just tracked
+            state_seconds, website_seconds = self.track_time_spent()
+            self.apply_app_effects(self.current_state, state_seconds)
+            self.apply_website_effects(self.current_website_category, website_seconds)
             
-            try:
-                domain = urlparse(url).netloc.replace('www.', '')
-                if domain not in self.website_time:
-                    self.website_time[domain] = 0
+            old_website = self.current_website
+            self.current_website = url
+            
+            if url:
+                category = self.categorize_website(url, title)
+                self.current_website_category = category
                 
-                if old_website != url:
-                    self.daily_websites.append({
-                        'domain': domain,
-                        'category': category,
-                        'timestamp': datetime.now().isoformat(),
-                        'duration': 0
-                    })
+                try:
+                    domain = urlparse(url).netloc.replace('www.', '')
+                    if domain not in self.website_time:
+                        self.website_time[domain] = 0
                     
-            except Exception as e:
-                print(f"Error tracking website: {e}")
-            
-            emoji, new_state = self.get_website_display_info(category)
-            self.apply_website_effects(category, url)
+                    if old_website != url:
+                        timestamp = datetime.now().isoformat()
+                        self.daily_websites.append({
+                            'id': self.store.log_visit(self.store_app, domain, category, timestamp,
+                                                       url=url, title=title),
+                            'domain': domain,
+                            'category': category,
+                            'timestamp': timestamp,
+                            'duration': 0
+                        })
+                        
+                except Exception as e:
+                    print(f"Error tracking website: {e}")
+                
+                emoji, new_state = self.get_website_display_info(category)
+                
+            else:
+                new_state = 'browsing_other'
+                self.current_website_category = 'other'
             
-        else:
-            new_state = 'browsing_other'
-            self.current_website_category = 'other'
-        
-        old_state = self.current_state
-        self.current_state = new_state
-        self.website_start_time = datetime.now()
+            old_state = self.current_state
+            self.current_state = new_state
+            self.website_start_time = datetime.now()
+            category, health = self.current_website_category, self.health
         
         self.update_all_menu_items()
         
         if old_website != url and url:
             try:
                 domain = urlparse(url).netloc.replace('www.', '')
-                category_emoji = self.website_categories.get(self.current_website_category, {}).get('emoji', '🌐')
-                dumpling_rate = self.website_categories.get(self.current_website_category, {}).get('dumpling_rate', 0)
+                category_emoji = self.website_categories.get(category, {}).get('emoji', '🌐')
+                dumpling_rate = self.website_categories.get(category, {}).get('dumpling_rate', 0)
                 
                 if dumpling_rate > 0:
                     subtitle = f"🥟 +{dumpling_rate}/min | {domain}"
@@ -733,159 +776,188 @@ class DumplingDino(rumps.App):
                 self.send_native_notification(
                     f"{category_emoji} Website Change",
                     subtitle,
-                    f"Category: {self.current_website_category.title()} | Health: {self.health}%",
+                    f"Category: {category.title()} | Health: {health:.0f}%",
                     sound=False
                 )
                 
             except Exception as e:
                 print(f"Error sending website notification: {e}")
         
-        self.save_data()
+        self.saver.mark_dirty()
     
-    def apply_website_effects(self, category, url):
-        """Apply health/happiness effects based on website category"""
+    def apply_website_effects(self, category, seconds):
+        """Apply health/happiness effects of seconds spent on a website category"""
         if category in self.website_categories:
             config = self.website_categories[category]
             
-            health_change = config['health_modifier'] * 0.5
-            happiness_change = config['happiness_modifier'] * 0.3
-            
-            self.health = max(0, min(100, self.health + health_change))
-            self.happiness = max(0, min(100, self.happiness + happiness_change))
+            # Modifiers are rated per 3 seconds on the site, however often we sample
+            checks = seconds / 3
+            health_change = config['health_modifier'] * 0.5 * checks
+            happiness_change = config['happiness_modifier'] * 0.3 * checks
             
-            if category == 'social':
-                self.social_media_streak += 3
-            else:
-                self.social_media_streak = 0
+            with self.state.transaction():
+                self.health = max(0, min(100, self.health + health_change))
+                self.happiness = max(0, min(100, self.happiness + happiness_change))
+                
+                if category == 'social':
+                    self.social_media_streak += seconds
+                else:
+                    self.social_media_streak = 0
+    
+    def apply_app_effects(self, state, seconds):
+        """Apply happiness/health gained from seconds spent in an app state"""
+        if state in self.APP_STATE_EFFECTS:
+            happiness_rate, health_rate = self.APP_STATE_EFFECTS[state]
+            checks = seconds / 3
+            with self.state.transaction():
+                self.happiness = min(100, self.happiness + happiness_rate * checks)
+                self.health = min(100, self.health + health_rate * checks)
     
     def update_non_browsing_state(self, app_name):
         """Update state for non-browser applications"""
-        self.track_time_spent()
-        
-        self.current_website = None
-        self.current_website_category = None
-        self.social_media_streak = 0
-        
-        old_state = self.current_state
         new_state = 'idle'
         
         if 'slack' in app_name:
             new_state = 'working'
-            self.happiness = min(100, self.happiness + 1)
-            self.health = min(100, self.health + 0.5)
             
         elif any(code_app in app_name for code_app in ['code', 'xcode', 'terminal', 'iterm']):
             new_state = 'coding'
-            self.happiness = min(100, self.happiness + 2)
-            self.health = min(100, self.health + 1)
             
         elif 'figma' in app_name:
             new_state = 'designing'
-            self.happiness = min(100, self.happiness + 2)
-            self.health = min(100, self.health + 0.5)
             
         elif 'game' in app_name:
             new_state = 'gaming'
-            self.happiness = min(100, self.happiness + 3)
         
-        self.current_state = new_state
+        # One transaction, so a feed or reset can't land between tracking the last
+        # stretch and switching to the new app
+        with self.state.transaction():
+            state_seconds, website_seconds = self.track_time_spent()
+            self.apply_app_effects(self.current_state, state_seconds)
+            self.apply_website_effects(self.current_website_category, website_seconds)
+            
+            self.current_website = None
+            self.current_website_category = None
+            self.social_media_streak = 0
+            
+            old_state = self.current_state
+            self.current_state = new_state
+            health, dumplings = self.health, self.dumplings
+        
         self.update_all_menu_items()
         
         if old_state != new_state and new_state != 'idle':
             status = self.get_current_status()
             self.send_native_notification(
                 f"🔄 App Change: {self.states[new_state]}",
-                f"Health: {self.health}% | 🥟 {self.dumplings} dumplings",
+                f"Health: {health:.0f}% | 🥟 {dumplings} dumplings",
                 status,
                 sound=False
             )
         
-        self.save_data()
+        self.saver.mark_dirty()
     
     def track_time_spent(self):
-        """Track time spent in current state and website"""
-        if hasattr(self, 'state_start_time'):
-            time_delta = (datetime.now() - self.state_start_time).total_seconds()
-            if self.current_state in self.time_spent:
-                self.time_spent[self.current_state] += time_delta
-                
-                # Track productive time for daily goals
-                if self.current_state in ['coding', 'working', 'designing', 'browsing_productive']:
-                    self.productive_time_today += time_delta
-        
-        if hasattr(self, 'website_start_time') and self.current_website:
-            try:
-                website_delta = (datetime.now() - self.website_start_time).total_seconds()
-                domain = urlparse(self.current_website).netloc.replace('www.', '')
-                if domain in self.website_time:
-                    self.website_time[domain] += website_delta
-                
-                if self.daily_websites:
-                    self.daily_websites[-1]['duration'] += website_delta
+        """Track time spent in current state and website; returns the seconds tracked on each
+
+        (state_seconds, website_seconds), so effects can be scaled by time
+        actually spent rather than applied once per sample.
+        """
+        with self.state.transaction():
+            time_delta = 0
+            website_delta = 0
+            if hasattr(self, 'state_start_time'):
+                time_delta = (datetime.now() - self.state_start_time).total_seconds()
+                if self.current_state in self.time_spent:
+                    self.time_spent[self.current_state] += time_delta
+                    self.store.add_state_time(self.store_app, self.current_state, time_delta)
                     
-            except Exception as e:
-                print(f"Error tracking website time: {e}")
-        
-        self.state_start_time = datetime.now()
-        self.website_start_time = datetime.now()
+                    # Track productive time for daily goals
+                    if self.current_state in ['coding', 'working', 'designing', 'browsing_productive']:
+                        self.productive_time_today += time_delta
+            
+            if hasattr(self, 'website_start_time') and self.current_website:
+                try:
+                    website_delta = (datetime.now() - self.website_start_time).total_seconds()
+                    domain = urlparse(self.current_website).netloc.replace('www.', '')
+                    if domain in self.website_time:
+                        self.website_time[domain] += website_delta
+                        self.store.add_domain_time(self.store_app, domain, website_delta)
+                    
+                    if self.daily_websites:
+                        self.daily_websites[-1]['duration'] += website_delta
+                        latest = self.daily_websites[-1]
+                        self.store.add_visit_time(self.store_app, latest['id'], latest['category'], website_delta)
+                        
+                except Exception as e:
+                    print(f"Error tracking website time: {e}")
+            
+            self.state_start_time = datetime.now()
+            self.website_start_time = datetime.now()
+        return time_delta, website_delta
     
     # ... (keeping all the menu callback methods)
     
     @rumps.clicked("Feed 🍖")
     def feed(self, sender):
         cost = 5  # Feeding costs 5 dumplings but gives big health boost
-        if self.dumplings >= cost:
-            self.dumplings -= cost
-            old_state = self.current_state
-            self.current_state = 'eating'
-            self.happiness = min(100, self.happiness + 30)
-            health_boost = min(100, self.health + 20)
-            old_health = self.health
-            self.health = health_boost
-            
+        # Check and spend in one transaction, so an award or loss meanwhile isn't lost
+        with self.state.transaction():
+            fed = self.dumplings >= cost
+            if fed:
+                self.dumplings -= cost
+                old_state = self.current_state
+                self.current_state = 'eating'
+                self.happiness = min(100, self.happiness + 30)
+                health_boost = min(100, self.health + 20)
+                old_health = self.health
+                self.health = health_boost
+            dumplings = self.dumplings
+        
+        if fed:
             self.update_all_menu_items()
             
             self.send_native_notification(
                 "🍖 Dino Fed! (🥟 -5)",
-                f"Health: {old_health}% → {self.health}% | Happiness: +30",
-                f"Your dino is much happier! 🥟 {self.dumplings} dumplings remaining"
+                f"Health: {old_health:.0f}% → {health_boost:.0f}% | Happiness: +30",
+                f"Your dino is much happier! 🥟 {dumplings} dumplings remaining"
             )
             
             def reset_after_eating():
-                time.sleep(3)
                 self.current_state = old_state
                 self.update_all_menu_items()
             
-            threading.Thread(target=reset_after_eating, daemon=True).start()
+            self.scheduler.after(3, reset_after_eating)
         else:
             self.send_native_notification(
                 "🍖 Not Enough Dumplings!",
-                f"Need 🥟 5 dumplings (have {self.dumplings})",
+                f"Need 🥟 5 dumplings (have {dumplings})",
                 "Keep coding and learning to earn more dumplings!"
             )
     
     @rumps.clicked("Pet 🫳") 
     def pet(self, sender):
         # Petting is free but gives smaller boost
-        old_state = self.current_state
-        self.current_state = 'excited'
-        self.happiness = min(100, self.happiness + 15)
-        self.health = min(100, self.health + 5)
+        with self.state.transaction():
+            old_state = self.current_state
+            self.current_state = 'excited'
+            self.happiness = min(100, self.happiness + 15)
+            self.health = min(100, self.health + 5)
+            dumplings = self.dumplings
         
         self.update_all_menu_items()
         
         self.send_native_notification(
             "✨ Dino Petted! (Free!)",
             f"Your dino is overjoyed! Happiness: +15",
-            f"Free love! 🥟 {self.dumplings} dumplings saved!"
+            f"Free love! 🥟 {dumplings} dumplings saved!"
         )
         
         def reset_after_petting():
-            time.sleep(2)
             self.current_state = old_state
             self.update_all_menu_items()
         
-        threading.Thread(target=reset_after_petting, daemon=True).start()
+        self.scheduler.after(2, reset_after_petting)
     
     @rumps.clicked("Take Break 🧘")
     def take_break(self, sender):
@@ -893,120 +965,116 @@ class DumplingDino(rumps.App):
         bonus_dumplings = 3
         self.award_dumplings(bonus_dumplings, "Taking a healthy break")
         
-        old_health = self.health
-        old_energy = self.energy
+        with self.state.transaction():
+            old_health = self.health
+            old_energy = self.energy
+            
+            self.health = min(100, self.health + 15)
+            self.energy = min(100, self.energy + 20)
+            self.happiness = min(100, self.happiness + 10)
+            self.social_media_streak = 0
+            health, energy, dumplings = self.health, self.energy, self.dumplings
         
-        self.health = min(100, self.health + 15)
-        self.energy = min(100, self.energy + 20)
-        self.happiness = min(100, self.happiness + 10)
-        self.social_media_streak = 0
         self.last_break_reminder = datetime.now()
         
         self.update_all_menu_items()
         
         self.send_native_notification(
             f"🧘 Break Taken! (🥟 +{bonus_dumplings})",
-            f"Health: +{self.health - old_health} | Energy: +{self.energy - old_energy}",
-            f"Self-care earns dumplings! 🥟 {self.dumplings} total"
+            f"Health: +{health - old_health} | Energy: +{energy - old_energy}",
+            f"Self-care earns dumplings! 🥟 {dumplings} total"
         )
     
     @rumps.clicked("Reset Day")
     def reset(self, sender):
-        # Save session summary before reset
-        session_dumplings = self.dumpling_earning_session
-        
-        self.current_state = 'idle'
-        self.current_website = None
-        self.current_website_category = None
-        self.happiness = 50
-        self.energy = 50
-        self.health = 100
-        self.social_media_streak = 0
-        self.dumpling_earning_session = 0
-        self.productive_time_today = 0
-        self.session_start = datetime.now()
-        
-        old_website_time = self.website_time.copy()
-        
-        self.time_spent = {key: 0 for key in self.time_spent}
-        self.website_time = {}
-        self.daily_websites = []
-        
-        # Reset streaks
-        self.dumpling_streaks = {key: 0 for key in self.dumpling_streaks}
+        # One transaction, so time tracked meanwhile isn't added to the totals being cleared
+        with self.state.transaction():
+            # Save session summary before reset
+            session_dumplings = self.dumpling_earning_session
+            
+            self.current_state = 'idle'
+            self.current_website = None
+            self.current_website_category = None
+            self.happiness = 50
+            self.energy = 50
+            self.health = 100
+            self.social_media_streak = 0
+            self.dumpling_earning_session = 0
+            self.productive_time_today = 0
+            self.session_start = datetime.now()
+            
+            old_website_time = self.website_time.copy()
+            
+            self.time_spent = {key: 0 for key in self.time_spent}
+            self.website_time = {}
+            self.daily_websites.clear()
+            self.store.reset_tracking(self.store_app)
+            
+            # Reset streaks
+            self.dumpling_streaks = {key: 0 for key in self.dumpling_streaks}
+            dumplings = self.dumplings
         
         self.update_all_menu_items()
         
         self.send_native_notification(
             "🔄 Day Reset Complete!",
             f"🥟 Session earned: {session_dumplings:.1f} dumplings",
-            f"Fresh start! Current balance: 🥟 {self.dumplings} dumplings"
+            f"Fresh start! Current balance: 🥟 {dumplings} dumplings"
         )
     
     def save_data(self):
         """Enhanced save with dumpling data"""
         try:
-            data = {
-                'happiness': self.happiness,
-                'energy': self.energy, 
-                'health': self.health,
-                'dumplings': self.dumplings,
-                'total_dumplings_earned': self.total_dumplings_earned,
-                'dumpling_earning_session': self.dumpling_earning_session,
-                'dumpling_streaks': self.dumpling_streaks,
-                'productive_time_today': self.productive_time_today,
-                'time_spent': self.time_spent,
-                'website_time': self.website_time,
-                'daily_websites': self.daily_websites,
-                'session_start': self.session_start.isoformat(),
-                'social_media_streak': self.social_media_streak,
-                'notifications_enabled': self.notifications_enabled
-            }
+            state = self.state.snapshot()
+            data = {field: state[field] for field in
+                    ('happiness', 'energy', 'health', 'dumplings', 'total_dumplings_earned',
+                     'dumpling_earning_session', 'dumpling_streaks', 'productive_time_today',
+                     'social_media_streak')}
+            data['session_start'] = self.session_start.isoformat()
+            data['notifications_enabled'] = self.notifications_enabled
             
-            save_dir = os.path.expanduser("~/.dino_tamagotchi")
-            os.makedirs(save_dir, exist_ok=True)
-            
-            with open(os.path.join(save_dir, "dumpling_dino_data.json"), "w") as f:
-                json.dump(data, f)
+            # Time totals and visits were recorded as they happened; flush them with the stats
+            self.store.save_state(self.store_app, data)
+            self.store.flush()
         except Exception as e:
             print(f"Error saving data: {e}")
     
     def load_data(self):
         """Enhanced load with dumpling data"""
         try:
-            save_dir = os.path.expanduser("~/.dino_tamagotchi")
-            data_file = os.path.join(save_dir, "dumpling_dino_data.json")
+            data = self.store.load_state(self.store_app)
             
-            if os.path.exists(data_file):
-                with open(data_file, "r") as f:
-                    data = json.load(f)
-                
-                self.happiness = data.get('happiness', 50)
-                self.energy = data.get('energy', 50)
-                self.health = data.get('health', 100)
-                self.dumplings = data.get('dumplings', 0)
-                self.total_dumplings_earned = data.get('total_dumplings_earned', 0)
-                self.dumpling_earning_session = data.get('dumpling_earning_session', 0)
-                self.dumpling_streaks = data.get('dumpling_streaks', {'coding': 0, 'productive_browsing': 0, 'daily_goal': 0})
-                self.productive_time_today = data.get('productive_time_today', 0)
-                self.time_spent = data.get('time_spent', self.time_spent)
-                self.website_time = data.get('website_time', {})
-                self.daily_websites = data.get('daily_websites', [])
-                self.social_media_streak = data.get('social_media_streak', 0)
-                self.notifications_enabled = data.get('notifications_enabled', True)
-                
-                try:
-                    saved_start = datetime.fromisoformat(data.get('session_start', datetime.now().isoformat()))
-                    if (datetime.now() - saved_start).days > 0:
-                        self.time_spent = {key: 0 for key in self.time_spent}
-                        self.daily_websites = []
-                        self.dumpling_earning_session = 0
-                        self.productive_time_today = 0
+            with self.state.transaction():
+                if data is not None:
+                    self.happiness = data.get('happiness', 50)
+                    self.energy = data.get('energy', 50)
+                    self.health = data.get('health', 100)
+                    self.dumplings = data.get('dumplings', 0)
+                    self.total_dumplings_earned = data.get('total_dumplings_earned', 0)
+                    self.dumpling_earning_session = data.get('dumpling_earning_session', 0)
+                    self.dumpling_streaks = data.get('dumpling_streaks', {'coding': 0, 'productive_browsing': 0, 'daily_goal': 0})
+                    self.productive_time_today = data.get('productive_time_today', 0)
+                    self.social_media_streak = data.get('social_media_streak', 0)
+                    self.notifications_enabled = data.get('notifications_enabled', True)
+                    
+                    try:
+                        saved_start = datetime.fromisoformat(data.get('session_start', datetime.now().isoformat()))
+                        if (datetime.now() - saved_start).days > 0:
+                            self.dumpling_earning_session = 0
+                            self.productive_time_today = 0
+                            self.session_start = datetime.now()
+                        else:
+                            self.session_start = saved_start
+                    except:
                         self.session_start = datetime.now()
-                    else:
-                        self.session_start = saved_start
-                except:
-                    self.session_start = datetime.now()
+                
+                # Today's totals and visits come straight from their tables
+                self.time_spent.update(self.store.state_totals(self.store_app))
+                self.website_time = dict(self.store.domain_totals(self.store_app))
+                self.daily_websites = deque(self.store.visits(self.store_app, limit=RECENT_VISITS),
+                                            maxlen=RECENT_VISITS)
+            
+            self.store.prune_visits(self.store_app)
                     
         except Exception as e:
             print(f"Error loading data: {e}")
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Supabase Realtime friend feed for Dino Tamagotchi
+Optional push mode for friends data: instead of polling users, subscribe to
+row changes of the user's friends over Supabase Realtime (Phoenix channels
+on a websocket) and apply them to the local friend_state table as they
+arrive. Every (re)connect starts from a fresh snapshot, so nothing that
+changed while disconnected is missed.
+realtime_standin.py serves the same protocol locally, for trying this
+without a Supabase project.
+"""
+
+import asyncio
+import json
+import threading
+from datetime import datetime
+
+import websockets
+
+from supabase_sync import Backoff
+
+HEARTBEAT_INTERVAL = 25  # seconds; Realtime drops sockets silent for 60
+FILTER_CHUNK = 100  # values Realtime accepts in one in.() filter
+
+
+def realtime_url(supabase_url, key):
+    """Realtime websocket endpoint of a Supabase project"""
+    base = supabase_url.rstrip('/').replace('https://', 'wss://', 1).replace('http://', 'ws://', 1)
+    return f"{base}/realtime/v1/websocket?apikey={key}&vsn=1.0.0"
+
+
+def is_older(record, current):
+    """True if record is an older version of the row than current (by updated_at)"""
+    try:
+        return (datetime.fromisoformat(record['updated_at'].replace('Z', '+00:00')) <
+                datetime.fromisoformat(current['updated_at'].replace('Z', '+00:00')))
+    except (KeyError, AttributeError, TypeError, ValueError):
+        return False
+
+
+class FriendFeed:
+    """Keeps store's friend_state current from Realtime row changes
+
+    snapshot() returns the friends' current rows (like fetch_friends) and is
+    called on every connect and whenever the friend set changes. on_change(row)
+    is called from the feed's thread after each applied change (with None when
+    the friend set itself changed). While is_live() the friend_state table is
+    as fresh as the server; otherwise callers should fall back to polling.
+    access_token, if given, must be a signed-in user's JWT; without one the
+    channel is authorized by the apikey in url alone.
+    """
+
+    def __init__(self, url, user_id, store, snapshot, on_change=None, access_token=None, backoff=None):
+        self.url = url
+        self.user_id = user_id
+        self.store = store
+        self.snapshot = snapshot
+        self.on_change = on_change
+        self.access_token = access_token
+        self.backoff = backoff or Backoff(base=2, maximum=300)
+        self.ref = 0
+        self.topic = None
+        self.joined_ids = None
+        self.live = threading.Event()
+        self.stopped = threading.Event()
+        self.loop = None
+        self.ws = None
+        self.wakeup = None
+        self.thread = threading.Thread(target=lambda: asyncio.run(self._main()), daemon=True)
+        self.thread.start()
+
+    def is_live(self):
+        return self.live.is_set()
+
+    def refresh(self):
+        """Take a new snapshot and resubscribe (the friend set changed)"""
+        self._call_soon(self._reconnect_now)
+
+    def stop(self, timeout=5):
+        """Disconnect and stop the feed's thread"""
+        self.stopped.set()
+        self._call_soon(self._reconnect_now)
+        if self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=timeout)
+
+    def _call_soon(self, callback):
+        loop = self.loop
+        if loop and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(callback)
+            except RuntimeError:
+                pass  # loop just shut down
+
+    def _reconnect_now(self):
+        self.wakeup.set()
+        if self.ws is not None:
+            asyncio.ensure_future(self.ws.close())
+
+    async def _main(self):
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        while not self.stopped.is_set():
+            self.wakeup.clear()
+            try:
+                await self._session()
+            except Exception as e:
+                print(f"📴 Realtime friend feed disconnected: {e}")
+            self.live.clear()
+            self.ws = None
+            if self.stopped.is_set() or self.wakeup.is_set():
+                continue
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.backoff.next_delay())
+            except asyncio.TimeoutError:
+                pass
+
+    async def _session(self):
+        async with websockets.connect(self.url) as ws:
+            self.ws = ws
+            self.topic = None
+            self.joined_ids = None
+            heartbeat = asyncio.ensure_future(self._heartbeat(ws))
+            try:
+                await self._resync(ws)
+                self.live.set()
+                self.backoff.reset()
+                print("📡 Realtime friend feed connected")
+                async for message in ws:
+                    await self._handle(ws, json.loads(message))
+            finally:
+                heartbeat.cancel()
+
+    async def _resync(self, ws):
+        """Subscribe to the friends we know of, then reload them (and resubscribe if the set changed)
+
+        Subscribing before the snapshot means no change can slip in between;
+        changes that arrive meanwhile are checked against updated_at.
+        """
+        known = sorted(friend['user_id'] for friend in self.store.friends())
+        if known != self.joined_ids:
+            await self._join(ws, known)
+        rows = await asyncio.get_running_loop().run_in_executor(None, self.snapshot)
+        self.store.replace_friends(rows)
+        ids = sorted(row['user_id'] for row in rows)
+        if ids != self.joined_ids:
+            await self._join(ws, ids)
+
+    async def _join(self, ws, friend_ids):
+        if self.topic:
+            await self._send(ws, self.topic, 'phx_leave', {})
+        # New friendships of ours show up as friends rows; friends' stats as users rows
+        changes = [{'event': '*', 'schema': 'public', 'table': 'friends', 'filter': f"user_id=eq.{self.user_id}"}]
+        for start in range(0, len(friend_ids), FILTER_CHUNK):
+            chunk = friend_ids[start:start + FILTER_CHUNK]
+            changes.append({'event': 'UPDATE', 'schema': 'public', 'table': 'users',
+                            'filter': f"user_id=in.({','.join(chunk)})"})
+        self.topic = f"realtime:friends-{self.user_id}-{self.ref + 1}"
+        payload = {'config': {'broadcast': {'self': False}, 'presence': {'key': ''},
+                              'postgres_changes': changes}}
+        if self.access_token:
+            payload['access_token'] = self.access_token
+        await self._send(ws, self.topic, 'phx_join', payload)
+        self.joined_ids = friend_ids
+
+    async def _heartbeat(self, ws):
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            await self._send(ws, 'phoenix', 'heartbeat', {})
+
+    async def _send(self, ws, topic, event, payload):
+        self.ref += 1
+        await ws.send(json.dumps({'topic': topic, 'event': event, 'payload': payload, 'ref': str(self.ref)}))
+
+    async def _handle(self, ws, message):
+        event = message.get('event')
+        payload = message.get('payload') or {}
+        if message.get('topic') not in (self.topic, 'phoenix'):
+            return  # left-over replies from a channel we already left
+
+        if event == 'phx_reply' and payload.get('status') == 'error':
+            raise ConnectionError(f"Realtime refused the subscription: {payload.get('response')}")
+        if event in ('phx_error', 'phx_close') or (event == 'system' and payload.get('status') == 'error'):
+            raise ConnectionError(f"Realtime channel closed: {payload.get('message', event)}")
+        if event != 'postgres_changes':
+            return
+
+        data = payload.get('data') or {}
+        if data.get('table') == 'friends':
+            await self._resync(ws)
+            if self.on_change:
+                self.on_change(None)
+            return
+
+        record = data.get('record') or {}
+        current = self.store.friend(record.get('user_id'))
+        if current is None or is_older(record, current):
+            return
+        row = dict(current, **{key: value for key, value in record.items() if key in current})
+        self.store.put_friend(row)
+        if self.on_change:
+            self.on_change(row)
@@ -51,6 +51,16 @@ mkdir -p "$APP_DIR"
 # Copy files
 echo "📋 Copying application files..."
 cp supabase_dino.py "$APP_DIR/"
+cp activity_detection.py "$APP_DIR/"
+cp website_categorizer.py "$APP_DIR/"
+cp state_journal.py "$APP_DIR/"
+cp local_store.py "$APP_DIR/"
+cp supabase_sync.py "$APP_DIR/"
+cp friend_realtime.py "$APP_DIR/"
+cp leaderboard.py "$APP_DIR/"
+cp menu_view.py "$APP_DIR/"
+cp scheduler.py "$APP_DIR/"
+cp dino_state.py "$APP_DIR/"
 cp requirements.txt "$APP_DIR/"
 
 # Create launcher script
@@ -110,6 +120,16 @@ chmod +x "$APP_BUNDLE/Contents/MacOS/DinoTamagotchi"
 
 # Copy Python script to Resources
 cp supabase_dino.py "$APP_BUNDLE/Contents/Resources/"
+cp activity_detection.py "$APP_BUNDLE/Contents/Resources/"
+cp website_categorizer.py "$APP_BUNDLE/Contents/Resources/"
+cp state_journal.py "$APP_BUNDLE/Contents/Resources/"
+cp local_store.py "$APP_BUNDLE/Contents/Resources/"
+cp supabase_sync.py "$APP_BUNDLE/Contents/Resources/"
+cp friend_realtime.py "$APP_BUNDLE/Contents/Resources/"
+cp leaderboard.py "$APP_BUNDLE/Contents/Resources/"
+cp menu_view.py "$APP_BUNDLE/Contents/Resources/"
+cp scheduler.py "$APP_BUNDLE/Contents/Resources/"
+cp dino_state.py "$APP_BUNDLE/Contents/Resources/"
 
 # Create simple icon (text-based)
 echo "🦕" > "$APP_BUNDLE/Contents/Resources/icon.txt"
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Incremental friends leaderboard for Dino Tamagotchi
+Keeps us and our friends ordered by session dumplings in an indexable skip
+list, so applying one friend's new score, and asking anyone's rank, is
+O(log n) instead of re-sorting everyone. Every move is checked against our
+own position, which makes "someone just passed you" exact: it is emitted
+as an event the moment the scores cross, not guessed from a snapshot.
+"""
+
+import random
+import threading
+from collections import deque
+
+MAX_LEVEL = 16  # plenty for friend lists (2**16 players before lookups slow down)
+
+
+class _Node:
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key, level):
+        self.key = key
+        self.next = [None] * level
+        self.width = [1] * level  # bottom-level steps to next[i]
+
+
+class RankedSkipList:
+    """Sorted keys with O(log n) insert, remove, index-of-key and key-at-index"""
+
+    def __init__(self, seed=None):
+        self.random = random.Random(seed)
+        self.tail = _Node(None, MAX_LEVEL)
+        self.head = _Node(None, MAX_LEVEL)
+        self.head.next = [self.tail] * MAX_LEVEL
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        node = self.head.next[0]
+        while node is not self.tail:
+            yield node.key
+            node = node.next[0]
+
+    def insert(self, key):
+        chain, positions = self._find(key)
+        position = positions[0] + 1
+        level = 1
+        while level < MAX_LEVEL and self.random.random() < 0.5:
+            level += 1
+
+        node = _Node(key, level)
+        for i in range(level):
+            previous = chain[i]
+            node.next[i] = previous.next[i]
+            node.width[i] = previous.width[i] - (position - 1 - positions[i])
+            previous.next[i] = node
+            previous.width[i] = position - positions[i]
+        for i in range(level, MAX_LEVEL):
+            chain[i].width[i] += 1
+        self.size += 1
+
+    def remove(self, key):
+        chain, _ = self._find(key)
+        node = chain[0].next[0]
+        if node is self.tail or node.key != key:
+            raise KeyError(key)
+        for i in range(MAX_LEVEL):
+            if chain[i].next[i] is node:
+                chain[i].width[i] += node.width[i] - 1
+                chain[i].next[i] = node.next[i]
+            else:
+                chain[i].width[i] -= 1
+        self.size -= 1
+
+    def index(self, key):
+        """Position of key in ascending order (KeyError if absent)"""
+        chain, positions = self._find(key)
+        node = chain[0].next[0]
+        if node is self.tail or node.key != key:
+            raise KeyError(key)
+        return positions[0]
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        node, position = self.head, 0
+        for i in reversed(range(MAX_LEVEL)):
+            while node.next[i] is not self.tail and position + node.width[i] <= index + 1:
+                position += node.width[i]
+                node = node.next[i]
+        return node.key
+
+    def between(self, low, high):
+        """Keys strictly between low and high, ascending"""
+        chain, _ = self._find(low)
+        node = chain[0].next[0]
+        while node is not self.tail and node.key <= low:
+            node = node.next[0]
+        while node is not self.tail and node.key < high:
+            yield node.key
+            node = node.next[0]
+
+    def _find(self, key):
+        """Last node before key on each level, and those nodes' positions"""
+        chain = [None] * MAX_LEVEL
+        positions = [0] * MAX_LEVEL
+        node, position = self.head, 0
+        for i in reversed(range(MAX_LEVEL)):
+            while node.next[i] is not self.tail and node.next[i].key < key:
+                position += node.width[i]
+                node = node.next[i]
+            chain[i] = node
+            positions[i] = position
+        return chain, positions
+
+
+class Leaderboard:
+    """Us and our friends ranked by session dumplings, updated one score at a time
+
+    Ties rank by user_id (descending), like the get_leaderboard RPC. Moves
+    that cross our own score emit events: 'overtaken' (user_id is now ahead
+    of us), 'overtook' (we are now ahead of user_id) and 'entered_top'
+    (user_id moved into the top `top`). Players joining or leaving never
+    emit events, so loading the first snapshot is quiet.
+    """
+
+    def __init__(self, me, top=3, max_events=50):
+        self.me = me
+        self.top_count = top
+        self.ranked = RankedSkipList()
+        self.keys = {}  # user_id -> (score, user_id)
+        self.rows = {}
+        self.events = deque(maxlen=max_events)
+        self.lock = threading.RLock()
+
+    def update(self, user_id, score, row=None):
+        """Set user_id's score (adding them if new); returns the events this caused"""
+        new = (float(score or 0), user_id)
+        with self.lock:
+            if row is not None:
+                self.rows[user_id] = row
+            old = self.keys.get(user_id)
+            if old == new:
+                return []
+            if old is None:
+                self.ranked.insert(new)
+                self.keys[user_id] = new
+                return []
+
+            old_rank = self._rank(old)
+            self.ranked.remove(old)
+            self.ranked.insert(new)
+            self.keys[user_id] = new
+
+            events = []
+            mine = self.keys.get(self.me)
+            if mine is not None:
+                if user_id == self.me:
+                    passed = 'overtook' if new > old else 'overtaken'
+                    for key in self.ranked.between(min(old, new), max(old, new)):
+                        events.append({'type': passed, 'user_id': key[1]})
+                elif old < mine < new:
+                    events.append({'type': 'overtaken', 'user_id': user_id})
+                elif new < mine < old:
+                    events.append({'type': 'overtook', 'user_id': user_id})
+            if self._rank(new) <= self.top_count < old_rank:
+                events.append({'type': 'entered_top', 'user_id': user_id})
+
+            self.events.extend(events)
+            return events
+
+    def remove(self, user_id):
+        with self.lock:
+            key = self.keys.pop(user_id, None)
+            self.rows.pop(user_id, None)
+            if key is not None:
+                self.ranked.remove(key)
+
+    def sync(self, rows, score_field='session_dumplings'):
+        """Apply a full list of friend rows: changed scores move, missing friends leave"""
+        with self.lock:
+            seen = {self.me}
+            events = []
+            for row in rows:
+                seen.add(row['user_id'])
+                events.extend(self.update(row['user_id'], row.get(score_field), row))
+            for user_id in [user_id for user_id in self.keys if user_id not in seen]:
+                self.remove(user_id)
+            return events
+
+    def drain_events(self):
+        """Events since the last drain, oldest first"""
+        with self.lock:
+            events = list(self.events)
+            self.events.clear()
+            return events
+
+    def rank(self, user_id):
+        """1-based rank of user_id, or None if they're not on the board"""
+        with self.lock:
+            key = self.keys.get(user_id)
+            return self._rank(key) if key is not None else None
+
+    def is_ahead(self, user_id, other_id):
+        with self.lock:
+            key, other = self.keys.get(user_id), self.keys.get(other_id)
+            return key is not None and other is not None and key > other
+
+    def row(self, user_id):
+        with self.lock:
+            key = self.keys.get(user_id)
+            if key is None:
+                return None
+            return dict(self.rows.get(user_id, {'user_id': user_id}), session_dumplings=key[0],
+                        rank=self._rank(key), total=len(self.ranked), is_me=user_id == self.me)
+
+    def __len__(self):
+        return len(self.ranked)
+
+    def board(self, neighbors=1):
+        """Same shape as supabase_sync.fetch_leaderboard: top, me, around and total"""
+        with self.lock:
+            total = len(self.ranked)
+            top = [self.row(self.ranked[total - rank][1]) for rank in range(1, min(self.top_count, total) + 1)]
+            me = self.row(self.me)
+            around = []
+            if me:
+                first, last = max(1, me['rank'] - neighbors), min(total, me['rank'] + neighbors)
+                around = [self.row(self.ranked[total - rank][1]) for rank in range(first, last + 1)]
+            return {'top': top, 'me': me, 'around': around, 'total': total}
+
+    def _rank(self, key):
+        return len(self.ranked) - self.ranked.index(key)
@@ -0,0 +1,548 @@
+#!/usr/bin/env python3
+"""
+Local SQLite store for Dino Tamagotchi
+One WAL-mode database under ~/.dino_tamagotchi replaces the scattered save
+files: identity and settings, per-app stats, per-day per-state totals,
+per-domain time, the visit log with hourly per-category rollups, custom
+categories, the local multiplayer player table, the friend state kept
+current by the Realtime feed and the outbox of Supabase writes waiting for
+a connection. Time tracking calls only
+buffer their increments (a new visit is the one row written right away, so
+SQLite can hand out its id even with several variants sharing the file);
+flush() (run by the write-behind saver) writes them in one transaction, and the reports read through indexed queries instead of
+re-summing JSON blobs. Raw visits are pruned after VISIT_RETENTION_DAYS; the
+rollups keep the totals.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from state_journal import StateJournal
+
+DEFAULT_DB_PATH = os.path.expanduser("~/.dino_tamagotchi/dino.db")
+LEGACY_DIR = os.path.expanduser("~/.dino_tamagotchi")
+LEGACY_SHARED_DIR = os.path.expanduser("~/Desktop/DinoTamagotchi/shared_data")  # old multiplayer player files
+VISIT_RETENTION_DAYS = 7
+RECENT_VISITS = 50  # visits an app keeps in memory
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS app_state (
+    app TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (app, key)
+);
+
+CREATE TABLE IF NOT EXISTS state_time (
+    app TEXT NOT NULL,
+    day TEXT NOT NULL,
+    state TEXT NOT NULL,
+    seconds REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (app, day, state)
+);
+
+CREATE TABLE IF NOT EXISTS domain_time (
+    app TEXT NOT NULL,
+    day TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    seconds REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (app, day, domain)
+);
+CREATE INDEX IF NOT EXISTS idx_domain_time_domain ON domain_time(app, domain);
+
+CREATE TABLE IF NOT EXISTS visits (
+    id INTEGER PRIMARY KEY,
+    app TEXT NOT NULL,
+    day TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    category TEXT,
+    duration REAL NOT NULL DEFAULT 0,
+    url TEXT,
+    title TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_visits_day ON visits(app, day, category);
+
+CREATE TABLE IF NOT EXISTS hourly_time (
+    app TEXT NOT NULL,
+    hour TEXT NOT NULL,
+    category TEXT NOT NULL,
+    seconds REAL NOT NULL DEFAULT 0,
+    visits INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (app, hour, category)
+);
+
+CREATE TABLE IF NOT EXISTS custom_categories (
+    pattern TEXT PRIMARY KEY,
+    category TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS players (
+    user_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_players_updated ON players(updated_at);
+
+CREATE TABLE IF NOT EXISTS friend_state (
+    user_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS outbox (
+    key TEXT PRIMARY KEY,
+    op TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    match TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    created_at TEXT NOT NULL
+);
+"""
+
+# Keys of the old save files that now live in their own tables
+TRACKING_KEYS = ('time_spent', 'website_time', 'daily_websites', 'custom_website_categories')
+
+
+def today():
+    return datetime.now().date().isoformat()
+
+
+def current_hour():
+    return datetime.now().isoformat()[:13]
+
+
+class LocalStore:
+    """Thread-safe wrapper around the local database
+
+    Reads flush pending writes first, so they always see everything that was
+    recorded, including increments the saver has not written yet.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        # Databases from before visits kept their URL and title
+        visit_columns = {row[1] for row in self.conn.execute("PRAGMA table_info(visits)")}
+        for column in ('url', 'title'):
+            if column not in visit_columns:
+                self.conn.execute(f"ALTER TABLE visits ADD COLUMN {column} TEXT")
+        self.conn.commit()
+        self.lock = threading.RLock()
+
+        # Buffered writes, applied by flush()
+        self.pending_state_time = {}  # (app, day, state) -> seconds
+        self.pending_domain_time = {}  # (app, day, domain) -> seconds
+        self.pending_visit_time = {}  # id -> seconds
+        self.pending_hourly = {}  # (app, hour, category) -> [seconds, visits]
+        self.pending_state = {}  # (app, key) -> JSON value
+        self.saved_state = {}  # (app, key) -> JSON value last written
+
+    # --- Settings and identity ---
+
+    def get_setting(self, key, default=None):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_setting(self, key, value):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                              (key, json.dumps(value)))
+
+    # --- Per-app stats (happiness, dumplings, toggles, ...) ---
+
+    def load_state(self, app):
+        """Saved stats for app as a dict, or None if it never saved any"""
+        with self.lock:
+            self._flush()
+            rows = self.conn.execute("SELECT key, value FROM app_state WHERE app = ?", (app,)).fetchall()
+            for key, value in rows:
+                self.saved_state[(app, key)] = value
+        return {key: json.loads(value) for key, value in rows} if rows else None
+
+    def save_state(self, app, state):
+        """Queue the stats that changed since the last save"""
+        with self.lock:
+            for key, value in state.items():
+                encoded = json.dumps(value)
+                if self.saved_state.get((app, key)) != encoded:
+                    self.pending_state[(app, key)] = encoded
+
+    # --- Time tracking ---
+
+    def add_state_time(self, app, state, seconds, day=None):
+        key = (app, day or today(), state)
+        with self.lock:
+            self.pending_state_time[key] = self.pending_state_time.get(key, 0) + seconds
+
+    def add_domain_time(self, app, domain, seconds, day=None):
+        key = (app, day or today(), domain)
+        with self.lock:
+            self.pending_domain_time[key] = self.pending_domain_time.get(key, 0) + seconds
+
+    def log_visit(self, app, domain, category, started_at=None, duration=0, url=None, title=None):
+        """Record the start of a visit; returns its id for add_visit_time
+
+        url and title are kept so recategorize_visits can re-score the visit the
+        way it was categorized (by path and title, not just the domain).
+        """
+        started_at = started_at or datetime.now().isoformat()
+        with self.lock:
+            with self.conn:
+                visit_id = self.conn.execute(
+                    "INSERT INTO visits (app, day, started_at, domain, category, duration, url, title) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (app, started_at[:10], started_at, domain, category, duration, url, title)).lastrowid
+            self._add_hourly(app, started_at[:13], category, duration, visits=1)
+        return visit_id
+
+    def add_visit_time(self, app, visit_id, category, seconds):
+        """Add seconds to a visit and to the current hour's rollup for its category"""
+        with self.lock:
+            self.pending_visit_time[visit_id] = self.pending_visit_time.get(visit_id, 0) + seconds
+            self._add_hourly(app, current_hour(), category, seconds)
+
+    def _add_hourly(self, app, hour, category, seconds, visits=0):
+        totals = self.pending_hourly.setdefault((app, hour, category or ''), [0, 0])
+        totals[0] += seconds
+        totals[1] += visits
+
+    def flush(self):
+        """Write everything buffered in one transaction"""
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if not (self.pending_state_time or self.pending_domain_time or
+                self.pending_visit_time or self.pending_hourly or self.pending_state):
+            return
+        try:
+            self._write_pending()
+        except sqlite3.OperationalError as e:
+            # Locked by another variant, disk full, ...: keep everything for the next flush
+            print(f"Local store flush deferred: {e}")
+            return
+        except sqlite3.DatabaseError as e:
+            # Rejected rows would fail every retry the same way; drop them rather than wedge the buffer
+            print(f"Dropping local store changes that can't be written: {e}")
+        else:
+            self.saved_state.update(self.pending_state)
+        self.pending_state_time.clear()
+        self.pending_domain_time.clear()
+        self.pending_visit_time.clear()
+        self.pending_hourly.clear()
+        self.pending_state.clear()
+
+    def _write_pending(self):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO state_time (app, day, state, seconds) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (app, day, state) DO UPDATE SET seconds = seconds + excluded.seconds",
+                [key + (seconds,) for key, seconds in self.pending_state_time.items()])
+            self.conn.executemany(
+                "INSERT INTO domain_time (app, day, domain, seconds) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (app, day, domain) DO UPDATE SET seconds = seconds + excluded.seconds",
+                [key + (seconds,) for key, seconds in self.pending_domain_time.items()])
+            self.conn.executemany(
+                "UPDATE visits SET duration = duration + ? WHERE id = ?",
+                [(seconds, visit_id) for visit_id, seconds in self.pending_visit_time.items()])
+            self.conn.executemany(
+                "INSERT INTO hourly_time (app, hour, category, seconds, visits) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (app, hour, category) DO UPDATE SET seconds = seconds + excluded.seconds, "
+                "visits = visits + excluded.visits",
+                [key + tuple(totals) for key, totals in self.pending_hourly.items()])
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO app_state (app, key, value) VALUES (?, ?, ?)",
+                [key + (value,) for key, value in self.pending_state.items()])
+
+    def reset_tracking(self, app, day=None):
+        """Forget an app's per-domain totals and the given day's state time and visits ("Reset Day")"""
+        day = day or today()
+        with self.lock, self.conn:
+            self._flush()
+            self.conn.execute("DELETE FROM domain_time WHERE app = ?", (app,))
+            self.conn.execute("DELETE FROM state_time WHERE app = ? AND day = ?", (app, day))
+            self.conn.execute("DELETE FROM visits WHERE app = ? AND day = ?", (app, day))
+            self.conn.execute("DELETE FROM hourly_time WHERE app = ? AND hour BETWEEN ? AND ?",
+                              (app, f"{day}T00", f"{day}T23"))
+
+    def recategorize_visits(self, app, categorize_many, rules_version, day=None):
+        """Re-score a day's visits with categorize_many(urls, titles) and rebuild that day's rollups
+
+        Only runs when rules_version differs from the rules the app last re-scored
+        with; returns whether it did. Visits logged without a URL (imported from
+        the old save files) keep their category.
+        """
+        day = day or today()
+        setting = f"visit_rules:{app}"
+        if self.get_setting(setting) == rules_version:
+            return False
+        with self.lock, self.conn:
+            self._flush()
+            rows = self.conn.execute("SELECT id, url, title FROM visits WHERE app = ? AND day = ? AND url IS NOT NULL",
+                                     (app, day)).fetchall()
+            if rows:
+                categories = categorize_many([url for _, url, _ in rows], [title or "" for _, _, title in rows])
+                self.conn.executemany("UPDATE visits SET category = ? WHERE id = ?",
+                                      [(category, visit_id) for (visit_id, _, _), category in zip(rows, categories)])
+            # Rebuilt rollups charge each visit to the hour it started in
+            self.conn.execute("DELETE FROM hourly_time WHERE app = ? AND hour BETWEEN ? AND ?",
+                              (app, f"{day}T00", f"{day}T23"))
+            self.conn.execute(
+                "INSERT INTO hourly_time (app, hour, category, seconds, visits) "
+                "SELECT app, substr(started_at, 1, 13), COALESCE(category, ''), SUM(duration), COUNT(*) "
+                "FROM visits WHERE app = ? AND day = ? GROUP BY 2, 3", (app, day))
+            self.conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                              (setting, json.dumps(rules_version)))
+        return True
+
+    def prune_visits(self, app, keep_days=VISIT_RETENTION_DAYS):
+        """Drop raw visits older than keep_days; their time stays in the hourly rollups"""
+        cutoff = (datetime.now().date() - timedelta(days=keep_days)).isoformat()
+        with self.lock, self.conn:
+            self._flush()
+            self.conn.execute("DELETE FROM visits WHERE app = ? AND day < ?", (app, cutoff))
+
+    # --- Reports ---
+
+    def state_totals(self, app, day=None):
+        """{state: seconds} for one day"""
+        with self.lock:
+            self._flush()
+            rows = self.conn.execute("SELECT state, seconds FROM state_time WHERE app = ? AND day = ?",
+                                     (app, day or today())).fetchall()
+        return dict(rows)
+
+    def domain_totals(self, app, limit=None):
+        """[(domain, seconds)] across all days, biggest first"""
+        query = "SELECT domain, SUM(seconds) AS total FROM domain_time WHERE app = ? GROUP BY domain ORDER BY total DESC"
+        params = (app,)
+        if limit is not None:
+            query += " LIMIT ?"
+            params += (limit,)
+        with self.lock:
+            self._flush()
+            return self.conn.execute(query, params).fetchall()
+
+    def domain_count(self, app):
+        with self.lock:
+            self._flush()
+            return self.conn.execute("SELECT COUNT(DISTINCT domain) FROM domain_time WHERE app = ?",
+                                     (app,)).fetchone()[0]
+
+    def category_totals(self, app, day=None):
+        """{category: seconds} of one day's browsing, from the hourly rollups"""
+        day = day or today()
+        with self.lock:
+            self._flush()
+            rows = self.conn.execute(
+                "SELECT category, SUM(seconds) FROM hourly_time WHERE app = ? AND hour BETWEEN ? AND ? "
+                "AND category != '' GROUP BY category", (app, f"{day}T00", f"{day}T23")).fetchall()
+        return dict(rows)
+
+    def hourly_totals(self, app, day=None):
+        """[(hour, category, seconds, visits)] for one day, in hour order"""
+        day = day or today()
+        with self.lock:
+            self._flush()
+            return self.conn.execute(
+                "SELECT hour, category, seconds, visits FROM hourly_time WHERE app = ? AND hour BETWEEN ? AND ? "
+                "ORDER BY hour", (app, f"{day}T00", f"{day}T23")).fetchall()
+
+    def visits(self, app, day=None, limit=None):
+        """One day's visits in order (only the latest limit, if given), as the dicts daily_websites holds"""
+        query = ("SELECT id, domain, category, started_at, duration FROM visits WHERE app = ? AND day = ? "
+                 "ORDER BY id DESC")
+        params = (app, day or today())
+        if limit is not None:
+            query += " LIMIT ?"
+            params += (limit,)
+        with self.lock:
+            self._flush()
+            rows = self.conn.execute(query, params).fetchall()
+        return [{'id': visit_id, 'domain': domain, 'category': category, 'timestamp': started_at,
+                 'duration': duration} for visit_id, domain, category, started_at, duration in reversed(rows)]
+
+    # --- Custom categories ---
+
+    def custom_categories(self):
+        with self.lock:
+            return dict(self.conn.execute("SELECT pattern, category FROM custom_categories").fetchall())
+
+    def set_custom_category(self, pattern, category):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO custom_categories (pattern, category) VALUES (?, ?)",
+                              (pattern, category))
+
+    # --- Local multiplayer ---
+
+    def put_player(self, user_id, data, updated_at=None, replace=True):
+        with self.lock, self.conn:
+            self.conn.execute(f"INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO players "
+                              "(user_id, data, updated_at) VALUES (?, ?, ?)",
+                              (user_id, json.dumps(data), updated_at or datetime.now().isoformat()))
+
+    def players(self, exclude_user_id=None):
+        """Every player's latest data, most recently active first"""
+        with self.lock:
+            rows = self.conn.execute("SELECT data FROM players WHERE user_id != ? ORDER BY updated_at DESC",
+                                     (exclude_user_id or '',)).fetchall()
+        return [json.loads(data) for data, in rows]
+
+    # --- Supabase friends, as last seen by the Realtime feed ---
+
+    def replace_friends(self, rows):
+        """Start over from a full snapshot of the friends' rows"""
+        now = datetime.now().isoformat()
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM friend_state")
+            self.conn.executemany("INSERT OR REPLACE INTO friend_state (user_id, data, updated_at) VALUES (?, ?, ?)",
+                                  [(row['user_id'], json.dumps(row), now) for row in rows])
+
+    def put_friend(self, row):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO friend_state (user_id, data, updated_at) VALUES (?, ?, ?)",
+                              (row['user_id'], json.dumps(row), datetime.now().isoformat()))
+
+    def friend(self, user_id):
+        """A friend's row, or None if user_id is not a friend"""
+        with self.lock:
+            row = self.conn.execute("SELECT data FROM friend_state WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def friends(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT data FROM friend_state ORDER BY user_id").fetchall()
+        return [json.loads(data) for data, in rows]
+
+    # --- Pending Supabase writes ---
+
+    def outbox_put(self, op, table, match, payload):
+        """Queue a write, merging it into a pending write of the same op on the same row"""
+        key = json.dumps([op, table, match], sort_keys=True)
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT payload FROM outbox WHERE key = ?", (key,)).fetchone()
+            merged = dict(json.loads(row[0]), **payload) if row else payload
+            seq = self.conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM outbox").fetchone()[0]
+            if row:
+                self.conn.execute("UPDATE outbox SET payload = ?, seq = ? WHERE key = ?",
+                                  (json.dumps(merged), seq, key))
+            else:
+                self.conn.execute(
+                    "INSERT INTO outbox (key, op, table_name, match, payload, seq, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, op, table, json.dumps(match), json.dumps(merged), seq, datetime.now().isoformat()))
+
+    def outbox_items(self):
+        """Pending writes, oldest first"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT key, op, table_name, match, payload, seq FROM outbox ORDER BY created_at, seq").fetchall()
+        return [{'key': key, 'op': op, 'table': table, 'match': json.loads(match),
+                 'payload': json.loads(payload), 'seq': seq} for key, op, table, match, payload, seq in rows]
+
+    def outbox_remove(self, key, seq):
+        """Drop a sent write, unless something was merged into it meanwhile"""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM outbox WHERE key = ? AND seq = ?", (key, seq))
+
+    def outbox_count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    # --- One-time import of the old flat files ---
+
+    def migrate_legacy_files(self, app, save_file=None, legacy_dir=LEGACY_DIR, shared_dir=LEGACY_SHARED_DIR):
+        """Import user_id.txt, username.txt, custom_categories.json, the shared player files and app's save file once
+
+        The old files are left where they are; a settings flag keeps them from
+        being imported again.
+        """
+        for key in ('user_id', 'username'):
+            path = os.path.join(legacy_dir, f"{key}.txt")
+            if self.get_setting(key) is None and os.path.exists(path):
+                with open(path, 'r') as f:
+                    value = f.read().strip()
+                if value:
+                    self.set_setting(key, value)
+
+        if not self.get_setting('imported:custom_categories.json'):
+            path = os.path.join(legacy_dir, "custom_categories.json")
+            try:
+                if os.path.exists(path):
+                    with open(path, 'r') as f:
+                        for pattern, category in json.load(f).items():
+                            self.set_custom_category(pattern, category)
+            except Exception as e:
+                print(f"Error importing custom categories: {e}")
+            self.set_setting('imported:custom_categories.json', True)
+
+        if not self.get_setting('imported:shared_data'):
+            if os.path.isdir(shared_dir):
+                self._import_players(shared_dir)
+            self.set_setting('imported:shared_data', True)
+
+        if save_file and not self.get_setting(f"imported:{save_file}"):
+            try:
+                data = StateJournal(os.path.join(legacy_dir, save_file)).load()
+                if data:
+                    self._import_save(app, data)
+            except Exception as e:
+                print(f"Error importing {save_file}: {e}")
+            self.set_setting(f"imported:{save_file}", True)
+
+    def _import_players(self, shared_dir):
+        """One <user_id>.json per player, as the local multiplayer mode used to write them"""
+        for filename in sorted(os.listdir(shared_dir)):
+            if not filename.endswith('.json'):
+                continue
+            path = os.path.join(shared_dir, filename)
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+                user_id = data.setdefault('user_id', filename[:-len('.json')])
+                updated_at = data.get('last_activity') or datetime.fromtimestamp(os.path.getmtime(path)).isoformat()
+                # Rows written since (by this or another variant) are newer than the file
+                self.put_player(user_id, data, updated_at=updated_at, replace=False)
+            except Exception as e:
+                print(f"Error importing player file {filename}: {e}")
+
+    def _import_save(self, app, data):
+        try:
+            day = datetime.fromisoformat(data['session_start']).date().isoformat()
+        except (KeyError, TypeError, ValueError):
+            day = today()
+
+        for state, seconds in data.get('time_spent', {}).items():
+            if seconds:
+                self.add_state_time(app, state, seconds, day=day)
+        for domain, seconds in data.get('website_time', {}).items():
+            self.add_domain_time(app, domain, seconds, day=day)
+        for entry in data.get('daily_websites', []):
+            self.log_visit(app, entry.get('domain', ''), entry.get('category'),
+                           started_at=entry.get('timestamp') or f"{day}T00:00:00",
+                           duration=entry.get('duration', 0))
+        for pattern, category in data.get('custom_website_categories', {}).items():
+            self.set_custom_category(pattern, category)
+
+        self.save_state(app, {key: value for key, value in data.items() if key not in TRACKING_KEYS})
+        self.flush()
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            self.conn.close()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Change-driven menu rendering for Dino Tamagotchi
+Every title assignment on a rumps MenuItem (or the app) is a call across
+the Objective-C bridge into AppKit, and the apps used to reassign every
+title on every tick. MenuView remembers what it last pushed to each item
+and only assigns titles that actually changed.
+"""
+
+import threading
+
+
+class MenuView:
+    """Pushes menu titles to rumps, skipping ones that didn't change
+
+    Build a tick's titles as a list of (item, title) pairs (the app itself
+    counts as an item, for the menu bar title) and hand it to render(). Items whose
+    title is also set elsewhere must go through set() or be forget()-ten,
+    or the view will wrongly think they're current.
+    """
+
+    def __init__(self):
+        # MenuItems are dicts (unhashable), so key by id and keep the item alive with its title
+        self.rendered = {}
+        self.lock = threading.Lock()
+
+    def render(self, titles):
+        """Assign the titles that changed; returns how many were pushed"""
+        pushed = 0
+        with self.lock:
+            for item, title in titles:
+                rendered = self.rendered.get(id(item))
+                if rendered is not None and rendered[0] is item and rendered[1] == title:
+                    continue
+                item.title = title
+                self.rendered[id(item)] = (item, title)
+                pushed += 1
+        return pushed
+
+    def set(self, item, title):
+        return self.render([(item, title)])
+
+    def forget(self, item=None):
+        """Make the next render push item's (or every) title again"""
+        with self.lock:
+            if item is None:
+                self.rendered.clear()
+            else:
+                self.rendered.pop(id(item), None)
@@ -0,0 +1,31 @@
+-- Friend code migration for Dino Tamagotchi
+-- Run this once in your Supabase SQL editor if your database was created
+-- before friend codes were stored (supabase_schema.sql already includes it)
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS friend_code VARCHAR(40);
+
+-- Same recipe the app uses: first 4 letters of the username and 6 hex digits
+-- of md5(user_id-username), with more digits if that code is already taken
+CREATE OR REPLACE FUNCTION assign_friend_code()
+RETURNS TRIGGER AS $$
+DECLARE
+    digits INTEGER := 6;
+BEGIN
+    NEW.friend_code := COALESCE(UPPER(NEW.friend_code),
+        UPPER(LEFT(NEW.username, 4)) || '-' || UPPER(LEFT(MD5(NEW.user_id || '-' || NEW.username), digits)));
+    WHILE EXISTS (SELECT 1 FROM users WHERE friend_code = NEW.friend_code AND user_id <> NEW.user_id) LOOP
+        digits := digits + 1;
+        NEW.friend_code := UPPER(LEFT(NEW.username, 4)) || '-' || UPPER(LEFT(MD5(NEW.user_id || '-' || NEW.username), digits));
+    END LOOP;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS assign_users_friend_code ON users;
+CREATE TRIGGER assign_users_friend_code BEFORE INSERT OR UPDATE OF friend_code ON users
+    FOR EACH ROW EXECUTE FUNCTION assign_friend_code();
+
+-- Backfill: setting the column (even to NULL) runs the trigger, which fills in the code
+UPDATE users SET friend_code = NULL WHERE friend_code IS NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_users_friend_code ON users(friend_code);
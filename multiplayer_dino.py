@@ -2,21 +2,24 @@
 
 import rumps
 import subprocess
-import time
-import threading
 from datetime import datetime, timedelta
-import json
-import os
 import random
 import re
 import requests
 from urllib.parse import urlparse
 import uuid
+from local_store import LocalStore
+from scheduler import Scheduler, seconds_until
 
 class MultiplayerDino(rumps.App):
     def __init__(self):
         super(MultiplayerDino, self).__init__("🦕", quit_button=None)
         
+        # Local database for identity, stats and the shared player table
+        self.store_app = 'multiplayer_dino'
+        self.store = LocalStore()
+        self.store.migrate_legacy_files(self.store_app, "multiplayer_dino_data.json")
+        
         # User identification
         self.user_id = self.load_or_create_user_id()
         self.username = self.load_or_create_username()
@@ -164,6 +167,9 @@ class MultiplayerDino(rumps.App):
                                     f"Welcome back, {self.username}! 🥟 {self.dumplings} dumplings",
                                     "Add friends to compete and get motivated!")
         
+        # One thread runs the periodic checks and delayed state resets
+        self.scheduler = Scheduler()
+        
         # Start monitoring
         self.start_monitoring()
         self.start_health_monitoring()
@@ -178,49 +184,34 @@ class MultiplayerDino(rumps.App):
     
     def load_or_create_user_id(self):
         """Load existing user ID or create new one"""
-        user_file = os.path.expanduser("~/.dino_tamagotchi/user_id.txt")
-        if os.path.exists(user_file):
-            with open(user_file, 'r') as f:
-                return f.read().strip()
-        else:
+        user_id = self.store.get_setting('user_id')
+        if not user_id:
             # Create new user ID
-            new_id = str(uuid.uuid4())[:8]
-            os.makedirs(os.path.dirname(user_file), exist_ok=True)
-            with open(user_file, 'w') as f:
-                f.write(new_id)
-            return new_id
+            user_id = str(uuid.uuid4())[:8]
+            self.store.set_setting('user_id', user_id)
+        return user_id
     
     def load_or_create_username(self):
         """Load existing username or prompt for new one"""
-        username_file = os.path.expanduser("~/.dino_tamagotchi/username.txt")
-        if os.path.exists(username_file):
-            with open(username_file, 'r') as f:
-                return f.read().strip()
-        else:
+        username = self.store.get_setting('username')
+        if not username:
             # For now, use a default. In real implementation, you'd prompt the user
-            import getpass
-            default_username = getpass.getuser()
             username = f"DinoUser_{self.user_id}"
-            
-            os.makedirs(os.path.dirname(username_file), exist_ok=True)
-            with open(username_file, 'w') as f:
-                f.write(username)
-            return username
+            self.store.set_setting('username', username)
+        return username
     
     def start_social_monitoring(self):
         """Monitor friends' activities and send social pressure notifications"""
         def social_monitor():
-            while True:
-                try:
-                    if self.social_notifications_enabled:
-                        self.check_friends_activity()
-                        self.send_competitive_updates()
-                        self.check_daily_rankings()
-                except Exception as e:
-                    print(f"Social monitor error: {e}")
-                time.sleep(120)  # Check every 2 minutes
+            try:
+                if self.social_notifications_enabled:
+                    self.check_friends_activity()
+                    self.send_competitive_updates()
+                    self.check_daily_rankings()
+            except Exception as e:
+                print(f"Social monitor error: {e}")
         
-        threading.Thread(target=social_monitor, daemon=True).start()
+        self.scheduler.every('social', 120, social_monitor, delay=0)  # Check every 2 minutes
     
     def sync_user_data(self):
         """Sync current user data to backend (simplified for demo)"""
@@ -245,12 +236,8 @@ class MultiplayerDino(rumps.App):
             }
             
             # In a real implementation, this would be an HTTP POST to your backend
-            # For now, we'll save to a shared file that simulates a database
-            shared_dir = os.path.expanduser("~/Desktop/DinoTamagotchi/shared_data")
-            os.makedirs(shared_dir, exist_ok=True)
-            
-            with open(f"{shared_dir}/{self.user_id}.json", 'w') as f:
-                json.dump(user_data, f)
+            # For now, the local player table simulates a database
+            self.store.put_player(self.user_id, user_data)
                 
         except Exception as e:
             print(f"Error syncing user data: {e}")
@@ -259,23 +246,12 @@ class MultiplayerDino(rumps.App):
         """Get friends' current data from backend"""
         try:
             friends_data = []
-            shared_dir = os.path.expanduser("~/Desktop/DinoTamagotchi/shared_data")
-            
-            if not os.path.exists(shared_dir):
-                return friends_data
             
-            # Read all user files (simulating database query)
-            for filename in os.listdir(shared_dir):
-                if filename.endswith('.json') and filename != f"{self.user_id}.json":
-                    try:
-                        with open(f"{shared_dir}/{filename}", 'r') as f:
-                            friend_data = json.load(f)
-                            
-                            # Only include if they're in our friends list or for demo, include all
-                            if not self.friends_list or friend_data['user_id'] in self.friends_list:
-                                friends_data.append(friend_data)
-                    except Exception as e:
-                        print(f"Error reading friend data {filename}: {e}")
+            # Every other player (simulating database query)
+            for friend_data in self.store.players(exclude_user_id=self.user_id):
+                # Only include if they're in our friends list or for demo, include all
+                if not self.friends_list or friend_data.get('user_id') in self.friends_list:
+                    friends_data.append(friend_data)
             
             return friends_data
             
@@ -516,12 +492,17 @@ class MultiplayerDino(rumps.App):
             self.social_toggle,
             rumps.MenuItem("Reset Day", callback=self.reset),
             rumps.separator,
-            rumps.MenuItem("Quit", callback=rumps.quit_application)
+            rumps.MenuItem("Quit", callback=self.quit_app)
         ]
         
         # Initial update
         self.update_all_menu_items()
     
+    def quit_app(self, sender):
+        """Stop background jobs and quit"""
+        self.scheduler.stop()
+        rumps.quit_application()
+    
     @rumps.clicked("📊 View Leaderboard")
     def show_leaderboard(self, sender):
         """Show current leaderboard"""
@@ -605,15 +586,13 @@ class MultiplayerDino(rumps.App):
     def start_dumpling_monitoring(self):
         """Monitor and award dumplings based on activity"""
         def dumpling_monitor():
-            while True:
-                try:
-                    self.calculate_dumpling_earnings()
-                    self.sync_user_data()  # Sync to backend every minute
-                except Exception as e:
-                    print(f"Dumpling monitor error: {e}")
-                time.sleep(60)
+            try:
+                self.calculate_dumpling_earnings()
+                self.sync_user_data()  # Sync to backend every minute
+            except Exception as e:
+                print(f"Dumpling monitor error: {e}")
         
-        threading.Thread(target=dumpling_monitor, daemon=True).start()
+        self.scheduler.every('dumplings', 60, dumpling_monitor, delay=0)
     
     def calculate_dumpling_earnings(self):
         """Calculate and award dumplings based on current activity"""
@@ -789,70 +768,63 @@ class MultiplayerDino(rumps.App):
     
     def start_monitoring(self):
         def monitor():
-            while True:
-                try:
-                    self.check_current_activity()
-                except Exception as e:
-                    print(f"Monitor error: {e}")
-                time.sleep(3)
+            try:
+                self.check_current_activity()
+            except Exception as e:
+                print(f"Monitor error: {e}")
         
-        threading.Thread(target=monitor, daemon=True).start()
+        self.scheduler.every('activity', 3, monitor, delay=0)
     
     def start_health_monitoring(self):
         """Health monitoring with competitive elements"""
         def health_monitor():
-            while True:
-                try:
-                    now = datetime.now()
-                    
-                    if self.health < 30 and (not self.last_health_warning or 
-                       now - self.last_health_warning > timedelta(minutes=10)):
-                        self.send_native_notification(
-                            "🚨 Health Critical!",
-                            f"🥟 Your friends might notice your low productivity!",
-                            "Get back on track before you fall behind in rankings!"
-                        )
-                        self.last_health_warning = now
-                        
-                except Exception as e:
-                    print(f"Health monitor error: {e}")
+            try:
+                now = datetime.now()
                 
-                time.sleep(30)
+                if self.health < 30 and (not self.last_health_warning or 
+                   now - self.last_health_warning > timedelta(minutes=10)):
+                    self.send_native_notification(
+                        "🚨 Health Critical!",
+                        f"🥟 Your friends might notice your low productivity!",
+                        "Get back on track before you fall behind in rankings!"
+                    )
+                    self.last_health_warning = now
+                    
+            except Exception as e:
+                print(f"Health monitor error: {e}")
         
-        threading.Thread(target=health_monitor, daemon=True).start()
+        self.scheduler.every('health', 30, health_monitor, delay=0)
     
     def start_notification_scheduler(self):
         """Enhanced notification scheduler with social pressure"""
         def notification_scheduler():
-            while True:
-                try:
-                    now = datetime.now()
-                    
-                    # Daily goal with social pressure
-                    if now.hour == 17 and now.minute < 5:
-                        friends_data = self.get_friends_data()
-                        if friends_data:
-                            avg_friend_dumplings = sum(f['daily_stats']['session_dumplings'] for f in friends_data) / len(friends_data)
-                            
-                            if self.dumpling_earning_session < avg_friend_dumplings:
-                                self.send_native_notification(
-                                    "📊 Daily Summary",
-                                    f"🥟 {avg_friend_dumplings:.1f} average vs your {self.dumpling_earning_session:.1f}",
-                                    "Your friends outperformed you today. Tomorrow's a new chance!"
-                                )
-                            else:
-                                self.send_native_notification(
-                                    "🏆 Daily Success!",
-                                    f"🥟 You beat the friend average by {self.dumpling_earning_session - avg_friend_dumplings:.1f}!",
-                                    "Great productivity! Your friends are impressed! 🎉"
-                                )
-                        
-                except Exception as e:
-                    print(f"Notification scheduler error: {e}")
+            try:
+                now = datetime.now()
                 
-                time.sleep(300)
+                # Daily goal with social pressure (skipped if the Mac slept through 5 PM)
+                if now.hour == 17 and now.minute < 5:
+                    friends_data = self.get_friends_data()
+                    if friends_data:
+                        avg_friend_dumplings = sum(f['daily_stats']['session_dumplings'] for f in friends_data) / len(friends_data)
+                        
+                        if self.dumpling_earning_session < avg_friend_dumplings:
+                            self.send_native_notification(
+                                "📊 Daily Summary",
+                                f"🥟 {avg_friend_dumplings:.1f} average vs your {self.dumpling_earning_session:.1f}",
+                                "Your friends outperformed you today. Tomorrow's a new chance!"
+                            )
+                        else:
+                            self.send_native_notification(
+                                "🏆 Daily Success!",
+                                f"🥟 You beat the friend average by {self.dumpling_earning_session - avg_friend_dumplings:.1f}!",
+                                "Great productivity! Your friends are impressed! 🎉"
+                            )
+                    
+            except Exception as e:
+                print(f"Notification scheduler error: {e}")
+            return seconds_until(17)  # 5 PM tomorrow, by the wall clock
         
-        threading.Thread(target=notification_scheduler, daemon=True).start()
+        self.scheduler.every('notifications', 24 * 3600, notification_scheduler, delay=seconds_until(17))
     
     # ... (simplified versions of core methods - keeping feed, pet, take_break, reset, save_data, load_data)
     
@@ -914,24 +886,17 @@ class MultiplayerDino(rumps.App):
                 'social_notifications_enabled': self.social_notifications_enabled
             }
             
-            save_dir = os.path.expanduser("~/.dino_tamagotchi")
-            os.makedirs(save_dir, exist_ok=True)
-            
-            with open(os.path.join(save_dir, "multiplayer_dino_data.json"), "w") as f:
-                json.dump(data, f)
+            self.store.save_state(self.store_app, data)
+            self.store.flush()
         except Exception as e:
             print(f"Error saving data: {e}")
     
     def load_data(self):
         """Load local data"""
         try:
-            save_dir = os.path.expanduser("~/.dino_tamagotchi")
-            data_file = os.path.join(save_dir, "multiplayer_dino_data.json")
+            data = self.store.load_state(self.store_app)
             
-            if os.path.exists(data_file):
-                with open(data_file, "r") as f:
-                    data = json.load(f)
-                
+            if data is not None:
                 self.happiness = data.get('happiness', 50)
                 self.energy = data.get('energy', 50)
                 self.health = data.get('health', 100)
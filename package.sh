@@ -11,6 +11,16 @@ mkdir -p "$PACKAGE_DIR"
 
 # Copy necessary files
 cp supabase_dino.py "$PACKAGE_DIR/"
+cp activity_detection.py "$PACKAGE_DIR/"
+cp website_categorizer.py "$PACKAGE_DIR/"
+cp state_journal.py "$PACKAGE_DIR/"
+cp local_store.py "$PACKAGE_DIR/"
+cp supabase_sync.py "$PACKAGE_DIR/"
+cp friend_realtime.py "$PACKAGE_DIR/"
+cp leaderboard.py "$PACKAGE_DIR/"
+cp menu_view.py "$PACKAGE_DIR/"
+cp scheduler.py "$PACKAGE_DIR/"
+cp dino_state.py "$PACKAGE_DIR/"
 cp requirements.txt "$PACKAGE_DIR/"
 cp install.sh "$PACKAGE_DIR/"
 cp DinoTamagotchi.icns "$PACKAGE_DIR/" 2>/dev/null || echo "No icon file found, skipping..."
@@ -202,6 +212,16 @@ chmod +x "$APP_BUNDLE/Contents/MacOS/DinoTamagotchi"
 
 # Copy Python script and icon to Resources
 cp supabase_dino.py "$APP_BUNDLE/Contents/Resources/"
+cp activity_detection.py "$APP_BUNDLE/Contents/Resources/"
+cp website_categorizer.py "$APP_BUNDLE/Contents/Resources/"
+cp state_journal.py "$APP_BUNDLE/Contents/Resources/"
+cp local_store.py "$APP_BUNDLE/Contents/Resources/"
+cp supabase_sync.py "$APP_BUNDLE/Contents/Resources/"
+cp friend_realtime.py "$APP_BUNDLE/Contents/Resources/"
+cp leaderboard.py "$APP_BUNDLE/Contents/Resources/"
+cp menu_view.py "$APP_BUNDLE/Contents/Resources/"
+cp scheduler.py "$APP_BUNDLE/Contents/Resources/"
+cp dino_state.py "$APP_BUNDLE/Contents/Resources/"
 
 # Copy icon if it exists
 if [ -f "DinoTamagotchi.icns" ]; then
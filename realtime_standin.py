@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Local Supabase Realtime stand-in for Dino Tamagotchi
+A small websocket server speaking the subset of the Realtime (Phoenix
+channel) protocol friend_realtime.py uses: join/leave, heartbeats and
+postgres_changes for users/friends rows, honouring eq./in. filters. Use it
+to try push mode or to test FriendFeed without a Supabase project.
+
+Usage:
+    python3 realtime_standin.py --port 4000
+    # set REALTIME_URL = "ws://localhost:4000/socket" in config.py, then type
+    # rows to push as JSON lines, e.g.
+    {"user_id": "abc123", "session_dumplings": 42, "updated_at": "2026-01-01T12:00:00+00:00"}
+    {"table": "friends", "type": "INSERT", "record": {"user_id": "me", "friend_user_id": "abc123"}}
+
+From Python:
+    standin = RealtimeStandIn()
+    standin.start()
+    feed = FriendFeed(standin.url, ...)
+    standin.push({'user_id': 'abc123', 'session_dumplings': 42})
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import threading
+from datetime import datetime, timezone
+
+import websockets
+
+
+def filter_matches(row_filter, record):
+    """Whether record passes a Realtime filter like "user_id=eq.x" or "user_id=in.(x,y)" """
+    if not row_filter:
+        return True
+    column, _, condition = row_filter.partition('=')
+    op, _, value = condition.partition('.')
+    actual = str(record.get(column))
+    if op == 'eq':
+        return actual == value
+    if op == 'in':
+        return actual in value.strip('()').split(',')
+    return False
+
+
+class RealtimeStandIn:
+    """Realtime-compatible websocket server on localhost, run on its own thread"""
+
+    def __init__(self, host='localhost', port=0):
+        self.host = host
+        self.port = port
+        self.subscriptions = {}  # (websocket, topic) -> postgres_changes list
+        self.received = []  # every (topic, event) clients sent, oldest first
+        self.connections = set()
+        self.loop = None
+        self.server = None
+        self.ready = threading.Event()
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}/socket"
+
+    def start(self):
+        """Start serving in the background; returns once the port is bound"""
+        self.thread = threading.Thread(target=lambda: asyncio.run(self._serve()), daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        return self
+
+    def stop(self):
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.server.close)
+            self.thread.join(timeout=5)
+
+    def subscriber_count(self):
+        return len(self.subscriptions)
+
+    def events(self, event):
+        """Topics of the received messages with this event"""
+        return [topic for topic, received in list(self.received) if received == event]
+
+    def disconnect_all(self):
+        """Close every client connection, as a server restart or network drop would"""
+        async def close_all():
+            for websocket in list(self.connections):
+                await websocket.close()
+        asyncio.run_coroutine_threadsafe(close_all(), self.loop).result(timeout=5)
+
+    def push(self, record, table='users', change_type='UPDATE'):
+        """Send a row change to every subscriber whose filter matches; returns how many got it"""
+        future = asyncio.run_coroutine_threadsafe(self._broadcast(table, change_type, record), self.loop)
+        return future.result(timeout=5)
+
+    async def _serve(self):
+        self.loop = asyncio.get_running_loop()
+        async with websockets.serve(self._handler, self.host, self.port) as server:
+            self.server = server
+            self.port = next(iter(server.sockets)).getsockname()[1]
+            self.ready.set()
+            await server.wait_closed()
+
+    async def _handler(self, websocket, *_):
+        self.connections.add(websocket)
+        try:
+            async for raw in websocket:
+                message = json.loads(raw)
+                topic, event, ref = message.get('topic'), message.get('event'), message.get('ref')
+                self.received.append((topic, event))
+                response = {}
+                if event == 'phx_join':
+                    changes = message.get('payload', {}).get('config', {}).get('postgres_changes', [])
+                    self.subscriptions[(websocket, topic)] = changes
+                    response = {'postgres_changes': [dict(change, id=i) for i, change in enumerate(changes)]}
+                elif event == 'phx_leave':
+                    self.subscriptions.pop((websocket, topic), None)
+                await websocket.send(json.dumps({'topic': topic, 'event': 'phx_reply', 'ref': ref,
+                                                 'payload': {'status': 'ok', 'response': response}}))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.connections.discard(websocket)
+            for key in [key for key in self.subscriptions if key[0] is websocket]:
+                del self.subscriptions[key]
+
+    async def _broadcast(self, table, change_type, record):
+        record = dict(record)
+        if table == 'users':
+            record.setdefault('updated_at', datetime.now(timezone.utc).isoformat())
+        delivered = 0
+        for (websocket, topic), changes in list(self.subscriptions.items()):
+            ids = [i for i, change in enumerate(changes)
+                   if change.get('table') == table and change.get('event') in ('*', change_type)
+                   and filter_matches(change.get('filter'), record)]
+            if not ids:
+                continue
+            payload = {'ids': ids, 'data': {'schema': 'public', 'table': table, 'type': change_type,
+                                            'commit_timestamp': datetime.now(timezone.utc).isoformat(),
+                                            'record': record, 'old_record': {}, 'errors': None}}
+            try:
+                await websocket.send(json.dumps({'topic': topic, 'event': 'postgres_changes',
+                                                 'payload': payload, 'ref': None}))
+                delivered += 1
+            except websockets.ConnectionClosed:
+                pass
+        return delivered
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for Supabase Realtime")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=4000)
+    args = parser.parse_args()
+
+    standin = RealtimeStandIn(args.host, args.port).start()
+    print(f"📡 Realtime stand-in listening on {standin.url}")
+    print("Type a users row (or {\"table\": ..., \"type\": ..., \"record\": ...}) as JSON to push it")
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            message = json.loads(line)
+        except ValueError as e:
+            print(f"❌ Not JSON: {e}")
+            continue
+        if 'record' in message:
+            count = standin.push(message['record'], message.get('table', 'users'), message.get('type', 'UPDATE'))
+        else:
+            count = standin.push(message)
+        print(f"➡️  Sent to {count} subscriber(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -127,6 +127,12 @@ INSERT INTO app_config (config_key, config_value, version) VALUES
         "update_interval_minutes": 60,
         "notification_cooldown_minutes": 30,
         "daily_reset_hour": 0,
+        "activity_polling": {
+            "min_interval_seconds": 2,
+            "max_interval_seconds": 30,
+            "backoff": 2.0,
+            "idle_pause_seconds": 300
+        },
         "features": {
             "multiplayer": true,
             "website_tracking": true,
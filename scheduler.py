@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Background job scheduler for Dino Tamagotchi
+The apps used to start one daemon thread per periodic loop (dumplings,
+social checks, sync, remote config, health and notification checks), each
+sleeping on its own and none of them stoppable. Scheduler runs all of them
+from a single thread off a priority queue of due times: runs are jittered
+so jobs don't fire in lockstep, a job that falls behind runs once instead
+of catching up, wake() pulls a job forward, and stop() waits for the job in
+flight, so quitting never cuts a job off halfway. Jobs tied to a time of day
+return seconds_until() as their next delay, so they stay on the wall clock.
+"""
+
+import heapq
+import itertools
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+def seconds_until(hour, minute=0, now=None):
+    """Seconds from now to the next hour:minute on the wall clock (a day ahead if it just passed)"""
+    now = now or datetime.now()
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+class Job:
+    """One scheduled function and its timing stats"""
+
+    def __init__(self, name, func, interval=None, jitter=0.1, min_gap=0):
+        self.name = name
+        self.func = func
+        self.interval = interval  # None: run once
+        self.jitter = jitter
+        self.min_gap = min_gap
+        self.due = None  # monotonic time of the pending run, None while running or idle
+        self.token = None  # identifies the live queue entry; older entries are skipped
+        self.cancelled = False
+        self.runs = 0
+        self.failures = 0
+        self.coalesced = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.max_late = 0.0
+        self.last_run = None
+
+    def next_delay(self):
+        if self.interval is None:
+            return None
+        return self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def stats(self):
+        return {'runs': self.runs, 'failures': self.failures, 'coalesced': self.coalesced,
+                'avg_time': self.total_time / self.runs if self.runs else 0.0,
+                'max_time': self.max_time, 'max_late': self.max_late}
+
+
+class Scheduler:
+    """Runs periodic and one-off jobs on one background thread
+
+    Jobs run one at a time, so a job should hand anything slow (network,
+    disk) to its own worker rather than hold the others up. A job function
+    may return a number to choose its next delay (e.g. to back off after a
+    failure); anything else reschedules it after its jittered interval.
+    """
+
+    def __init__(self, name='dino-scheduler'):
+        self.jobs = {}
+        self.queue = []  # (due, token, job)
+        self.tokens = itertools.count()
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def every(self, name, interval, func, delay=None, jitter=0.1, min_gap=0):
+        """Run func every interval seconds (first after delay, default one interval)
+
+        jitter spreads each interval by that fraction either way; min_gap is
+        the least time between runs that wake() may bring about.
+        """
+        job = Job(name, func, interval, jitter, min_gap)
+        with self.condition:
+            self._add(job, job.next_delay() if delay is None else delay)
+        return job
+
+    def after(self, delay, func, name=None):
+        """Run func once, delay seconds from now"""
+        with self.condition:
+            job = Job(name or f"once-{next(self.tokens)}", func)
+            self._add(job, delay)
+        return job
+
+    def wake(self, name, delay=0):
+        """Run name's job within delay seconds; returns False if it was already due by then
+
+        Wakes arriving before the job gets to run are coalesced into one run.
+        """
+        with self.condition:
+            job = self.jobs.get(name)
+            if job is None:
+                return False
+            due = time.monotonic() + delay
+            if job.last_run is not None:
+                due = max(due, job.last_run + job.min_gap)
+            if job.due is not None and job.due <= due:
+                job.coalesced += 1
+                return False
+            self._schedule(job, due)
+            return True
+
+    def cancel(self, name):
+        with self.condition:
+            job = self.jobs.pop(name, None)
+            if job is not None:
+                job.cancelled = True
+                self.condition.notify()
+
+    def stats(self):
+        """Timing stats of every scheduled job, by name"""
+        with self.condition:
+            return {name: job.stats() for name, job in self.jobs.items()}
+
+    def stop(self, timeout=10):
+        """Stop running jobs, waiting for the one in flight; returns False if it's still running"""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        if self.thread is not threading.current_thread():
+            self.thread.join(timeout=timeout)
+        return not self.thread.is_alive()
+
+    def _add(self, job, delay):
+        previous = self.jobs.get(job.name)
+        if previous is not None:
+            previous.cancelled = True
+        self.jobs[job.name] = job
+        self._schedule(job, time.monotonic() + max(0, delay))
+
+    def _schedule(self, job, due):
+        job.due = due
+        job.token = next(self.tokens)
+        heapq.heappush(self.queue, (due, job.token, job))
+        self.condition.notify()
+
+    def _next_job(self):
+        """Wait for the next due job (None once stopped)"""
+        with self.condition:
+            while not self.stopped:
+                if self.queue and (self.queue[0][2].cancelled or self.queue[0][1] != self.queue[0][2].token):
+                    heapq.heappop(self.queue)  # superseded by a wake() or cancelled
+                    continue
+                wait = self.queue[0][0] - time.monotonic() if self.queue else None
+                if wait is not None and wait <= 0:
+                    due, _, job = heapq.heappop(self.queue)
+                    job.due = None
+                    return job, due
+                self.condition.wait(wait)
+            return None
+
+    def _run(self):
+        while True:
+            next_job = self._next_job()
+            if next_job is None:
+                return
+            job, due = next_job
+
+            started = time.monotonic()
+            job.last_run = started
+            try:
+                result = job.func()
+            except Exception as e:
+                job.failures += 1
+                result = None
+                print(f"⏱️ Job {job.name} failed: {e}")
+            elapsed = time.monotonic() - started
+
+            with self.condition:
+                job.runs += 1
+                job.total_time += elapsed
+                job.max_time = max(job.max_time, elapsed)
+                job.max_late = max(job.max_late, started - due)
+                if job.cancelled or job.due is not None:
+                    continue  # cancelled, or woken again while running
+                if job.interval is None:
+                    if self.jobs.get(job.name) is job:
+                        del self.jobs[job.name]
+                    continue
+                # Scheduling from now means a job that overran skips the runs it missed
+                delay = result if isinstance(result, (int, float)) and not isinstance(result, bool) else job.next_delay()
+                self._schedule(job, time.monotonic() + delay)
@@ -11,6 +11,16 @@ mkdir -p "$PKG_DIR"
 
 # Copy files
 cp supabase_dino.py "$PKG_DIR/"
+cp activity_detection.py "$PKG_DIR/"
+cp website_categorizer.py "$PKG_DIR/"
+cp state_journal.py "$PKG_DIR/"
+cp local_store.py "$PKG_DIR/"
+cp supabase_sync.py "$PKG_DIR/"
+cp friend_realtime.py "$PKG_DIR/"
+cp leaderboard.py "$PKG_DIR/"
+cp menu_view.py "$PKG_DIR/"
+cp scheduler.py "$PKG_DIR/"
+cp dino_state.py "$PKG_DIR/"
 cp requirements.txt "$PKG_DIR/"
 cp DinoTamagotchi.icns "$PKG_DIR/" 2>/dev/null || echo "No icon"
 
@@ -112,6 +122,16 @@ chmod +x "$APP_BUNDLE/Contents/MacOS/DinoTamagotchi"
 
 # Copy resources
 cp supabase_dino.py "$APP_BUNDLE/Contents/Resources/"
+cp activity_detection.py "$APP_BUNDLE/Contents/Resources/"
+cp website_categorizer.py "$APP_BUNDLE/Contents/Resources/"
+cp state_journal.py "$APP_BUNDLE/Contents/Resources/"
+cp local_store.py "$APP_BUNDLE/Contents/Resources/"
+cp supabase_sync.py "$APP_BUNDLE/Contents/Resources/"
+cp friend_realtime.py "$APP_BUNDLE/Contents/Resources/"
+cp leaderboard.py "$APP_BUNDLE/Contents/Resources/"
+cp menu_view.py "$APP_BUNDLE/Contents/Resources/"
+cp scheduler.py "$APP_BUNDLE/Contents/Resources/"
+cp dino_state.py "$APP_BUNDLE/Contents/Resources/"
 if [ -f "DinoTamagotchi.icns" ]; then
     cp DinoTamagotchi.icns "$APP_BUNDLE/Contents/Resources/"
 fi
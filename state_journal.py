@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Save helpers for Dino Tamagotchi
+Saves go to local_store now; StateJournal only reads the old JSON save files
+(with the append-only journal of deltas next to them) so they can be
+imported there. WriteBehindSaver takes the saves themselves off the UI thread.
+"""
+
+import atexit
+import json
+import os
+import signal
+import threading
+import time
+
+
+# Journal lines look like
+#   {"seq": 12, "set": {"health": 80}, "update": {"website_time": {"github.com": 42.5}},
+#    "drop": {"website_time": ["old.com"]}, "splice": {"daily_websites": [7, [{...}]]}}
+# set replaces a key, update/drop patch a dict, and splice replaces a list from an index on.
+
+
+class StateJournal:
+    """Reads an old save: the snapshot at path plus the journal at path + '.journal'
+
+    The snapshot remembers the seq of the last delta folded into it, so
+    deltas it already has are skipped on replay.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.journal_path = path + '.journal'
+
+    def load(self):
+        """Snapshot with the journal replayed on top, or None if nothing was saved"""
+        state = None
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                state = json.load(f)
+        snapshot_seq = state.pop('_journal_seq', 0) if state else 0
+
+        if os.path.exists(self.journal_path):
+            state = state or {}
+            with open(self.journal_path, 'rb') as f:
+                for line in f:
+                    try:
+                        delta = json.loads(line)
+                    except ValueError:
+                        # Torn write from a crash; nothing after it was saved
+                        print(f"Ignoring damaged journal tail in {self.journal_path}")
+                        break
+                    if delta.get('seq', 0) > snapshot_seq:
+                        self._apply(state, delta)
+        return state
+
+    @staticmethod
+    def _apply(state, delta):
+        state.update(delta.get('set', {}))
+        for key, changed in delta.get('update', {}).items():
+            state.setdefault(key, {}).update(changed)
+        for key, dropped in delta.get('drop', {}).items():
+            for subkey in dropped:
+                state.get(key, {}).pop(subkey, None)
+        for key, (start, items) in delta.get('splice', {}).items():
+            state[key] = state.get(key, [])[:start] + items
+
+
+class WriteBehindSaver:
+    """Coalesces save requests and runs the save off the caller's thread
+
+    mark_dirty() is cheap enough for UI callbacks; a background thread calls
+    save at most once per interval, however many changes piled up. stop()
+    (and the signal/atexit hooks) flush whatever is still pending; on a
+    signal that is left to the background thread, since the interrupted main
+    thread may itself be holding the locks a save needs.
+    """
+
+    def __init__(self, save, interval=5):
+        self.save = save
+        self.interval = interval
+        self.dirty = False
+        self.last_flush = 0
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        atexit.register(self.flush)
+
+    def mark_dirty(self):
+        """Note that state changed; it will be saved within interval seconds"""
+        with self.lock:
+            self.dirty = True
+        self.wakeup.set()
+
+    def flush(self):
+        """Save now if anything is pending"""
+        with self.flush_lock:
+            with self.lock:
+                if not self.dirty:
+                    return
+                self.dirty = False
+                self.wakeup.clear()
+            try:
+                self.save()
+            except Exception as e:
+                print(f"Error flushing save: {e}")
+            self.last_flush = time.monotonic()
+
+    def stop(self):
+        """Stop the background thread and flush pending changes"""
+        self._stop_thread()
+        self.flush()
+
+    def _stop_thread(self):
+        """Have the background thread do its last flush and exit; returns False if it's still going"""
+        self.stopped.set()
+        self.wakeup.set()
+        if self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=self.interval + 1)
+        return not self.thread.is_alive()
+
+    def install_signal_handlers(self, signums=(signal.SIGTERM, signal.SIGHUP, signal.SIGINT)):
+        """Flush before the process dies from signums (must be called on the main thread)"""
+        for signum in signums:
+            previous = signal.getsignal(signum)
+
+            def handler(received, frame, previous=previous):
+                # Never flush here: the main thread may be mid-save, holding the locks
+                if not self._stop_thread():
+                    print("Save still running at exit; pending changes may be lost")
+                if callable(previous):
+                    previous(received, frame)
+                elif previous != signal.SIG_IGN:
+                    signal.signal(received, signal.SIG_DFL)
+                    os.kill(os.getpid(), received)
+
+            try:
+                signal.signal(signum, handler)
+            except (ValueError, OSError) as e:
+                print(f"Could not install save handler for signal {signum}: {e}")
+
+    def _run(self):
+        while not self.stopped.is_set():
+            self.wakeup.wait()
+            if self.stopped.is_set():
+                break
+            delay = self.last_flush + self.interval - time.monotonic()
+            if delay > 0:
+                self.stopped.wait(delay)
+            self.flush()
+        self.flush()
@@ -4,22 +4,84 @@ import rumps
 import tkinter as tk
 from tkinter import ttk, messagebox
 import subprocess
-import time
 import threading
+import queue
 from datetime import datetime, timedelta
-import json
-import os
 import random
 import re
-from urllib.parse import urlparse
 import uuid
 from supabase import create_client, Client
+from activity_detection import create_detection_backend, create_activity_source, AdaptivePollScheduler
+from website_categorizer import CategoryMatcher, CategoryCache
+from state_journal import WriteBehindSaver
+from local_store import LocalStore
+from supabase_sync import (DirtyFieldTracker, OutboundQueue, CachedFetch, Backoff, send_mutation,
+                           is_rejected_write, fetch_friends, fetch_leaderboard)
+from postgrest.exceptions import APIError
+from friend_realtime import FriendFeed, realtime_url
+from leaderboard import Leaderboard
+from menu_view import MenuView
+from scheduler import Scheduler
+from dino_state import DinoState, StateField
+
+class DashboardFetcher:
+    """Loads the dashboard's friends data off the Tk thread
+
+    A background thread fetches friends and the leaderboard every interval
+    seconds (or right away after request()) and posts each result to a
+    queue; the Tk thread only drains it, so the window never waits on I/O.
+    """
+
+    def __init__(self, parent_app, interval=5):
+        self.parent = parent_app
+        self.interval = interval
+        self.results = queue.Queue()
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def request(self):
+        """Fetch again now instead of at the next interval"""
+        self.wakeup.set()
+
+    def stop(self):
+        self.stopped.set()
+        self.wakeup.set()
+
+    def latest(self):
+        """Newest result posted since the last call, or None"""
+        result = None
+        while True:
+            try:
+                result = self.results.get_nowait()
+            except queue.Empty:
+                return result
+
+    def _run(self):
+        while not self.stopped.is_set():
+            try:
+                if self.parent.use_supabase:
+                    friends_data = self.parent.get_friends_data()
+                    board = self.parent.get_leaderboard() if friends_data else None
+                    result = {'online': True, 'friends': friends_data, 'board': board}
+                else:
+                    result = {'online': False}
+            except Exception as e:
+                result = {'error': e}
+            self.results.put(result)
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+
 
 class DinoDashboard:
+    LEADERBOARD_ROWS = 3
+
     def __init__(self, parent_app):
         self.parent = parent_app
         self.window = None
         self.is_open = False
+        self.fetcher = None
         
     def create_dashboard(self):
         """Create the main dashboard window"""
@@ -43,7 +105,10 @@ class DinoDashboard:
         
         self.create_widgets()
         
-        # Update every 5 seconds
+        # Friends data is fetched in the background; the window only renders what arrives
+        self.fetcher = DashboardFetcher(self.parent)
+        
+        # Update every second
         self.update_dashboard()
         self.schedule_updates()
         
@@ -112,6 +177,16 @@ class DinoDashboard:
         self.leaderboard_frame = ttk.Frame(social_frame)
         self.leaderboard_frame.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(5, 0))
         
+        # Fixed pool of leaderboard rows, updated in place by render_leaderboard
+        self.leaderboard_rows = []
+        for i in range(self.LEADERBOARD_ROWS):
+            rank_label = ttk.Label(self.leaderboard_frame, text="", style='Small.TLabel')
+            rank_label.grid(row=i, column=0, sticky=tk.W, pady=1)
+            rank_label.grid_remove()
+            self.leaderboard_rows.append(rank_label)
+        self.leaderboard_texts = []
+        self.friends_status_text = None
+        
         # === ACTIONS SECTION ===
         actions_frame = ttk.LabelFrame(main_frame, text="🎮 Actions", padding="10")
         actions_frame.grid(row=3, column=0, sticky=(tk.W, tk.E), pady=(0, 10))
@@ -157,18 +232,21 @@ class DinoDashboard:
             return
             
         try:
+            # Draw from one consistent copy of the stats
+            state = self.parent.state.snapshot()
+            
             # Update dino display
-            dino_emoji = self.parent.states.get(self.parent.current_state, '🦕')
+            dino_emoji = self.parent.states.get(state['current_state'], '🦕')
             self.dino_display.config(text=dino_emoji)
             
             # Update status based on health
-            if self.parent.health >= 80:
+            if state['health'] >= 80:
                 status_text = "Healthy & Strong!"
                 status_color = 'green'
-            elif self.parent.health >= 60:
+            elif state['health'] >= 60:
                 status_text = "Doing Well"
                 status_color = 'blue'
-            elif self.parent.health >= 40:
+            elif state['health'] >= 40:
                 status_text = "Okay, needs care"
                 status_color = 'orange'
             else:
@@ -178,11 +256,11 @@ class DinoDashboard:
             self.mood_label.config(text=status_text, foreground=status_color)
             
             # Update health progress bar
-            self.health_bar['value'] = self.parent.health
+            self.health_bar['value'] = state['health']
             
             # Update dumplings
-            self.dumplings_label.config(text=f"🥟 Dumplings: {int(self.parent.dumplings)}")
-            session_change = f"+{self.parent.dumpling_earning_session:.0f}" if self.parent.dumpling_earning_session >= 0 else f"{self.parent.dumpling_earning_session:.0f}"
+            self.dumplings_label.config(text=f"🥟 Dumplings: {int(state['dumplings'])}")
+            session_change = f"+{state['dumpling_earning_session']:.0f}" if state['dumpling_earning_session'] >= 0 else f"{state['dumpling_earning_session']:.0f}"
             self.session_label.config(text=f"📈 Today: {session_change}")
             
             # Update current activity with friendly messages
@@ -197,11 +275,13 @@ class DinoDashboard:
                 'idle': '😴 Chilling'
             }
             
-            activity_text = activity_messages.get(self.parent.current_state, '🎯 Unknown activity')
+            activity_text = activity_messages.get(state['current_state'], '🎯 Unknown activity')
             self.activity_label.config(text=f"🎯 Currently: {activity_text}")
             
-            # Update social section
-            self.update_social_section()
+            # Update social section (if the fetcher brought anything new)
+            social_data = self.fetcher.latest()
+            if social_data:
+                self.update_social_section(social_data)
             
             # Update info section
             self.user_info.config(text=f"👤 {self.parent.username} (ID: {self.parent.user_id})")
@@ -211,53 +291,67 @@ class DinoDashboard:
         except Exception as e:
             print(f"Dashboard update error: {e}")
     
-    def update_social_section(self):
-        """Update the social/friends section"""
+    def update_social_section(self, social_data):
+        """Update the social/friends section from a DashboardFetcher result"""
         try:
-            # Clear existing leaderboard
-            for widget in self.leaderboard_frame.winfo_children():
-                widget.destroy()
+            if 'error' in social_data:
+                raise social_data['error']
             
-            if self.parent.use_supabase:
-                friends_data = self.parent.get_friends_data()
+            if social_data['online']:
+                friends_data = social_data['friends']
                 
                 if friends_data:
                     online_count = len([f for f in friends_data if self.is_recent_activity(f)])
-                    self.friends_status.config(text=f"👥 {len(friends_data)} friends ({online_count} active)")
-                    
-                    # Create simple leaderboard
-                    all_users = friends_data + [{
-                        'username': self.parent.username,
-                        'session_dumplings': self.parent.dumpling_earning_session,
-                        'total_dumplings_earned': self.parent.total_dumplings_earned,
-                        'user_id': self.parent.user_id
-                    }]
+                    self.set_friends_status(f"👥 {len(friends_data)} friends ({online_count} active)")
                     
-                    # Sort by session dumplings
-                    sorted_users = sorted(all_users, key=lambda x: x.get('session_dumplings', 0), reverse=True)
-                    
-                    # Show top 3
-                    for i, user in enumerate(sorted_users[:3]):
+                    # Top 3, ranked server-side (or locally in push mode)
+                    board = social_data['board']
+                    texts = []
+                    for i, user in enumerate(board['top'] if board else []):
                         rank_emoji = ["🏆", "🥈", "🥉"][i] if i < 3 else "👤"
-                        dumplings = int(user.get('session_dumplings', 0))
+                        dumplings = int(user.get('session_dumplings') or 0)
                         username = user['username']
                         
                         # Highlight current user
-                        if user.get('user_id') == self.parent.user_id:
+                        if user['is_me']:
                             username = f"{username} (You!)"
                         
-                        rank_label = ttk.Label(self.leaderboard_frame, 
-                                             text=f"{rank_emoji} {username}: {dumplings} dumplings today",
-                                             style='Small.TLabel')
-                        rank_label.grid(row=i, column=0, sticky=tk.W, pady=1)
+                        texts.append(f"{rank_emoji} {username}: {dumplings} dumplings today")
+                    self.render_leaderboard(texts)
                 else:
-                    self.friends_status.config(text="👥 No friends yet - share your ID!")
+                    self.set_friends_status("👥 No friends yet - share your ID!")
+                    self.render_leaderboard([])
             else:
-                self.friends_status.config(text="👥 Connect to Supabase for multiplayer")
+                self.set_friends_status("👥 Connect to Supabase for multiplayer")
+                self.render_leaderboard([])
                 
         except Exception as e:
             print(f"Social section update error: {e}")
-            self.friends_status.config(text="👥 Error loading friends")
+            self.set_friends_status("👥 Error loading friends")
+    
+    def render_leaderboard(self, texts):
+        """Show texts in the row pool, touching only rows whose text changed"""
+        texts = texts[:self.LEADERBOARD_ROWS]
+        if texts == self.leaderboard_texts:
+            return
+        
+        for i, rank_label in enumerate(self.leaderboard_rows):
+            old = self.leaderboard_texts[i] if i < len(self.leaderboard_texts) else None
+            new = texts[i] if i < len(texts) else None
+            if new == old:
+                continue
+            if new is None:
+                rank_label.grid_remove()
+            else:
+                rank_label.config(text=new)
+                if old is None:
+                    rank_label.grid()
+        self.leaderboard_texts = texts
+    
+    def set_friends_status(self, text):
+        if text != self.friends_status_text:
+            self.friends_status.config(text=text)
+            self.friends_status_text = text
     
     def is_recent_activity(self, friend_data):
         """Check if friend has recent activity (within 30 minutes)"""
@@ -275,12 +369,12 @@ class DinoDashboard:
         """Schedule regular dashboard updates"""
         if self.window and self.window.winfo_exists():
             self.update_dashboard()
-            self.window.after(5000, self.schedule_updates)  # Update every 5 seconds
+            self.window.after(1000, self.schedule_updates)  # Update every second (no I/O on this thread)
     
     def feed_dino(self):
         """Feed the dino"""
-        if self.parent.dumplings >= 5:
-            self.parent.feed(None)
+        # feed() re-checks the balance atomically, in case it changed meanwhile
+        if self.parent.dumplings >= 5 and self.parent.feed(None):
             messagebox.showinfo("🥟 Fed!", "Your dino enjoyed the meal!")
         else:
             messagebox.showwarning("💰 Not enough dumplings!", "You need 5 dumplings to feed your dino.")
@@ -296,7 +390,7 @@ class DinoDashboard:
     
     def sync_now(self):
         """Force sync with database"""
-        if self.parent.use_supabase:
+        if self.parent.sync_enabled:
             self.parent.sync_to_supabase()
             messagebox.showinfo("🔄 Synced!", "Data synchronized with database.")
         else:
@@ -327,10 +421,25 @@ class DinoDashboard:
     def on_close(self):
         """Handle dashboard close"""
         self.is_open = False
+        if self.fetcher:
+            self.fetcher.stop()
         self.window.destroy()
 
 
 class EnhancedSupabaseDino(rumps.App):
+    # Stats shared by every thread live in self.state; these read and write through to it
+    current_state = StateField()
+    current_website = StateField()
+    current_website_category = StateField()
+    happiness = StateField()
+    energy = StateField()
+    health = StateField()
+    dumplings = StateField()
+    total_dumplings_earned = StateField()
+    dumpling_earning_session = StateField()
+    productive_time_today = StateField()
+    time_spent = StateField()
+
     def __init__(self):
         super(EnhancedSupabaseDino, self).__init__("🦕", quit_button=None)
         
@@ -344,14 +453,34 @@ class EnhancedSupabaseDino(rumps.App):
             SUPABASE_KEY = "sb_publishable_1SGzjoZCE65W6cNRU0_K4Q_CQTXYbCT"
             self.use_supabase = True
         
+        # Optional push mode for friend updates over Supabase Realtime
+        try:
+            import config
+            self.use_realtime = getattr(config, 'USE_REALTIME', False)
+            self.realtime_url = getattr(config, 'REALTIME_URL', None) or realtime_url(SUPABASE_URL, SUPABASE_KEY)
+        except ImportError:
+            self.use_realtime = False
+            self.realtime_url = realtime_url(SUPABASE_URL, SUPABASE_KEY)
+        
+        # use_supabase means "connected"; sync_enabled means "configured", and writes
+        # made while offline wait in the outbox until the connection comes back
+        self.supabase_url = SUPABASE_URL
+        self.supabase_key = SUPABASE_KEY
+        self.sync_enabled = self.use_supabase
+        self.supabase = None
         if self.use_supabase:
             try:
-                self.supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-                print("🗄️ Connected to Supabase!")
+                self.connect_supabase()
             except Exception as e:
-                print(f"❌ Supabase connection failed: {e}")
+                print(f"❌ Supabase connection failed: {e} (will keep retrying)")
                 self.use_supabase = False
         
+        # Local database for identity, stats and time totals (old save files are imported once)
+        self.store_app = 'supabase_dino'
+        self.store = LocalStore()
+        self.store.migrate_legacy_files(self.store_app, "save_data.json")
+        self.menu_view = MenuView()
+        
         # User identification
         self.user_id = self.load_or_create_user_id()
         self.username = self.load_or_create_username()
@@ -455,18 +584,36 @@ class EnhancedSupabaseDino(rumps.App):
         # Custom user-defined website categories
         self.custom_website_categories = self.load_custom_categories()
         
-        # Core stats
-        self.current_state = 'idle'
-        self.current_website = None
-        self.current_website_category = None
-        self.happiness = 50
-        self.energy = 50
-        self.health = 100
-        
-        # Dumpling system (treats)
-        self.dumplings = 0
-        self.total_dumplings_earned = 0
-        self.dumpling_earning_session = 0
+        # Compiled categories plus a cache of recent results, versioned so config
+        # updates invalidate it
+        self.category_cache = CategoryCache(maxsize=1024, ttl=3600)
+        self.refresh_category_matcher()
+        
+        # Core stats, dumplings (treats) and time totals; every thread changes them
+        # through self.state, in a transaction when a change reads what it writes
+        self.state = DinoState(
+            current_state='idle',
+            current_website=None,
+            current_website_category=None,
+            happiness=50,
+            energy=50,
+            health=100,
+            dumplings=0,
+            total_dumplings_earned=0,
+            dumpling_earning_session=0,
+            productive_time_today=0,
+            time_spent={
+                'coding': 0,
+                'working': 0,
+                'designing': 0,
+                'browsing_productive': 0,
+                'browsing_social': 0,
+                'browsing_news': 0,
+                'browsing_entertainment': 0,
+                'browsing_shopping': 0,
+                'browsing_other': 0
+            }
+        )
         self.last_dumpling_time = datetime.now()
         
         # Enhanced multiplayer stats
@@ -474,24 +621,11 @@ class EnhancedSupabaseDino(rumps.App):
         self.daily_ranking = 0
         self.online_friends = []
         self.friend_requests = []
-        self.friend_code = None  # For easy sharing
+        self.friend_code = self.store.get_setting('friend_code')  # For easy sharing
         
         # Time tracking
         self.session_start = datetime.now()
         self.state_start_time = datetime.now()
-        self.productive_time_today = 0
-        
-        self.time_spent = {
-            'coding': 0,
-            'working': 0,
-            'designing': 0,
-            'browsing_productive': 0,
-            'browsing_social': 0,
-            'browsing_news': 0,
-            'browsing_entertainment': 0,
-            'browsing_shopping': 0,
-            'browsing_other': 0
-        }
         
         # Social monitoring
         self.last_social_update = None
@@ -502,9 +636,45 @@ class EnhancedSupabaseDino(rumps.App):
         self.notifications_enabled = True
         self.social_notifications_enabled = True
         
+        # Resident osascript worker for activity detection
+        self.detector = create_detection_backend()
+        
+        # Detection polls fast after a change and backs off while nothing changes
+        # (bounds can be tuned remotely through app_settings.activity_polling)
+        self.poll_scheduler = AdaptivePollScheduler(min_interval=2, max_interval=30,
+                                                    backoff=2.0, idle_pause=300,
+                                                    idle_seconds=self.detector.idle_seconds)
+        
         # Create dashboard
         self.dashboard = DinoDashboard(self)
         
+        # Feeding, petting etc. only mark the save dirty; it is written in the background
+        self.saver = WriteBehindSaver(self.save_data, interval=5)
+        self.saver.install_signal_handlers()
+        
+        # Syncs send only fields the server has not acknowledged, and bursts of
+        # changes (feed + pet + timer) are coalesced into one update
+        self.sync_tracker = DirtyFieldTracker(heartbeat_fields=('last_activity',), heartbeat_interval=600)
+        self.sync_lock = threading.Lock()
+        self.sync_coalescer = WriteBehindSaver(self.sync_to_supabase, interval=10)
+        
+        # Durable outbox for Supabase writes, retried with backoff (and reconnecting) while offline
+        self.outbox = None
+        if self.sync_enabled:
+            self.outbox = OutboundQueue(self.store, self.send_outbox_item, connect=self.connect_supabase,
+                                        is_permanent=lambda e: isinstance(e, APIError) and is_rejected_write(e),
+                                        on_delivered=self.on_outbox_delivered)
+        
+        # Friends and leaderboard reads, shared by the dashboard, menus and social monitor
+        self.friends_cache = CachedFetch(lambda: fetch_friends(self.supabase, self.user_id), ttl=60)
+        self.leaderboard_cache = CachedFetch(lambda: fetch_leaderboard(self.supabase, self.user_id), ttl=30)
+        self.friend_feed = None  # started with social monitoring in push mode
+        # Local ranking of us and our friends, moved per friend change; emits rank-change events
+        self.leaderboard = Leaderboard(self.user_id, top=3)
+        
+        # One thread runs every periodic job (dumplings, social, sync, remote config)
+        self.scheduler = Scheduler()
+        
         # Load saved data
         self.load_data()
         
@@ -525,8 +695,8 @@ class EnhancedSupabaseDino(rumps.App):
         self.start_social_monitoring()
         self.start_realtime_sync()
         
-        # Start remote config updates (if online)
-        if self.use_supabase:
+        # Start remote config updates (retried until we're online)
+        if self.sync_enabled:
             self.start_remote_config_updates()
         
         print(f"🦕 Enhanced Dino Started!")
@@ -705,43 +875,35 @@ Currently I have {int(self.dumplings)} dumplings! Let's motivate each other to s
                                     f"Share this code so friends can add you!")
 
     def get_friend_code(self):
-        """Get or create a memorable friend code"""
+        """Get or create a memorable friend code (kept for good, even if we're renamed)"""
         if not self.friend_code:
             # Create a more memorable friend code based on user ID and username
             import hashlib
             hash_input = f"{self.user_id}-{self.username}".encode()
             hash_result = hashlib.md5(hash_input).hexdigest()[:6].upper()
-            self.friend_code = f"{self.username[:4].upper()}-{hash_result}"
+            self.set_friend_code(f"{self.username[:4].upper()}-{hash_result}")
         
         return self.friend_code
 
+    def set_friend_code(self, friend_code):
+        self.friend_code = friend_code
+        self.store.set_setting('friend_code', friend_code)
+
     def show_detailed_leaderboard(self, friends_data):
         """Show detailed leaderboard with friend status"""
         try:
-            # Add yourself to the data
-            all_users = friends_data + [{
-                'username': self.username,
-                'session_dumplings': self.dumpling_earning_session,
-                'total_dumplings_earned': self.total_dumplings_earned,
-                'user_id': self.user_id,
-                'health': self.health,
-                'current_state': self.current_state,
-                'last_activity': datetime.now().isoformat()
-            }]
-            
-            # Sort by session dumplings
-            sorted_users = sorted(all_users, key=lambda x: x.get('session_dumplings', 0), reverse=True)
-            
-            my_rank = next((i+1 for i, user in enumerate(sorted_users) if user.get('user_id') == self.user_id), len(all_users))
+            board = self.get_leaderboard()
+            if not board:
+                raise ConnectionError("leaderboard unavailable")
+            my_rank, player_count = self.leaderboard_position(board)
             
             # Count online friends
             online_count = len([f for f in friends_data if self.is_recent_activity(f)])
             
             # Create detailed status message
-            top_3 = sorted_users[:3]
             leaderboard_text = "\\n".join([
-                f"{'🏆' if i==0 else '🥈' if i==1 else '🥉'} {user['username']}: {int(user.get('session_dumplings', 0))} dumplings"
-                for i, user in enumerate(top_3)
+                f"{'🏆' if i==0 else '🥈' if i==1 else '🥉'} {user['username']}: {int(user.get('session_dumplings') or 0)} dumplings"
+                for i, user in enumerate(board['top'])
             ])
             
             # Show current activities of friends
@@ -755,11 +917,11 @@ Currently I have {int(self.dumplings)} dumplings! Let's motivate each other to s
             activities_text = "\\n".join(friend_activities) if friend_activities else "No friends currently active"
             
             self.send_native_notification("🏆 Daily Leaderboard",
-                                        f"{leaderboard_text}\\n\\nYou're #{my_rank} of {len(all_users)}",
+                                        f"{leaderboard_text}\\n\\nYou're #{my_rank} of {player_count}",
                                         f"{online_count}/{len(friends_data)} friends online")
             
             # Update menu item
-            self.ranking_item.title = f"🏆 #{my_rank} of {len(all_users)} • {online_count} online"
+            self.ranking_item.title = f"🏆 #{my_rank} of {player_count} • {online_count} online"
             
         except Exception as e:
             print(f"Detailed leaderboard error: {e}")
@@ -801,34 +963,24 @@ Currently I have {int(self.dumplings)} dumplings! Let's motivate each other to s
     def show_leaderboard(self, sender):
         """Show current live leaderboard"""
         try:
-            friends_data = self.get_friends_data()
+            board = self.get_leaderboard()
+            if board is None:
+                raise ConnectionError("leaderboard unavailable")
+            my_rank, player_count = self.leaderboard_position(board)
             
-            # Add yourself to the data
-            all_users = friends_data + [{
-                'username': self.username,
-                'session_dumplings': self.dumpling_earning_session,
-                'total_dumplings_earned': self.total_dumplings_earned
-            }]
-            
-            if len(all_users) > 1:
-                # Sort by session dumplings
-                sorted_users = sorted(all_users, key=lambda x: x.get('session_dumplings', 0), reverse=True)
-                
-                my_rank = next((i+1 for i, user in enumerate(sorted_users) if user['username'] == self.username), len(all_users))
-                
+            if player_count > 1:
                 # Show top 3
-                top_3 = sorted_users[:3]
                 leaderboard = "\\n".join([
-                    f"{'🏆' if i==0 else '🥈' if i==1 else '🥉'} {user['username']}: {int(user.get('session_dumplings', 0))} today"
-                    for i, user in enumerate(top_3)
+                    f"{'🏆' if i==0 else '🥈' if i==1 else '🥉'} {user['username']}: {int(user.get('session_dumplings') or 0)} today"
+                    for i, user in enumerate(board['top'])
                 ])
                 
                 self.send_native_notification("🏆 Daily Leaderboard",
                                             leaderboard,
-                                            f"You're #{my_rank} of {len(all_users)}")
+                                            f"You're #{my_rank} of {player_count}")
                 
                 # Update menu item
-                self.ranking_item.title = f"🏆 You're #{my_rank} of {len(all_users)}"
+                self.ranking_item.title = f"🏆 You're #{my_rank} of {player_count}"
             else:
                 self.send_native_notification("👥 No Friends Yet",
                                             "Share your ID to compete with friends!",
@@ -877,6 +1029,7 @@ Currently I have {int(self.dumplings)} dumplings! Let's motivate each other to s
             if new_username and new_username.strip():
                 self.username = new_username.strip()
                 self.save_username()
+                self.sync_coalescer.mark_dirty()
                 messagebox.showinfo("✅ Success", f"Username changed to: {self.username}")
         elif action is False:  # Toggle notifications
             self.notifications_enabled = not self.notifications_enabled
@@ -886,19 +1039,23 @@ Currently I have {int(self.dumplings)} dumplings! Let's motivate each other to s
         root.destroy()
 
     def save_username(self):
-        """Save username to file"""
-        username_file = os.path.expanduser("~/.dino_tamagotchi/username.txt")
-        os.makedirs(os.path.dirname(username_file), exist_ok=True)
-        with open(username_file, 'w') as f:
-            f.write(self.username)
+        """Save username to the local store"""
+        self.store.set_setting('username', self.username)
 
     def quit_app(self, sender):
         """Quit the application"""
         try:
-            # Save data before quitting
-            self.save_data()
-            if self.use_supabase:
-                self.sync_to_supabase()
+            # Let the running job finish, then flush pending saves before quitting
+            self.scheduler.stop()
+            self.saver.stop()
+            self.sync_coalescer.stop()
+            self.sync_to_supabase()
+            if self.outbox:
+                self.outbox.stop()
+            if self.friend_feed:
+                self.friend_feed.stop()
+            self.activity_source.stop()
+            self.detector.stop()
             
             self.send_native_notification("👋 Goodbye!", 
                                         f"See you later, {self.username}!",
@@ -913,78 +1070,57 @@ Currently I have {int(self.dumplings)} dumplings! Let's motivate each other to s
     
     def load_or_create_user_id(self):
         """Load existing user ID or create new one"""
-        user_file = os.path.expanduser("~/.dino_tamagotchi/user_id.txt")
-        if os.path.exists(user_file):
-            with open(user_file, 'r') as f:
-                return f.read().strip()
-        else:
-            new_id = str(uuid.uuid4())[:8]
-            os.makedirs(os.path.dirname(user_file), exist_ok=True)
-            with open(user_file, 'w') as f:
-                f.write(new_id)
-            return new_id
+        user_id = self.store.get_setting('user_id')
+        if not user_id:
+            user_id = str(uuid.uuid4())[:8]
+            self.store.set_setting('user_id', user_id)
+        return user_id
     
     def load_or_create_username(self):
         """Load existing username or create default"""
-        username_file = os.path.expanduser("~/.dino_tamagotchi/username.txt")
-        if os.path.exists(username_file):
-            with open(username_file, 'r') as f:
-                return f.read().strip()
-        else:
+        username = self.store.get_setting('username')
+        if not username:
             import getpass
             username = f"Dino_{getpass.getuser()}_{self.user_id[:4]}"
-            os.makedirs(os.path.dirname(username_file), exist_ok=True)
-            with open(username_file, 'w') as f:
-                f.write(username)
-            return username
+            self.store.set_setting('username', username)
+        return username
 
     def load_custom_categories(self):
         """Load custom website categories"""
         try:
-            custom_file = os.path.expanduser("~/.dino_tamagotchi/custom_categories.json")
-            if os.path.exists(custom_file):
-                with open(custom_file, 'r') as f:
-                    return json.load(f)
-        except:
-            pass
+            return self.store.custom_categories()
+        except Exception as e:
+            print(f"Error loading custom categories: {e}")
         return {}
 
     def save_data(self):
         """Save current state"""
         try:
-            data = {
-                'happiness': self.happiness,
-                'energy': self.energy,
-                'health': self.health,
-                'dumplings': self.dumplings,
-                'total_dumplings_earned': self.total_dumplings_earned,
-                'time_spent': self.time_spent,
-                'custom_website_categories': self.custom_website_categories
-            }
-            
-            save_dir = os.path.expanduser("~/.dino_tamagotchi")
-            os.makedirs(save_dir, exist_ok=True)
+            state = self.state.snapshot()
+            data = {field: state[field] for field in
+                    ('happiness', 'energy', 'health', 'dumplings', 'total_dumplings_earned')}
             
-            with open(f"{save_dir}/save_data.json", 'w') as f:
-                json.dump(data, f)
+            # Time totals were recorded as they happened; flush them with the stats
+            self.store.save_state(self.store_app, data)
+            self.store.flush()
         except Exception as e:
             print(f"Error saving data: {e}")
 
     def load_data(self):
         """Load saved state"""
         try:
-            save_file = os.path.expanduser("~/.dino_tamagotchi/save_data.json")
-            if os.path.exists(save_file):
-                with open(save_file, 'r') as f:
-                    data = json.load(f)
+            data = self.store.load_state(self.store_app)
+            totals = self.store.state_totals(self.store_app)
+            with self.state.transaction():
+                if data is not None:
+                    self.happiness = data.get('happiness', 50)
+                    self.energy = data.get('energy', 50)
+                    self.health = data.get('health', 100)
+                    self.dumplings = data.get('dumplings', 0)
+                    self.total_dumplings_earned = data.get('total_dumplings_earned', 0)
                 
-                self.happiness = data.get('happiness', 50)
-                self.energy = data.get('energy', 50)
-                self.health = data.get('health', 100)
-                self.dumplings = data.get('dumplings', 0)
-                self.total_dumplings_earned = data.get('total_dumplings_earned', 0)
-                self.time_spent = data.get('time_spent', self.time_spent)
-                self.custom_website_categories.update(data.get('custom_website_categories', {}))
+                # Time totals are kept per day, so this is today's
+                self.time_spent.update(totals)
         except Exception as e:
             print(f"Error loading data: {e}")
 
@@ -1003,95 +1139,189 @@ Currently I have {int(self.dumplings)} dumplings! Let's motivate each other to s
 
     @rumps.clicked("🍖 Quick Feed")
     def feed(self, sender):
-        """Feed the dino"""
-        if self.dumplings >= 5:
-            self.dumplings -= 5
-            self.health = min(100, self.health + 20)
-            
+        """Feed the dino; returns whether there were dumplings enough"""
+        with self.state.transaction():
+            fed = self.dumplings >= 5
+            if fed:
+                self.dumplings -= 5
+                self.health = min(100, self.health + 20)
+        
+        if fed:
             self.send_native_notification("🥟 Nom Nom!", 
                                         "Your dino enjoyed the meal!",
                                         f"Health +20")
-            self.save_data()
-            if self.use_supabase:
-                self.sync_to_supabase()
+            self.saver.mark_dirty()
+            if self.sync_enabled:
+                self.sync_coalescer.mark_dirty()
         else:
             self.send_native_notification("💰 Not Enough Dumplings!", 
                                         "You need 5 dumplings to feed your dino",
                                         "Earn more by being productive!")
+        return fed
 
     @rumps.clicked("🫳 Quick Pet")  
     def pet(self, sender):
         """Pet the dino"""
-        self.health = min(100, self.health + 10)
+        with self.state.transaction():
+            self.health = min(100, self.health + 10)
         
         self.send_native_notification("🫳 Aww!", 
                                     "Your dino feels loved!",
                                     f"Health +10")
-        self.save_data()
+        self.saver.mark_dirty()
+        if self.sync_enabled:
+            self.sync_coalescer.mark_dirty()
+
+    def get_friends_data(self, wait=True):
+        """Get friends data from Supabase (pushed by Realtime, or cached and refreshed in the background)
 
-    def get_friends_data(self):
-        """Get friends data from Supabase"""
+        wait=False never waits on the network; it returns [] until the first fetch lands.
+        """
+        if self.friend_feed and self.friend_feed.is_live():
+            return self.store.friends()
         if not self.use_supabase:
             return []
         
-        try:
-            # For now, get all users except current user
-            result = self.supabase.table('users').select('*').neq('user_id', self.user_id).limit(10).execute()
-            return result.data
-        except Exception as e:
-            print(f"Error getting friends data: {e}")
-            return []
+        return self.friends_cache.get(default=[], wait=wait)
 
-    def initialize_user(self):
-        """Initialize user in Supabase database"""
+    def friends_snapshot(self):
+        """Current rows of our friends, for the Realtime feed to start from"""
+        self.connect_supabase()
+        return fetch_friends(self.supabase, self.user_id)
+
+    def on_friend_change(self, row):
+        """A friend's row (or with None, the friend set) changed; called by the Realtime feed"""
+        self.leaderboard_cache.invalidate()
+        if row is None:
+            self.friends_cache.invalidate()
+            self.update_leaderboard(self.store.friends())
+        else:
+            self.leaderboard.update(row['user_id'], row.get('session_dumplings'), row)
+        self.scheduler.wake('social')
+
+    def get_leaderboard(self, wait=True):
+        """Top 3 among us and our friends plus our rank and neighbors (None if unavailable)"""
+        if self.friend_feed and self.friend_feed.is_live():
+            # Push mode: friend_state is current, so rank locally
+            self.update_leaderboard(self.store.friends())
+            return self.leaderboard.board()
         if not self.use_supabase:
+            return None
+        
+        return self.leaderboard_cache.get(wait=wait)
+
+    def update_leaderboard(self, friends_data):
+        """Move our own score and any friends' changed scores on the local leaderboard"""
+        self.leaderboard.update(self.user_id, round(self.dumpling_earning_session, 2), {
+            'user_id': self.user_id,
+            'username': self.username,
+            'current_state': self.current_state,
+            'last_activity': datetime.now().isoformat()
+        })
+        self.leaderboard.sync(friends_data)
+
+    def leaderboard_position(self, board):
+        """(our rank, player count), counting us last if our row hasn't reached the server yet"""
+        if board['me']:
+            return board['me']['rank'], board['total']
+        return board['total'] + 1, board['total'] + 1
+
+    def initialize_user(self):
+        """Initialize user in Supabase database (queued until we're online, if need be)"""
+        if not self.sync_enabled:
             return
         
+        new_user = {
+            'user_id': self.user_id,
+            'username': self.username,
+            'dumplings': self.dumplings,
+            'total_dumplings_earned': self.total_dumplings_earned,
+            'health': self.health,
+            'happiness': self.happiness,
+            'energy': self.energy,
+            'current_state': self.current_state,
+            'friend_code': self.get_friend_code(),
+            'last_activity': datetime.now().isoformat(),
+            'created_at': datetime.now().isoformat()
+        }
+        
         try:
-            result = self.supabase.table('users').select('*').eq('user_id', self.user_id).execute()
+            if not self.use_supabase:
+                raise ConnectionError("not connected")
+            result = self.supabase.table('users').select('user_id, friend_code').eq('user_id', self.user_id).execute()
             
             if not result.data:
-                new_user = {
-                    'user_id': self.user_id,
-                    'username': self.username,
-                    'dumplings': self.dumplings,
-                    'total_dumplings_earned': self.total_dumplings_earned,
-                    'health': self.health,
-                    'happiness': self.happiness,
-                    'energy': self.energy,
-                    'current_state': self.current_state,
-                    'last_activity': datetime.now().isoformat(),
-                    'created_at': datetime.now().isoformat()
-                }
-                
-                self.supabase.table('users').insert(new_user).execute()
-                print(f"✅ Created new user in database: {self.username}")
+                self.outbox.enqueue('ensure', 'users', {'user_id': self.user_id}, new_user)
+                print(f"✅ Creating new user in database: {self.username}")
             else:
                 print(f"✅ User already exists in database: {self.username}")
+                stored_code = result.data[0].get('friend_code')
+                if not stored_code:
+                    self.outbox.enqueue('update', 'users', {'user_id': self.user_id},
+                                        {'friend_code': self.get_friend_code()})
+                elif stored_code != self.friend_code:
+                    # The server's copy wins (it may have been lengthened to stay unique)
+                    self.set_friend_code(stored_code)
                 
         except Exception as e:
-            print(f"❌ Error initializing user: {e}")
+            # Insert-if-missing once we're back; the first sync then sends the full row
+            print(f"❌ Error initializing user: {e} (queued)")
+            self.outbox.enqueue('ensure', 'users', {'user_id': self.user_id}, new_user)
+
+    def connect_supabase(self):
+        """Create the Supabase client if there isn't one yet (raises while that fails)"""
+        if self.supabase is not None:
+            return
+        self.supabase: Client = create_client(self.supabase_url, self.supabase_key)
+        self.use_supabase = True
+        print("🗄️ Connected to Supabase!")
+
+    def send_outbox_item(self, op, table, match, payload):
+        """Deliver one queued write"""
+        send_mutation(self.supabase, op, table, match, payload)
+
+    def on_outbox_delivered(self, item):
+        """A queued write reached the server: note what it has, and refresh reads made before it"""
+        if item['table'] == 'users':
+            # An 'ensure' leaves an existing row alone, so only updates say what the server now has
+            if item['op'] == 'update' and item['match'] == {'user_id': self.user_id}:
+                self.sync_tracker.acknowledge(item['payload'])
+            return
+        if item['table'] != 'friends':
+            return
+        self.friends_cache.invalidate()
+        self.leaderboard_cache.invalidate()
+        if self.dashboard.fetcher:
+            self.dashboard.fetcher.request()
 
     def sync_to_supabase(self):
-        """Sync current user data to Supabase"""
-        if not self.use_supabase:
+        """Queue changed user fields for Supabase (nothing at all if nothing changed)"""
+        if not self.sync_enabled:
             return
         
         try:
+            # One consistent snapshot, rounded to the column types so sub-unit drift does not count as a change
+            state = self.state.snapshot()
             user_data = {
                 'username': self.username,
-                'dumplings': self.dumplings,
-                'total_dumplings_earned': self.total_dumplings_earned,
-                'health': self.health,
-                'current_state': self.current_state,
-                'productive_time_today': self.productive_time_today,
-                'session_dumplings': self.dumpling_earning_session,
+                'dumplings': round(state['dumplings'], 2),
+                'total_dumplings_earned': round(state['total_dumplings_earned'], 2),
+                'health': int(state['health']),
+                'current_state': state['current_state'],
+                'productive_time_today': int(state['productive_time_today']),
+                'session_dumplings': round(state['dumpling_earning_session'], 2),
                 'last_activity': datetime.now().isoformat(),
-                'coding_time_today': self.time_spent.get('coding', 0),
-                'social_media_time_today': self.time_spent.get('browsing_social', 0)
+                'coding_time_today': int(state['time_spent'].get('coding', 0)),
+                'social_media_time_today': int(state['time_spent'].get('browsing_social', 0))
             }
             
-            self.supabase.table('users').update(user_data).eq('user_id', self.user_id).execute()
+            with self.sync_lock:
+                changes = self.sync_tracker.changes(user_data)
+                if not changes:
+                    return
+                # Merged with any update still waiting in the outbox, so a reconnect sends one write;
+                # the fields stay dirty until on_outbox_delivered hears the server took them
+                self.outbox.enqueue('update', 'users', {'user_id': self.user_id}, changes)
             self.last_sync_time = datetime.now()
             
         except Exception as e:
@@ -1112,163 +1342,101 @@ Currently I have {int(self.dumplings)} dumplings! Let's motivate each other to s
     # === CORE MONITORING SYSTEM ===
     def start_monitoring(self):
         """Start activity monitoring"""
-        def monitor():
-            while True:
-                try:
-                    self.detect_current_activity()
-                    self.update_menu_title()
-                    # Small delay to prevent excessive CPU usage
-                    time.sleep(30)
-                except Exception as e:
-                    print(f"Monitoring error: {e}")
-                    time.sleep(30)
-        
-        threading.Thread(target=monitor, daemon=True).start()
+        def on_sample(probe):
+            self.detect_current_activity(probe)
+            self.update_menu_title()
+        
+        # App switches are pushed as they happen; adaptive polling catches tab changes
+        self.activity_source = create_activity_source(self.detector, scheduler=self.poll_scheduler)
+        self.activity_source.start(on_sample)
         print("🔍 Activity monitoring started")
 
-    def detect_current_activity(self):
+    def detect_current_activity(self, probe=None):
         """Detect what the user is currently doing"""
         try:
-            # Get the current active application
-            active_app_script = '''
-            tell application "System Events"
-                set frontApp to name of first application process whose frontmost is true
-                return frontApp
-            end tell
-            '''
-            
-            result = subprocess.run(['osascript', '-e', active_app_script], 
-                                  capture_output=True, text=True, timeout=5)
+            # One probe answers app, browser and active tab together
+            if probe is None:
+                probe = self.detector.probe()
             
-            if result.returncode == 0:
-                app_name = result.stdout.strip().lower()
+            if probe and probe.app:
+                app_name = probe.app.lower()
                 
-                # If it's Chrome, get the current URL
-                if 'chrome' in app_name:
-                    url, title = self.get_current_chrome_url()
-                    if url:
-                        self.handle_website_detection(url, title)
-                        return
+                # If it's a browser, use the current URL
+                if probe.url:
+                    self.handle_website_detection(probe.url, probe.title)
+                    return
                 
                 # Handle other applications
                 if any(app in app_name for app in ['code', 'xcode', 'vim', 'atom', 'sublime', 'cursor']):
-                    self.current_state = 'coding'
-                    self.current_website = None
-                    self.current_website_category = None
+                    new_state = 'coding'
                 elif any(app in app_name for app in ['slack', 'teams', 'notion', 'trello']):
-                    self.current_state = 'working'
-                    self.current_website = None
-                    self.current_website_category = None
+                    new_state = 'working'
                 elif any(app in app_name for app in ['figma', 'sketch', 'photoshop']):
-                    self.current_state = 'designing'
-                    self.current_website = None
-                    self.current_website_category = None
+                    new_state = 'designing'
                 else:
-                    # Default to idle if unknown app
-                    if self.current_state not in ['idle', 'eating', 'sick']:
-                        self.current_state = 'idle'
-                    self.current_website = None
-                    self.current_website_category = None
+                    new_state = None
+                
+                with self.state.transaction():
+                    if new_state is None:
+                        # Default to idle if unknown app
+                        new_state = self.current_state if self.current_state in ['idle', 'eating', 'sick'] else 'idle'
+                    self.state.update(current_state=new_state, current_website=None, current_website_category=None)
                     
         except Exception as e:
             print(f"Error detecting activity: {e}")
 
-    def get_current_chrome_url(self):
-        """Get current Chrome tab URL and title"""
-        try:
-            chrome_script = '''
-            tell application "Google Chrome"
-                if (count of windows) = 0 then
-                    return "No windows"
-                end if
-                
-                set currentWindow to front window
-                if (count of tabs of currentWindow) = 0 then
-                    return "No tabs"
-                end if
-                
-                set currentTab to active tab of currentWindow
-                set currentURL to URL of currentTab
-                set currentTitle to title of currentTab
-                return currentURL & " ||| " & currentTitle
-            end tell
-            '''
-            
-            result = subprocess.run(['osascript', '-e', chrome_script], 
-                                  capture_output=True, text=True, timeout=5)
-            
-            if result.returncode == 0 and " ||| " in result.stdout:
-                parts = result.stdout.strip().split(" ||| ")
-                return parts[0], parts[1] if len(parts) > 1 else ""
-            
-        except Exception as e:
-            print(f"Error getting Chrome URL: {e}")
-            
-        return None, None
-
     def handle_website_detection(self, url, title):
         """Handle when a new website is detected"""
         try:
             # Categorize the website
             category = self.categorize_website(url, title)
             
-            # If it's a new website, update tracking
-            if url != self.current_website:
-                self.current_website = url
-                self.current_website_category = category
-                
-                # Determine state based on category
-                self.current_state = f'browsing_{category}' if category != 'other' else 'browsing_other'
+            # If it's a new website, update tracking (state based on category)
+            with self.state.transaction():
+                if url != self.current_website:
+                    self.state.update(current_website=url, current_website_category=category,
+                                      current_state=f'browsing_{category}' if category != 'other' else 'browsing_other')
                     
         except Exception as e:
             print(f"Error handling website detection: {e}")
 
+    def refresh_category_matcher(self):
+        """Recompile the category tables after the website categories change"""
+        self.category_matcher = CategoryMatcher(self.website_categories, self.custom_website_categories)
+
     def categorize_website(self, url, title=""):
         """Categorize a website based on URL and title"""
         if not url:
             return 'other'
         
         try:
-            # Parse the domain
-            parsed = urlparse(url.lower())
-            domain = parsed.netloc.replace('www.', '')
-            full_url = (url + " " + title).lower()
-            
-            # Check custom user categories first
-            for domain_pattern, category in self.custom_website_categories.items():
-                if domain_pattern in domain:
-                    return category
-            
-            # Check each standard category
-            for category, config in self.website_categories.items():
-                # Check domains
-                for domain_pattern in config['domains']:
-                    if domain_pattern in domain:
-                        return category
-                
-                # Check keywords in URL/title
-                for keyword in config.get('keywords', []):
-                    if keyword in full_url:
-                        return category
-            
-            return 'other'
+            # Custom categories first, then each standard category's domains and keywords
+            version = self.config_version['website_categories']
+            return self.category_cache.categorize(self.category_matcher, url, title, version)
             
         except Exception as e:
             print(f"Error categorizing website: {e}")
             return 'other'
 
+    def categorize_many(self, urls, titles=None):
+        """Categorize a batch of URLs (history re-scoring, backfills) with the compiled tables"""
+        urls = list(urls)
+        try:
+            return self.category_matcher.match_many(urls, titles)
+        except Exception as e:
+            print(f"Error categorizing websites: {e}")
+            return ['other'] * len(urls)
+
     def start_dumpling_monitoring(self):
         """Start dumpling earning monitoring"""
         def dumpling_monitor():
-            while True:
-                try:
-                    self.calculate_dumpling_earnings()
-                    self.update_stats()
-                except Exception as e:
-                    print(f"Dumpling monitor error: {e}")
-                time.sleep(60)  # Check every minute
-        
-        threading.Thread(target=dumpling_monitor, daemon=True).start()
+            try:
+                self.calculate_dumpling_earnings()
+                self.update_stats()
+            except Exception as e:
+                print(f"Dumpling monitor error: {e}")
+        
+        self.scheduler.every('dumplings', 60, dumpling_monitor, delay=0)  # Check every minute
         print("🥟 Dumpling monitoring started")
 
     def calculate_dumpling_earnings(self):
@@ -1280,43 +1448,50 @@ Currently I have {int(self.dumplings)} dumplings! Let's motivate each other to s
             return
         
         dumplings_earned = 0
-        
-        # Track time spent
-        if self.current_state in self.time_spent:
-            self.time_spent[self.current_state] += time_since_last * 60  # Convert to seconds
-        
-        # Calculate earnings based on activity
-        if self.current_state == 'coding':
-            dumplings_earned = 2.0 * time_since_last
-            self.productive_time_today += time_since_last
-        elif self.current_state == 'working':
-            dumplings_earned = 0.8 * time_since_last
-            self.productive_time_today += time_since_last
-        elif self.current_state == 'designing':
-            dumplings_earned = 1.5 * time_since_last
-            self.productive_time_today += time_since_last
-        elif self.current_state.startswith('browsing_'):
-            # Use website category rates
-            if self.current_website_category and self.current_website_category in self.website_categories:
-                rate = self.website_categories[self.current_website_category]['dumpling_rate']
-                dumplings_earned = rate * time_since_last
+        tracked_state = None
+        
+        # One transaction, so feeding or syncing meanwhile can't lose or tear these updates
+        with self.state.transaction():
+            # Track time spent
+            if self.current_state in self.time_spent:
+                self.time_spent[self.current_state] += time_since_last * 60  # Convert to seconds
+                tracked_state = self.current_state
+        
+            # Calculate earnings based on activity
+            if self.current_state == 'coding':
+                dumplings_earned = 2.0 * time_since_last
+                self.productive_time_today += time_since_last
+            elif self.current_state == 'working':
+                dumplings_earned = 0.8 * time_since_last
+                self.productive_time_today += time_since_last
+            elif self.current_state == 'designing':
+                dumplings_earned = 1.5 * time_since_last
+                self.productive_time_today += time_since_last
+            elif self.current_state.startswith('browsing_'):
+                # Use website category rates
+                if self.current_website_category and self.current_website_category in self.website_categories:
+                    rate = self.website_categories[self.current_website_category]['dumpling_rate']
+                    dumplings_earned = rate * time_since_last
                 
-                # Add to productive time if it's a productive category
-                if rate > 0:
-                    self.productive_time_today += time_since_last
-        
-        # Apply earnings
-        if dumplings_earned != 0:
-            self.dumplings += dumplings_earned
-            self.dumpling_earning_session += dumplings_earned
+                    # Add to productive time if it's a productive category
+                    if rate > 0:
+                        self.productive_time_today += time_since_last
+        
+            # Apply earnings
+            if dumplings_earned != 0:
+                self.dumplings += dumplings_earned
+                self.dumpling_earning_session += dumplings_earned
+                if dumplings_earned > 0:
+                    self.total_dumplings_earned += dumplings_earned
+        
+            # Update health based on activity
             if dumplings_earned > 0:
-                self.total_dumplings_earned += dumplings_earned
+                self.health = min(100, self.health + 0.5)  # Gradual health improvement
+            elif dumplings_earned < 0:
+                self.health = max(0, self.health - 0.3)  # Gradual health decline
         
-        # Update health based on activity
-        if dumplings_earned > 0:
-            self.health = min(100, self.health + 0.5)  # Gradual health improvement
-        elif dumplings_earned < 0:
-            self.health = max(0, self.health - 0.3)  # Gradual health decline
+        if tracked_state:
+            self.store.add_state_time(self.store_app, tracked_state, time_since_last * 60)
         
         self.last_dumpling_time = now
 
@@ -1328,7 +1503,8 @@ Currently I have {int(self.dumplings)} dumplings! Let's motivate each other to s
         
         if time_diff > 0:
             # Health decreases slowly over time without care
-            self.health = max(0, self.health - time_diff * 1)
+            with self.state.transaction():
+                self.health = max(0, self.health - time_diff * 1)
         
         self.last_stat_update = now
 
@@ -1336,72 +1512,84 @@ Currently I have {int(self.dumplings)} dumplings! Let's motivate each other to s
         """Update menu bar title with current state"""
         try:
             dino_emoji = self.states.get(self.current_state, '🦕')
-            self.title = dino_emoji
             
-            # Update menu items
-            self.update_menu_items()
+            # Update menu items (only titles that changed reach the menu bar)
+            self.menu_view.render([(self, dino_emoji)] + self.update_menu_items())
         except Exception as e:
             print(f"Error updating menu title: {e}")
 
     def update_menu_items(self):
-        """Update dynamic menu items"""
+        """Titles of the dynamic menu items, as (item, title) pairs for the menu view"""
         try:
+            # Titles come from one consistent copy of the stats
+            state = self.state.snapshot()
+            
             # Update status based on health
-            if self.health >= 80:
+            if state['health'] >= 80:
                 status = "Healthy"
-            elif self.health >= 60:
+            elif state['health'] >= 60:
                 status = "Good"
-            elif self.health >= 40:
+            elif state['health'] >= 40:
                 status = "Okay"
             else:
                 status = "Needs Care"
             
-            self.status_item.title = f"Status: {status}"
-            
-            # Update user info with online/offline status
+            # User info with online/offline status
             online_status = "🟢 Online" if self.use_supabase else "🔴 Offline"
-            self.user_info_item.title = f"👤 {self.username} • {online_status}"
-            
-            self.dumplings_item.title = f"🥟 Dumplings: {int(self.dumplings)}"
-            self.session_item.title = f"📈 Today: +{self.dumpling_earning_session:.0f}"
-            
-            self.health_item.title = f"❤️ Health: {int(self.health)}%"
             
-            # Update activity
+            # Activity and time tracking
             activity_text = self.get_friendly_activity_text()
-            self.activity_item.title = f"🎯 {activity_text}"
-            
-            # Update time tracking
             session_minutes = int((datetime.now() - self.session_start).total_seconds() / 60)
-            self.session_time_item.title = f"⏰ Session: {session_minutes}m"
-            
-            coding_time = int(self.time_spent.get('coding', 0) / 60)
-            social_time = int(self.time_spent.get('browsing_social', 0) / 60)
-            
-            self.coding_time_item.title = f"  💻 Coding: {coding_time}m"
-            self.social_time_item.title = f"  📱 Social: {social_time}m"
+            coding_time = int(state['time_spent'].get('coding', 0) / 60)
+            social_time = int(state['time_spent'].get('browsing_social', 0) / 60)
+            
+            return [
+                (self.status_item, f"Status: {status}"),
+                (self.user_info_item, f"👤 {self.username} • {online_status}"),
+                (self.dumplings_item, f"🥟 Dumplings: {int(state['dumplings'])}"),
+                (self.session_item, f"📈 Today: +{state['dumpling_earning_session']:.0f}"),
+                (self.health_item, f"❤️ Health: {int(state['health'])}%"),
+                (self.activity_item, f"🎯 {activity_text}"),
+                (self.session_time_item, f"⏰ Session: {session_minutes}m"),
+                (self.coding_time_item, f"  💻 Coding: {coding_time}m"),
+                (self.social_time_item, f"  📱 Social: {social_time}m"),
+            ]
             
         except Exception as e:
             print(f"Error updating menu items: {e}")
+            return []
 
     def start_social_monitoring(self):
-        """Start social monitoring"""
+        """Start social monitoring (pushed by Supabase Realtime in push mode, polled otherwise)"""
+        if self.sync_enabled and self.use_realtime:
+            # No access_token: the app never signs in to Supabase Auth, so there is no user JWT, and
+            # the publishable key isn't one. Joins are authorized by the apikey in realtime_url, as
+            # the anon role, the same one the REST calls use.
+            self.friend_feed = FriendFeed(self.realtime_url, self.user_id, self.store, self.friends_snapshot,
+                                          on_change=self.on_friend_change)
+        
         def social_monitor():
-            while True:
-                try:
-                    if self.social_notifications_enabled and self.use_supabase:
-                        self.check_competitive_updates()
-                except Exception as e:
-                    print(f"Social monitor error: {e}")
-                time.sleep(300)  # Check every 5 minutes
-        
-        threading.Thread(target=social_monitor, daemon=True).start()
+            try:
+                if self.social_notifications_enabled and self.use_supabase:
+                    self.check_competitive_updates()
+                    # Polling: the first friends fetch runs in the background, so look again once it can have landed
+                    if not (self.friend_feed and self.friend_feed.is_live()) and not self.friends_cache.loaded():
+                        return self.friends_cache.retry_delay
+            except Exception as e:
+                print(f"Social monitor error: {e}")
+        
+        # Check every 5 minutes; in push mode friend changes wake it too (at most once a minute)
+        self.scheduler.every('social', 300, social_monitor, delay=0, min_gap=60)
         print("👥 Social monitoring started")
 
     def check_competitive_updates(self):
-        """Check for competitive updates and send engaging notifications"""
+        """Check for competitive updates and send engaging notifications
+
+        Runs on the scheduler thread, so it only uses friend data that is
+        already cached; fetching is left to the caches' background refresh.
+        """
         try:
-            friends_data = self.get_friends_data()
+            friends_data = self.get_friends_data(wait=False)
             
             if not friends_data:
                 return
@@ -1414,37 +1602,52 @@ Currently I have {int(self.dumplings)} dumplings! Let's motivate each other to s
                 return
             
             my_session_dumplings = self.dumpling_earning_session
+            self.update_leaderboard(friends_data)
+            board = self.get_leaderboard(wait=False)
+            if not board or not board['me']:
+                return
             
             # Find interesting social dynamics
             notifications_sent = 0
             
-            # 1. Check if someone passed you
-            sorted_users = sorted(friends_data, key=lambda x: x.get('session_dumplings', 0), reverse=True)
-            my_rank = len([f for f in friends_data if f.get('session_dumplings', 0) > my_session_dumplings]) + 1
-            
-            for friend in sorted_users[:3]:  # Check top 3
-                friend_dumplings = friend.get('session_dumplings', 0)
+            # 1. Rank changes since the last check, newest first (skipping ones undone since)
+            for event in reversed(self.leaderboard.drain_events()):
+                friend = self.leaderboard.row(event['user_id'])
+                if not friend:
+                    continue
+                friend_dumplings = float(friend.get('session_dumplings') or 0)
                 
-                # Someone just passed you with a small margin
-                if (friend_dumplings > my_session_dumplings and 
-                    friend_dumplings - my_session_dumplings <= 10 and
-                    self.is_recent_activity(friend)):
-                    
+                if event['type'] == 'overtaken' and self.leaderboard.is_ahead(friend['user_id'], self.user_id):
                     activity = self.get_friendly_activity_from_state(friend.get('current_state', 'idle'))
                     self.send_native_notification(
                         "🏆 Competition Alert!",
                         f"{friend['username']} just passed you while {activity}",
                         f"They're ahead by {friend_dumplings - my_session_dumplings:.0f} dumplings!"
                     )
-                    notifications_sent += 1
-                    break
+                elif event['type'] == 'overtook' and self.leaderboard.is_ahead(self.user_id, friend['user_id']):
+                    self.send_native_notification(
+                        "🚀 Moving Up!",
+                        f"You just passed {friend['username']}!",
+                        f"You're #{self.leaderboard.rank(self.user_id)} of {len(self.leaderboard)} now"
+                    )
+                elif (event['type'] == 'entered_top' and friend['is_me'] and
+                      friend['rank'] <= self.leaderboard.top_count):
+                    self.send_native_notification(
+                        "🏆 Top 3!",
+                        f"You're #{friend['rank']} among your friends today!",
+                        "Your dino is so proud! 🦕"
+                    )
+                else:
+                    continue
+                notifications_sent += 1
+                break
             
             # 2. Motivational notifications for big gaps
-            if not notifications_sent:
-                top_performer = max(friends_data, key=lambda x: x.get('session_dumplings', 0))
+            if not notifications_sent and not board['top'][0]['is_me']:
+                top_performer = board['top'][0]
                 
-                if top_performer['session_dumplings'] > my_session_dumplings + 30:
-                    gap = top_performer['session_dumplings'] - my_session_dumplings
+                if float(top_performer['session_dumplings'] or 0) > my_session_dumplings + 30:
+                    gap = float(top_performer['session_dumplings'] or 0) - my_session_dumplings
                     
                     motivational_messages = [
                         f"🚀 {top_performer['username']} is crushing it with {gap:.0f} more dumplings!",
@@ -1510,26 +1713,20 @@ Currently I have {int(self.dumplings)} dumplings! Let's motivate each other to s
             return None
             
         try:
-            # Find user by friend code pattern
-            # Friend codes are like "DINO-ABC123" where DINO is username prefix
-            username_prefix = friend_code.split('-')[0].lower()
-            
-            # Search for users with matching friend code pattern
-            result = self.supabase.table('users').select('*').execute()
-            
-            for user in result.data:
-                if user['user_id'] == self.user_id:  # Don't add yourself
-                    continue
-                
-                # Check if this user's friend code matches
-                import hashlib
-                hash_input = f"{user['user_id']}-{user['username']}"
-                user_friend_code = f"{user['username'][:4].upper()}-{hashlib.md5(hash_input.encode()).hexdigest()[:6].upper()}"
-                
-                if user_friend_code == friend_code.upper():
-                    # Found the user! Add them as friend
-                    # For now, just return success - in a real app you'd manage a friends table
-                    return user['username']
+            # Friend codes are like "DINO-ABC123" and stored (uniquely indexed) per user
+            result = (self.supabase.table('users').select('user_id, username')
+                      .eq('friend_code', friend_code.strip().upper())
+                      .neq('user_id', self.user_id)  # Don't add yourself
+                      .limit(1).execute())
+            
+            if result.data:
+                # Found the user! Friendships go both ways, so write both rows
+                friend = result.data[0]
+                for user_id, friend_user_id in ((self.user_id, friend['user_id']), (friend['user_id'], self.user_id)):
+                    self.outbox.enqueue('upsert', 'friends', {'user_id': user_id, 'friend_user_id': friend_user_id},
+                                        {'user_id': user_id, 'friend_user_id': friend_user_id, 'status': 'accepted'})
+                # Friend reads are refreshed by on_outbox_delivered once the rows are on the server
+                return friend['username']
             
             return None  # Friend code not found
             
@@ -1540,47 +1737,59 @@ Currently I have {int(self.dumplings)} dumplings! Let's motivate each other to s
     def start_realtime_sync(self):
         """Start real-time syncing"""
         def sync_loop():
-            while True:
-                try:
-                    if self.use_supabase:
-                        self.sync_to_supabase()
-                except Exception as e:
-                    print(f"Sync error: {e}")
-                time.sleep(120)  # Sync every 2 minutes
-        
-        threading.Thread(target=sync_loop, daemon=True).start()
+            try:
+                if self.sync_enabled:
+                    self.sync_to_supabase()
+            except Exception as e:
+                print(f"Sync error: {e}")
+        
+        self.scheduler.every('sync', 120, sync_loop, delay=0)  # Sync every 2 minutes
         print("🔄 Real-time sync started")
 
     def start_remote_config_updates(self):
-        """Start background thread for remote configuration updates"""
+        """Schedule remote configuration updates"""
+        backoff = Backoff(base=30, maximum=1800)
+        fetching = threading.Lock()
+        
+        def fetch_configs():
+            try:
+                rows = self.fetch_remote_configs()
+            finally:
+                fetching.release()
+            if rows is None:
+                # Offline or failed: retry sooner, backing off up to 30 minutes
+                self.scheduler.wake('remote_config', backoff.next_delay())
+                return
+            backoff.reset()
+            # Applying is quick and touches the rules the other jobs use, so it runs on the scheduler
+            self.scheduler.after(0, lambda: self.apply_remote_configs(rows), name='remote_config_apply')
+        
         def config_updater():
-            while True:
-                try:
-                    self.update_remote_configs()
-                    time.sleep(3600)  # Check every hour
-                except Exception as e:
-                    print(f"Config update error: {e}")
-                    time.sleep(1800)  # Wait 30 minutes on error
-        
-        config_thread = threading.Thread(target=config_updater, daemon=True)
-        config_thread.start()
+            # The fetch gets its own thread so a slow network never holds up the other jobs
+            if fetching.acquire(blocking=False):
+                threading.Thread(target=fetch_configs, daemon=True).start()
+        
+        self.scheduler.every('remote_config', 3600, config_updater, delay=0)  # Check every hour
         print("🔄 Remote config updates started")
     
-    def update_remote_configs(self):
-        """Fetch and apply remote configuration updates"""
+    def fetch_remote_configs(self):
+        """Current app_config rows from Supabase, or None if they can't be fetched"""
         if not self.use_supabase:
-            return
+            return None
             
         try:
-            # Fetch current config versions
             result = self.supabase.table('app_config').select('config_key, config_value, version').execute()
-            
-            if not result.data:
-                return
-                
+            return result.data or []
+        except Exception as e:
+            print(f"Remote config update error: {e}")
+            return None
+    
+    def apply_remote_configs(self, rows):
+        """Apply the fetched config rows that are newer than what we have"""
+        try:
             updated = False
             
-            for config in result.data:
+            for config in rows:
                 key = config['config_key']
                 remote_version = config['version']
                 local_version = self.config_version.get(key, 0)
@@ -1591,6 +1800,14 @@ Currently I have {int(self.dumplings)} dumplings! Let's motivate each other to s
                     
                     if key == 'website_categories':
                         self.website_categories = config['config_value']
+                        self.refresh_category_matcher()
+                        # Re-score the page we're on so earnings use the new rules right away
+                        website = self.current_website
+                        if website:
+                            category = self.categorize_many([website])[0]
+                            with self.state.transaction():
+                                if self.current_website == website:  # not left meanwhile
+                                    self.current_website_category = category
                         updated = True
                     elif key == 'dumpling_rates':
                         self.apply_dumpling_rate_update(config['config_value'])
@@ -1630,6 +1847,16 @@ Currently I have {int(self.dumplings)} dumplings! Let's motivate each other to s
         try:
             features = settings_config.get('features', {})
             
+            # Detection polling bounds
+            polling = settings_config.get('activity_polling', {})
+            if polling:
+                self.poll_scheduler.configure(
+                    min_interval=polling.get('min_interval_seconds'),
+                    max_interval=polling.get('max_interval_seconds'),
+                    backoff=polling.get('backoff'),
+                    idle_pause=polling.get('idle_pause_seconds')
+                )
+            
             # Apply feature toggles (future use)
             if 'multiplayer' in features:
                 pass  # Could toggle multiplayer features
@@ -6,6 +6,7 @@ CREATE TABLE IF NOT EXISTS users (
     id SERIAL PRIMARY KEY,
     user_id VARCHAR(50) UNIQUE NOT NULL,
     username VARCHAR(100) NOT NULL,
+    friend_code VARCHAR(40) UNIQUE,
     dumplings DECIMAL(10,2) DEFAULT 0,
     total_dumplings_earned DECIMAL(10,2) DEFAULT 0,
     health INTEGER DEFAULT 100,
@@ -32,7 +33,7 @@ CREATE TABLE IF NOT EXISTS activities (
     timestamp TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
--- Friends table for friend relationships (optional for future use)
+-- Friends table for friend relationships (one row per direction)
 CREATE TABLE IF NOT EXISTS friends (
     id SERIAL PRIMARY KEY,
     user_id VARCHAR(50) NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
@@ -104,6 +105,105 @@ $$ language 'plpgsql';
 CREATE TRIGGER update_users_updated_at BEFORE UPDATE ON users
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+-- Friend codes are stored (uniquely indexed) so adding a friend is one equality lookup.
+-- Clients send the code they show, built like this; the trigger fills in missing
+-- codes and takes more hash digits if a code is already taken.
+CREATE OR REPLACE FUNCTION assign_friend_code()
+RETURNS TRIGGER AS $$
+DECLARE
+    digits INTEGER := 6;
+BEGIN
+    NEW.friend_code := COALESCE(UPPER(NEW.friend_code),
+        UPPER(LEFT(NEW.username, 4)) || '-' || UPPER(LEFT(MD5(NEW.user_id || '-' || NEW.username), digits)));
+    WHILE EXISTS (SELECT 1 FROM users WHERE friend_code = NEW.friend_code AND user_id <> NEW.user_id) LOOP
+        digits := digits + 1;
+        NEW.friend_code := UPPER(LEFT(NEW.username, 4)) || '-' || UPPER(LEFT(MD5(NEW.user_id || '-' || NEW.username), digits));
+    END LOOP;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER assign_users_friend_code BEFORE INSERT OR UPDATE OF friend_code ON users
+    FOR EACH ROW EXECUTE FUNCTION assign_friend_code();
+
+-- Friends: one page of a user's accepted friends, joined with their stats.
+-- Keyset-paginated on friend_user_id (pass the last user_id of the previous
+-- page as p_after), which the (user_id, friend_user_id) unique index serves.
+CREATE OR REPLACE FUNCTION get_friends(p_user_id VARCHAR, p_limit INTEGER DEFAULT 50, p_after VARCHAR DEFAULT NULL)
+RETURNS TABLE (
+    user_id VARCHAR,
+    username VARCHAR,
+    session_dumplings DECIMAL,
+    total_dumplings_earned DECIMAL,
+    health INTEGER,
+    current_state VARCHAR,
+    last_activity TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE
+) AS $$
+    SELECT u.user_id, u.username, u.session_dumplings, u.total_dumplings_earned, u.health,
+           u.current_state, u.last_activity, u.updated_at
+    FROM friends f
+    JOIN users u ON u.user_id = f.friend_user_id
+    WHERE f.user_id = p_user_id
+      AND f.status = 'accepted'
+      AND (p_after IS NULL OR f.friend_user_id > p_after)
+    ORDER BY f.friend_user_id
+    LIMIT p_limit;
+$$ LANGUAGE sql STABLE;
+
+-- Leaderboard: the caller and their accepted friends ranked by session_dumplings,
+-- returning only the top players plus the caller's rank and neighbors, so clients
+-- fetch a handful of rows instead of sorting everyone locally. Costs O(friends).
+-- Ties are broken by user_id so every player has exactly one rank.
+CREATE OR REPLACE FUNCTION get_leaderboard(p_user_id VARCHAR, p_top INTEGER DEFAULT 3, p_neighbors INTEGER DEFAULT 1)
+RETURNS TABLE (
+    user_id VARCHAR,
+    username VARCHAR,
+    session_dumplings DECIMAL,
+    current_state VARCHAR,
+    last_activity TIMESTAMP WITH TIME ZONE,
+    rank BIGINT,
+    total BIGINT,
+    is_me BOOLEAN
+) AS $$
+    WITH players AS (
+        SELECT p_user_id AS user_id
+        UNION
+        SELECT f.friend_user_id FROM friends f
+        WHERE f.user_id = p_user_id AND f.status = 'accepted'
+    ),
+    ranked AS (
+        SELECT u.user_id, u.username, u.session_dumplings, u.current_state, u.last_activity,
+               ROW_NUMBER() OVER (ORDER BY u.session_dumplings DESC, u.user_id DESC) AS rank,
+               COUNT(*) OVER () AS total
+        FROM players p
+        JOIN users u ON u.user_id = p.user_id
+    )
+    SELECT r.user_id, r.username, r.session_dumplings, r.current_state, r.last_activity, r.rank, r.total,
+           r.user_id = p_user_id
+    FROM ranked r
+    WHERE r.rank <= p_top
+       OR ABS(r.rank - (SELECT m.rank FROM ranked m WHERE m.user_id = p_user_id)) <= p_neighbors
+    ORDER BY r.rank;
+$$ LANGUAGE sql STABLE;
+
+-- Realtime: publish row changes of users (friends' stats) and friends (new friendships)
+-- for the optional push mode in friend_realtime.py
+-- (ADD TABLE fails for a table that is already published, so check first and the schema can be re-run)
+DO $$
+DECLARE
+    published_table TEXT;
+BEGIN
+    FOREACH published_table IN ARRAY ARRAY['users', 'friends'] LOOP
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_publication_tables
+            WHERE pubname = 'supabase_realtime' AND schemaname = 'public' AND tablename = published_table
+        ) THEN
+            EXECUTE format('ALTER PUBLICATION supabase_realtime ADD TABLE public.%I', published_table);
+        END IF;
+    END LOOP;
+END $$;
+
 -- Sample data (optional - remove if you don't want test data)
 -- INSERT INTO users (user_id, username) VALUES 
 --     ('demo1234', 'DemoUser_demo'),
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Supabase sync helpers for Dino Tamagotchi
+Keeps track of what the server already has so a sync sends only the fields
+that changed, and nothing at all when the row is clean. Writes go through a
+durable outbox that survives being offline (or a restart) and is retried
+with jittered exponential backoff until the server takes it.
+"""
+
+import random
+import threading
+import time
+
+
+class DirtyFieldTracker:
+    """Diffs outgoing rows against the fields the server has confirmed
+
+    Fields only count as sent once acknowledge() reports them delivered, so a
+    write that is still queued (or was dropped) keeps them dirty.
+
+    heartbeat_fields (like last_activity) change on every call, so they are
+    never a reason to sync on their own; they ride along with real changes
+    and are sent by themselves at most once per heartbeat_interval seconds.
+    """
+
+    def __init__(self, heartbeat_fields=(), heartbeat_interval=600):
+        self.heartbeat_fields = tuple(heartbeat_fields)
+        self.heartbeat_interval = heartbeat_interval
+        self.acked = {}
+        self.last_heartbeat = None
+        self.lock = threading.Lock()
+
+    def changes(self, row):
+        """Fields of row the server does not have yet (empty dict if the row is clean)"""
+        with self.lock:
+            changed = {field: value for field, value in row.items()
+                       if field not in self.heartbeat_fields and self.acked.get(field, self) != value}
+            heartbeat_due = (self.last_heartbeat is None or
+                             time.monotonic() - self.last_heartbeat >= self.heartbeat_interval)
+            if changed or heartbeat_due:
+                changed.update({field: row[field] for field in self.heartbeat_fields if field in row})
+            return changed
+
+    def acknowledge(self, sent):
+        """Record that the server accepted sent"""
+        with self.lock:
+            self.acked.update(sent)
+            if any(field in sent for field in self.heartbeat_fields):
+                self.last_heartbeat = time.monotonic()
+
+    def reset(self):
+        """Forget everything, so the next sync sends the full row"""
+        with self.lock:
+            self.acked.clear()
+            self.last_heartbeat = None
+
+
+class Backoff:
+    """Exponential backoff with full jitter, so reconnecting clients spread out"""
+
+    def __init__(self, base=2, maximum=300):
+        self.base = base
+        self.maximum = maximum
+        self.attempts = 0
+
+    def next_delay(self):
+        delay = min(self.maximum, self.base * (2 ** self.attempts))
+        self.attempts += 1
+        return random.uniform(0, delay)
+
+    def reset(self):
+        self.attempts = 0
+
+
+def send_mutation(client, op, table, match, payload):
+    """Run one outbox entry against Supabase
+
+    op is 'ensure' (insert unless a row matching match exists), 'upsert' (insert or
+    overwrite the row matching match), 'insert' or 'update'.
+    """
+    query = client.table(table)
+    if op == 'ensure':
+        query.upsert(payload, on_conflict=','.join(match), ignore_duplicates=True).execute()
+    elif op == 'upsert':
+        query.upsert(payload, on_conflict=','.join(match)).execute()
+    elif op == 'insert':
+        query.insert(payload).execute()
+    elif op == 'update':
+        query = query.update(payload)
+        for column, value in match.items():
+            query = query.eq(column, value)
+        query.execute()
+    else:
+        raise ValueError(f"Unknown outbox op: {op}")
+
+
+# PostgREST error codes that mean the row itself was refused: SQLSTATE classes 22
+# (bad data) and 23 (constraint violation), or the HTTP status when the
+# response had no JSON body. Auth, RLS, schema and server errors can all
+# clear up on their own, so those are retried instead.
+REJECTED_SQLSTATE_CLASSES = ('22', '23')
+REJECTED_HTTP_STATUSES = {400, 409, 422}
+
+
+def is_rejected_write(error):
+    """True if a PostgREST APIError says the write can never succeed as sent"""
+    code = str(getattr(error, 'code', None) or '')
+    if code.isdigit() and len(code) == 3:
+        return int(code) in REJECTED_HTTP_STATUSES
+    return len(code) == 5 and code[:2] in REJECTED_SQLSTATE_CLASSES
+
+
+def fetch_friends(client, user_id, page_size=50):
+    """All of user_id's accepted friends with their stats (the get_friends RPC, a page at a time)"""
+    friends = []
+    after = None
+    while True:
+        page = client.rpc('get_friends', {'p_user_id': user_id, 'p_limit': page_size,
+                                          'p_after': after}).execute().data or []
+        friends.extend(page)
+        if len(page) < page_size:
+            return friends
+        after = page[-1]['user_id']
+
+
+def fetch_leaderboard(client, user_id, top=3, neighbors=1):
+    """Top players among user_id and their friends, plus user_id's rank and neighbors (the get_leaderboard RPC)
+
+    Returns {'top': rows, 'me': row or None, 'around': rows, 'total': players};
+    'around' is me with up to neighbors players on either side. Rows are
+    ordered by rank and carry 'rank' and 'is_me'.
+    """
+    rows = client.rpc('get_leaderboard', {'p_user_id': user_id, 'p_top': top,
+                                          'p_neighbors': neighbors}).execute().data or []
+    me = next((row for row in rows if row['is_me']), None)
+    return {
+        'top': [row for row in rows if row['rank'] <= top],
+        'me': me,
+        'around': [row for row in rows if me and abs(row['rank'] - me['rank']) <= neighbors],
+        'total': rows[0]['total'] if rows else 0
+    }
+
+
+class CachedFetch:
+    """In-memory copy of a remote read, shared by every caller
+
+    Fresh for ttl seconds; after that get() still answers from memory at once
+    and refreshes in the background (stale-while-revalidate), so only the very
+    first read waits on the network. However many callers ask at once, at most
+    one fetch runs (singleflight). A failed fetch keeps the old value and is
+    not retried for retry_delay seconds. A fetch that was already running when
+    invalidate() was called may have read the old data, so its result is kept
+    but counts as stale.
+    """
+
+    def __init__(self, fetch, ttl=60, retry_delay=30):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.retry_delay = retry_delay
+        self.value = None
+        self.fetched_at = None
+        self.retry_at = 0
+        self.generation = 0  # bumped by invalidate()
+        self.inflight = None  # Event set when the running fetch finishes
+        self.lock = threading.Lock()
+
+    def get(self, default=None, wait=True):
+        """Cached value (fetched now if there is none yet), or default if it can't be fetched
+
+        With wait=False a missing value is fetched in the background instead
+        and default is returned right away.
+        """
+        with self.lock:
+            now = time.monotonic()
+            has_value = self.fetched_at is not None
+            done = self.inflight
+            leader = False
+            generation = self.generation
+            if done is None and now >= self.retry_at and (not has_value or now - self.fetched_at >= self.ttl):
+                done = self.inflight = threading.Event()
+                leader = True
+            if has_value:
+                value = self.value
+
+        if has_value or not wait:
+            if leader:
+                threading.Thread(target=self._refresh, args=(done, generation), daemon=True).start()
+            return value if has_value else default
+
+        if leader:
+            self._refresh(done, generation)
+        elif done is not None:
+            done.wait()
+        with self.lock:
+            return self.value if self.fetched_at is not None else default
+
+    def loaded(self):
+        """True once a fetch has succeeded"""
+        with self.lock:
+            return self.fetched_at is not None
+
+    def invalidate(self):
+        """Treat the cached value as stale, so the next get() refreshes it"""
+        with self.lock:
+            if self.fetched_at is not None:
+                self.fetched_at -= self.ttl
+            self.retry_at = 0
+            self.generation += 1
+
+    def _refresh(self, done, generation):
+        try:
+            value = self.fetch()
+        except Exception as e:
+            print(f"Refresh failed, keeping cached data: {e}")
+            with self.lock:
+                self.retry_at = time.monotonic() + self.retry_delay
+        else:
+            with self.lock:
+                self.value = value
+                self.fetched_at = time.monotonic()
+                if generation != self.generation:
+                    self.fetched_at -= self.ttl  # invalidated while fetching
+        finally:
+            with self.lock:
+                self.inflight = None
+            done.set()
+
+
+class OutboundQueue:
+    """Background sender for the store's outbox of pending Supabase writes
+
+    Writes to the same row with the same op are merged while they wait, so
+    however long the client was offline the server sees one write per row
+    when it comes back. connect (optional) is called before every drain and
+    should raise while the server is unreachable; that is what turns a
+    failed startup connection into an automatic reconnect. Errors for which
+    is_permanent(error) is true (the server rejected the write itself) drop
+    that entry instead of blocking the queue behind it. on_delivered(item), if
+    given, is called on the sender thread once the server has taken an entry.
+    """
+
+    def __init__(self, store, send, connect=None, backoff=None, is_permanent=None, on_delivered=None):
+        self.store = store
+        self.send = send
+        self.connect = connect
+        self.backoff = backoff or Backoff()
+        self.is_permanent = is_permanent
+        self.on_delivered = on_delivered
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def enqueue(self, op, table, match, payload):
+        """Persist a write and wake the sender"""
+        self.store.outbox_put(op, table, match, payload)
+        self.wakeup.set()
+
+    def pending(self):
+        return self.store.outbox_count()
+
+    def stop(self, timeout=5):
+        """Make one last delivery attempt and stop; anything unsent waits for the next launch"""
+        self.stopped.set()
+        self.wakeup.set()
+        if self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=timeout)
+
+    def _run(self):
+        while True:
+            self.wakeup.clear()
+            delivered = self._drain()
+            if self.stopped.is_set():
+                break
+            if delivered:
+                self.backoff.reset()
+                self.wakeup.wait()
+            else:
+                self.stopped.wait(self.backoff.next_delay())
+
+    def _drain(self):
+        try:
+            if self.connect:
+                self.connect()
+            for item in self.store.outbox_items():
+                try:
+                    self.send(item['op'], item['table'], item['match'], item['payload'])
+                except Exception as e:
+                    if not (self.is_permanent and self.is_permanent(e)):
+                        raise
+                    print(f"❌ Dropping rejected {item['op']} on {item['table']}: {e}")
+                    self.store.outbox_remove(item['key'], item['seq'])
+                    continue
+                self.store.outbox_remove(item['key'], item['seq'])
+                if self.on_delivered:
+                    try:
+                        self.on_delivered(item)
+                    except Exception as e:
+                        print(f"Error after delivering {item['op']} on {item['table']}: {e}")
+            return True
+        except Exception as e:
+            print(f"📴 Sync offline, {self.pending()} write(s) queued: {e}")
+            return False
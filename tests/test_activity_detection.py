@@ -0,0 +1,202 @@
+"""Detection worker and activity source, driven by fakes so they run on any OS"""
+
+import queue
+import sys
+import textwrap
+import time
+
+import pytest
+
+from activity_detection import (AWAY_PROBE, ActivityProbe, ActivitySource, AdaptivePollScheduler,
+                                FakeDetectionBackend, OsascriptWorker, ScriptedActivitySource)
+
+# Speaks the worker's JSON-lines protocol; argv[1] picks how it misbehaves
+FAKE_WORKER = textwrap.dedent('''
+    import json, os, sys
+
+    mode, marker = sys.argv[1], sys.argv[2]
+    for line in sys.stdin:
+        request = json.loads(line)
+        if mode == 'crash-once' and not os.path.exists(marker):
+            open(marker, 'w').close()
+            sys.exit(1)
+        if mode == 'hang':
+            continue
+        if request['cmd'] == 'idle':
+            print(json.dumps({'id': request['id'], 'ok': True, 'result': 42.5}))
+            sys.stdout.flush()
+            continue
+        if mode == 'garbage':
+            print('not json')
+            print('[1, 2]')
+            print(json.dumps({'id': -1, 'ok': True, 'result': {'app': 'Stale'}}))
+        if mode == 'error':
+            print(json.dumps({'id': request['id'], 'ok': False, 'error': 'no access'}))
+        else:
+            print(json.dumps({'id': request['id'], 'ok': True,
+                              'result': {'app': 'Code', 'bundle_id': 'com.microsoft.VSCode',
+                                         'browser': None, 'url': '', 'title': None}}))
+        sys.stdout.flush()
+''')
+
+
+@pytest.fixture
+def make_worker(tmp_path):
+    script = tmp_path / 'fake_worker.py'
+    script.write_text(FAKE_WORKER)
+    workers = []
+
+    def make(mode, timeout=2):
+        worker = OsascriptWorker(timeout=timeout,
+                                 command=[sys.executable, str(script), mode, str(tmp_path / 'crashed')])
+        workers.append(worker)
+        return worker
+
+    yield make
+    for worker in workers:
+        worker.stop()
+
+
+CODE = ActivityProbe(app='Code', bundle_id='com.microsoft.VSCode')
+
+
+def test_worker_answers_probes_from_one_process(make_worker):
+    worker = make_worker('ok')
+    assert worker.probe() == CODE
+    process = worker.process
+    assert worker.probe() == CODE
+    assert worker.process is process
+
+
+def test_worker_restarts_after_a_crash(make_worker):
+    worker = make_worker('crash-once')
+    assert worker.probe() is None
+    assert worker.process is None
+    assert worker.probe() == CODE
+
+
+def test_worker_times_out_and_is_replaced(make_worker):
+    worker = make_worker('hang', timeout=0.3)
+    started = time.monotonic()
+    assert worker.probe() is None
+    assert time.monotonic() - started < 2
+    assert worker.process is None
+
+
+def test_worker_skips_malformed_and_stale_replies(make_worker):
+    worker = make_worker('garbage')
+    assert worker.probe() == CODE
+    assert worker.probe() == CODE
+
+
+def test_worker_answers_idle_time_from_the_same_process(make_worker):
+    worker = make_worker('ok')
+    assert worker.probe() == CODE
+    process = worker.process
+    assert worker.idle_seconds() == 42.5
+    assert worker.process is process
+
+
+def test_worker_idle_time_is_zero_when_it_cannot_answer(make_worker):
+    assert make_worker('hang', timeout=0.3).idle_seconds() == 0
+
+
+def test_worker_error_reply_keeps_the_process(make_worker):
+    worker = make_worker('error')
+    assert worker.probe() is None
+    assert worker.process is not None and worker.process.poll() is None
+
+
+class FakeIdle:
+    """Stands in for user_idle_seconds"""
+
+    def __init__(self):
+        self.idle = 0
+
+    def __call__(self):
+        return self.idle
+
+
+def test_source_polls_backend_when_nothing_is_pushed():
+    backend = FakeDetectionBackend(CODE)
+    source = ActivitySource(backend, interval=0.01)
+    assert source.next_sample() == CODE
+    assert source.next_sample() == CODE
+    assert backend.requests == 2
+
+
+def test_source_reports_away_once_while_paused():
+    idle = FakeIdle()
+    scheduler = AdaptivePollScheduler(min_interval=0.01, max_interval=0.01, idle_pause=60, idle_seconds=idle)
+    backend = FakeDetectionBackend(CODE)
+    source = ActivitySource(backend, scheduler=scheduler)
+
+    idle.idle = 120
+    assert source.next_sample() is AWAY_PROBE
+    idle.idle = 0
+    assert source.next_sample() == CODE
+    assert backend.requests == 1  # nothing was probed while away
+
+
+def test_source_collects_samples_from_backend_changes():
+    backend = FakeDetectionBackend()
+    backend.set_frontmost('Google Chrome', 'com.google.Chrome', 'https://github.com/x', 'x')
+    source = ActivitySource(backend, interval=0.01)
+    probe = source.next_sample()
+    assert (probe.browser, probe.url, probe.title) == ('chrome', 'https://github.com/x', 'x')
+
+    backend.set_frontmost('Slack', 'com.tinyspeck.slackmacgap', 'https://ignored', 'ignored')
+    probe = source.next_sample()
+    assert (probe.app, probe.browser, probe.url, probe.title) == ('Slack', None, None, '')
+
+
+SLACK = ActivityProbe(app='Slack', bundle_id='com.tinyspeck.slackmacgap')
+FIGMA = ActivityProbe(app='Figma', bundle_id='com.figma.Desktop')
+
+
+def run_source(source, count, timeout=2):
+    """Start source and collect its first count samples"""
+    samples = queue.Queue()
+    source.start(samples.put)
+    try:
+        return [samples.get(timeout=timeout) for _ in range(count)]
+    finally:
+        source.stop()
+
+
+def test_scripted_pushes_arrive_without_polling():
+    backend = FakeDetectionBackend(CODE)
+    source = ScriptedActivitySource(backend, [(0.05, SLACK), (0.05, FIGMA)], interval=60)
+    assert run_source(source, 3) == [CODE, SLACK, FIGMA]
+    assert backend.requests == 1  # only the first sample asked the backend
+
+
+def test_source_falls_back_to_polling_between_pushes():
+    backend = FakeDetectionBackend(CODE)
+    source = ScriptedActivitySource(backend, [], interval=0.05)
+    samples = queue.Queue()
+    source.start(samples.put)
+    try:
+        assert samples.get(timeout=2) == CODE
+        assert samples.get(timeout=2) == CODE  # polled, nothing was pushed
+        backend.set_frontmost('Slack', SLACK.bundle_id)
+        while samples.get(timeout=2) != SLACK:
+            pass  # the next poll picks the switch up
+    finally:
+        source.stop()
+    assert backend.requests >= 3
+
+
+def test_repeated_push_of_the_frontmost_app_is_dropped():
+    backend = FakeDetectionBackend(CODE)
+    script = [(0.05, SLACK), (0.05, SLACK), (0.05, SLACK), (0.05, FIGMA), (0.05, SLACK)]
+    source = ScriptedActivitySource(backend, script, interval=60)
+    assert run_source(source, 4) == [CODE, SLACK, FIGMA, SLACK]
+
+
+def test_burst_of_pushes_is_coalesced_to_the_latest():
+    backend = FakeDetectionBackend(CODE)
+    source = ActivitySource(backend, interval=60)
+    for probe in (SLACK, FIGMA, SLACK, FIGMA):
+        source.notify(probe)
+    assert source.next_sample() == FIGMA
@@ -0,0 +1,125 @@
+"""FriendFeed against the local Realtime stand-in"""
+
+import time
+
+import pytest
+
+import friend_realtime
+from friend_realtime import FriendFeed
+from local_store import LocalStore
+from realtime_standin import RealtimeStandIn
+from supabase_sync import Backoff
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            pytest.fail("timed out waiting")
+        time.sleep(0.02)
+
+
+def friend(user_id, dumplings=0, updated_at='2026-01-01T12:00:00+00:00'):
+    return {'user_id': user_id, 'username': user_id.title(), 'session_dumplings': dumplings,
+            'updated_at': updated_at}
+
+
+@pytest.fixture
+def standin():
+    server = RealtimeStandIn().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def make_feed(standin, tmp_path):
+    feeds = []
+
+    def make(rows, **kwargs):
+        store = LocalStore(str(tmp_path / 'dino.db'))
+        snapshots = []
+        changes = []
+
+        def snapshot():
+            snapshots.append(time.monotonic())
+            return [dict(row) for row in rows]
+
+        feed = FriendFeed(standin.url, 'me', store, snapshot, on_change=changes.append,
+                          backoff=Backoff(base=0.05, maximum=0.1), **kwargs)
+        feeds.append(feed)
+        wait_until(feed.is_live)
+        return feed, store, snapshots, changes
+
+    yield make
+    for feed in feeds:
+        feed.stop()
+
+
+def test_joins_a_channel_filtered_to_our_friends(standin, make_feed):
+    feed, store, snapshots, _ = make_feed([friend('rex'), friend('tri')], access_token='token')
+    assert [row['user_id'] for row in store.friends()] == ['rex', 'tri']
+    assert len(snapshots) == 1
+    assert standin.subscriber_count() == 1
+    assert standin.push(friend('stranger', 99)) == 0
+    assert standin.push(friend('rex', 5, '2026-01-01T12:00:01+00:00')) == 1
+
+
+def test_row_changes_are_applied_and_reported(standin, make_feed):
+    feed, store, _, changes = make_feed([friend('rex', 1)])
+
+    standin.push(friend('rex', 42, '2026-01-01T12:05:00+00:00'))
+    wait_until(lambda: changes)
+    assert changes[0]['session_dumplings'] == 42
+    assert store.friend('rex')['session_dumplings'] == 42
+
+    standin.push(friend('rex', 7, '2026-01-01T11:00:00+00:00'))  # older than what we have
+    standin.push(friend('rex', 50, '2026-01-01T12:06:00+00:00'))
+    wait_until(lambda: len(changes) == 2)
+    assert store.friend('rex')['session_dumplings'] == 50
+
+
+def test_friends_change_resyncs_and_resubscribes(standin, make_feed):
+    rows = [friend('rex')]
+    feed, store, snapshots, changes = make_feed(rows)
+
+    joins, leaves = len(standin.events('phx_join')), len(standin.events('phx_leave'))
+    rows.append(friend('tri'))
+    standin.push({'user_id': 'me', 'friend_user_id': 'tri'}, table='friends', change_type='INSERT')
+    wait_until(lambda: None in changes)
+    assert len(snapshots) == 2
+    assert [row['user_id'] for row in store.friends()] == ['rex', 'tri']
+    assert len(standin.events('phx_join')) == joins + 1
+    assert len(standin.events('phx_leave')) == leaves + 1
+    wait_until(lambda: standin.push(friend('tri', 3, '2026-01-01T12:01:00+00:00')) == 1)
+
+
+def test_reconnects_with_a_fresh_snapshot_after_a_drop(standin, make_feed):
+    feed, store, snapshots, changes = make_feed([friend('rex')])
+    joins = len(standin.events('phx_join'))
+
+    standin.disconnect_all()
+    wait_until(lambda: len(snapshots) == 2 and feed.is_live())
+    assert len(standin.events('phx_join')) == joins + 1  # the friends from before the drop, in one join
+    wait_until(lambda: standin.push(friend('rex', 9, '2026-01-01T12:01:00+00:00')) == 1)
+    wait_until(lambda: changes)
+
+
+def test_stays_down_and_retries_while_the_server_is_gone(tmp_path):
+    server = RealtimeStandIn().start()
+    url = server.url
+    server.stop()
+    feed = FriendFeed(url, 'me', LocalStore(str(tmp_path / 'dino.db')), lambda: [],
+                      backoff=Backoff(base=0.05, maximum=0.1))
+    try:
+        time.sleep(0.5)
+        assert not feed.is_live()
+        assert feed.backoff.attempts >= 2  # kept retrying, backing off between attempts
+    finally:
+        feed.stop()
+
+
+def test_sends_heartbeats(standin, make_feed, monkeypatch):
+    monkeypatch.setattr(friend_realtime, 'HEARTBEAT_INTERVAL', 0.05)
+    make_feed([friend('rex')])
+    wait_until(lambda: len(standin.events('heartbeat')) >= 2)
+    assert set(standin.events('heartbeat')) == {'phoenix'}
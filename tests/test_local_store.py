@@ -0,0 +1,51 @@
+"""LocalStore shared by several app variants, and its one-time legacy imports"""
+
+import json
+
+from local_store import LocalStore
+
+
+def test_variants_sharing_a_database_get_distinct_visit_ids(tmp_path):
+    path = str(tmp_path / 'dino.db')
+    first, second = LocalStore(path), LocalStore(path)
+    ids = []
+    for _ in range(3):
+        ids.append(first.log_visit('website', 'github.com', 'productive'))
+        ids.append(second.log_visit('dumpling', 'twitter.com', 'social'))
+        first.add_visit_time('website', ids[-2], 'productive', 5)
+        second.add_visit_time('dumpling', ids[-1], 'social', 7)
+    first.flush()
+    second.flush()
+
+    assert len(set(ids)) == 6
+    assert [visit['duration'] for visit in first.visits('website')] == [5, 5, 5]
+    assert [visit['duration'] for visit in second.visits('dumpling')] == [7, 7, 7]
+
+
+def test_rejected_flush_does_not_wedge_the_buffer(tmp_path):
+    store = LocalStore(str(tmp_path / 'dino.db'))
+    store.pending_state[('website', 'broken')] = None  # violates NOT NULL
+    store.flush()
+
+    store.add_state_time('website', 'coding', 4)
+    store.flush()
+    assert store.state_totals('website') == {'coding': 4}
+
+
+def test_shared_player_files_are_imported_once(tmp_path):
+    shared_dir = tmp_path / 'shared_data'
+    shared_dir.mkdir()
+    (shared_dir / 'u1.json').write_text(json.dumps({'user_id': 'u1', 'username': 'Old name',
+                                                    'last_activity': '2026-01-01T10:00:00'}))
+    (shared_dir / 'u2.json').write_text(json.dumps({'username': 'Rex'}))
+    (shared_dir / 'broken.json').write_text('{')
+
+    store = LocalStore(str(tmp_path / 'dino.db'))
+    store.put_player('u1', {'user_id': 'u1', 'username': 'New name'})
+    store.migrate_legacy_files('multiplayer', legacy_dir=str(tmp_path), shared_dir=str(shared_dir))
+    (shared_dir / 'u3.json').write_text(json.dumps({'user_id': 'u3'}))
+    store.migrate_legacy_files('multiplayer', legacy_dir=str(tmp_path), shared_dir=str(shared_dir))
+
+    players = {player['user_id']: player for player in store.players()}
+    assert players == {'u1': {'user_id': 'u1', 'username': 'New name'},
+                       'u2': {'user_id': 'u2', 'username': 'Rex'}}
@@ -0,0 +1,28 @@
+"""Scheduler timing"""
+
+import threading
+from datetime import datetime
+
+from scheduler import Scheduler, seconds_until
+
+
+def test_seconds_until_later_today():
+    assert seconds_until(17, now=datetime(2026, 3, 2, 16, 59, 30)) == 30
+
+
+def test_seconds_until_rolls_over_to_tomorrow():
+    assert seconds_until(17, now=datetime(2026, 3, 2, 17, 0, 0)) == 24 * 3600
+    assert seconds_until(17, now=datetime(2026, 3, 2, 17, 3)) == 24 * 3600 - 180
+    assert seconds_until(9, 30, now=datetime(2026, 3, 2, 23, 30)) == 10 * 3600
+
+
+def test_job_returning_a_delay_is_scheduled_by_it():
+    scheduler = Scheduler()
+    ran = threading.Event()
+    try:
+        job = scheduler.every('daily', 24 * 3600, lambda: (ran.set(), 1234)[1], delay=0)
+        assert ran.wait(2)
+        scheduler.stop()
+        assert 1233 < job.due - job.last_run < 1235
+    finally:
+        scheduler.stop()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Website categorization for Dino Tamagotchi
+Compiles the category tables into Aho-Corasick automatons once, so a lookup
+scans the URL a single time no matter how many rules remote config pushes.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+
+class PatternAutomaton:
+    """Aho-Corasick automaton answering "which matching pattern has the best rank?"
+
+    Patterns are plain substrings; each carries a rank and lower ranks win.
+    """
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.best = [None]  # best rank of any pattern ending at (or suffix-linked from) a node
+
+        for pattern, rank in patterns:
+            node = 0
+            for char in pattern:
+                next_node = self.goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self.goto)
+                    self.goto[node][char] = next_node
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.best.append(None)
+                node = next_node
+            if self.best[node] is None or rank < self.best[node]:
+                self.best[node] = rank
+
+        # Breadth-first pass to fill failure links and fold suffix matches into best
+        queue = list(self.goto[0].values())
+        for node in queue:
+            for char, child in self.goto[node].items():
+                state = self.fail[node]
+                while char not in self.goto[state] and state:
+                    state = self.fail[state]
+                fallback = self.goto[state].get(char, 0)
+                self.fail[child] = fallback if fallback != child else 0
+                inherited = self.best[self.fail[child]]
+                if inherited is not None and (self.best[child] is None or inherited < self.best[child]):
+                    self.best[child] = inherited
+                queue.append(child)
+
+    def best_match(self, text):
+        """Lowest rank among patterns occurring in text, or None"""
+        goto, fail, best = self.goto, self.fail, self.best
+        result = best[0]  # An empty pattern matches everything
+        node = 0
+        for char in text:
+            while char not in goto[node] and node:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            rank = best[node]
+            if rank is not None and (result is None or rank < result):
+                result = rank
+        return result
+
+
+def split_url(url, title=""):
+    """(domain, lowered url + title) the way categorize_website has always compared them"""
+    domain = urlparse(url.lower()).netloc.replace('www.', '')
+    return domain, (url + " " + title).lower()
+
+
+class CategoryMatcher:
+    """Compiled form of website_categories (+ custom categories and fallback rules)
+
+    Precedence matches the original nested loops: custom domain patterns in
+    insertion order, then categories in order (a domain or keyword hit in an
+    earlier category beats any hit in a later one), then the fallback rules in
+    order. fallback_rules is a list of ('domain' | 'url', terms, category).
+    """
+
+    def __init__(self, website_categories, custom_categories=None, fallback_rules=()):
+        self.results = []
+        domain_patterns = []
+        url_patterns = []
+
+        for pattern, category in (custom_categories or {}).items():
+            domain_patterns.append((pattern, self._rank(category)))
+
+        for category, config in website_categories.items():
+            rank = self._rank(category)
+            domain_patterns.extend((pattern, rank) for pattern in config.get('domains', []))
+            url_patterns.extend((keyword, rank) for keyword in config.get('keywords', []))
+
+        for field, terms, category in fallback_rules:
+            rank = self._rank(category)
+            patterns = domain_patterns if field == 'domain' else url_patterns
+            patterns.extend((term, rank) for term in terms)
+
+        self.domain_automaton = PatternAutomaton(domain_patterns)
+        self.url_automaton = PatternAutomaton(url_patterns)
+        # Same rules, same version: lets stored results be re-scored only when the rules change
+        self.rules_version = hashlib.sha1(json.dumps(
+            [[[pattern, self.results[rank]] for pattern, rank in patterns]
+             for patterns in (domain_patterns, url_patterns)]).encode()).hexdigest()[:16]
+
+    def _rank(self, category):
+        self.results.append(category)
+        return len(self.results) - 1
+
+    def _resolve(self, domain_rank, url_rank):
+        ranks = [rank for rank in (domain_rank, url_rank) if rank is not None]
+        return self.results[min(ranks)] if ranks else 'other'
+
+    def match_parts(self, domain, full_url):
+        """Category for an already split (domain, lowered url + title) pair"""
+        return self._resolve(self.domain_automaton.best_match(domain),
+                             self.url_automaton.best_match(full_url))
+
+    def match(self, url, title=""):
+        """Category for a URL and page title"""
+        if not url:
+            return 'other'
+        return self.match_parts(*split_url(url, title or ""))
+
+    def match_many(self, urls, titles=None):
+        """Categories for a batch of URLs, in order (titles, if given, line up with urls)
+
+        Repeated (url, title) pairs are classified once and URLs sharing a domain
+        share one domain scan, which is what makes history backfills cheap.
+        """
+        urls = list(urls)
+        titles = [""] * len(urls) if titles is None else list(titles)
+        seen = {}
+        domain_ranks = {}
+        categories = []
+        for url, title in zip(urls, titles):
+            key = (url, title)
+            category = seen.get(key)
+            if category is None:
+                if not url:
+                    category = 'other'
+                else:
+                    domain, full_url = split_url(url, title or "")
+                    if domain not in domain_ranks:
+                        domain_ranks[domain] = self.domain_automaton.best_match(domain)
+                    category = self._resolve(domain_ranks[domain], self.url_automaton.best_match(full_url))
+                seen[key] = category
+            categories.append(category)
+        return categories
+
+
+class CategoryCache:
+    """Bounded LRU cache (with a TTL) of categorization results
+
+    Entries are tagged with the version passed in; a lookup with a different
+    version drops everything, so bumping the category config version or editing
+    custom categories invalidates the cache without anyone having to remember to.
+    """
+
+    def __init__(self, maxsize=1024, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()  # (url, title) -> (category, expires_at)
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def categorize(self, matcher, url, title="", version=None):
+        """Cached matcher.match(url, title)"""
+        key = (url, title)
+        now = time.monotonic()
+        with self.lock:
+            if version != self.version:
+                self.entries.clear()
+                self.version = version
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        category = matcher.match(url, title)
+
+        with self.lock:
+            if version == self.version:
+                self.entries[key] = (category, now + self.ttl)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+        return category
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """Hit/miss counters for diagnostics"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self.entries),
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
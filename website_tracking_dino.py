@@ -1,17 +1,40 @@
 #!/usr/bin/env python3
 
 import rumps
-import subprocess
-import time
-import threading
 from datetime import datetime, timedelta
-import json
-import os
 import random
 import re
+from collections import deque
 from urllib.parse import urlparse
+from activity_detection import create_detection_backend, create_activity_source
+from website_categorizer import CategoryMatcher, CategoryCache
+from state_journal import WriteBehindSaver
+from local_store import LocalStore, RECENT_VISITS
+from menu_view import MenuView
+from scheduler import Scheduler
+from dino_state import DinoState, StateField
 
 class WebsiteTrackingDino(rumps.App):
+    # (happiness, health) gained per 3 seconds spent in an app state
+    APP_STATE_EFFECTS = {
+        'working': (1, 0.5),
+        'coding': (2, 1),
+        'designing': (2, 0.5),
+        'gaming': (3, 0),
+    }
+    
+    # Stats shared by every thread live in self.state; these read and write through to it
+    current_state = StateField()
+    current_website = StateField()
+    current_website_category = StateField()
+    happiness = StateField()
+    energy = StateField()
+    health = StateField()
+    time_spent = StateField()
+    website_time = StateField()
+    daily_websites = StateField()
+    social_media_streak = StateField()
+    
     def __init__(self):
         super(WebsiteTrackingDino, self).__init__("🦕", quit_button=None)
         
@@ -80,41 +103,52 @@ class WebsiteTrackingDino(rumps.App):
             }
         }
         
-        # Core stats
-        self.current_state = 'idle'
-        self.current_website = None
-        self.current_website_category = None
-        self.happiness = 50
-        self.energy = 50
-        self.health = 100
+        # Compiled once; the special cases run after every category misses
+        self.category_matcher = CategoryMatcher(self.website_categories, fallback_rules=[
+            ('url', ['login', 'auth', 'signin'], 'work'),
+            ('domain', ['gov', 'edu'], 'productive')
+        ])
+        self.category_cache = CategoryCache(maxsize=1024, ttl=3600)
+        
+        # Core stats, time totals and recent visits; the activity source, the scheduler
+        # and menu callbacks all change them, so they live in self.state and every
+        # read-modify-write runs in a transaction
+        self.state = DinoState(
+            current_state='idle',
+            current_website=None,
+            current_website_category=None,
+            happiness=50,
+            energy=50,
+            health=100,
+            time_spent={
+                'idle': 0,
+                'working': 0,
+                'coding': 0,
+                'designing': 0,
+                'browsing_productive': 0,
+                'browsing_work': 0,
+                'browsing_social': 0,
+                'browsing_news': 0,
+                'browsing_entertainment': 0,
+                'browsing_shopping': 0,
+                'browsing_other': 0,
+                'gaming': 0
+            },
+            # Website-specific tracking: domain -> total_seconds, and the latest visits only
+            # ({id, domain, duration, category, timestamp}); the full log and its hourly
+            # rollups live in the store, so memory stays flat
+            website_time={},
+            daily_websites=deque(maxlen=RECENT_VISITS),
+            social_media_streak=0
+        )
         
         # Enhanced time tracking
         self.session_start = datetime.now()
         self.state_start_time = datetime.now()
         self.website_start_time = datetime.now()
         
-        self.time_spent = {
-            'idle': 0,
-            'working': 0,
-            'coding': 0,
-            'designing': 0,
-            'browsing_productive': 0,
-            'browsing_work': 0,
-            'browsing_social': 0,
-            'browsing_news': 0,
-            'browsing_entertainment': 0,
-            'browsing_shopping': 0,
-            'browsing_other': 0,
-            'gaming': 0
-        }
-        
-        # Website-specific tracking
-        self.website_time = {}  # domain -> total_seconds
-        self.daily_websites = []  # list of {domain, duration, category, timestamp}
-        
         # Health tracking
         self.browsing_streak = 0
-        self.social_media_streak = 0
         self.last_health_warning = None
         self.last_break_reminder = None
         self.last_website_report = None
@@ -122,8 +156,22 @@ class WebsiteTrackingDino(rumps.App):
         # Notification settings
         self.notifications_enabled = True
         
-        # Load saved data
+        # Resident osascript worker for activity detection
+        self.detector = create_detection_backend(timeout=2)
+        
+        # Stats, time totals and visits live in the local database (old save files are imported once)
+        self.store_app = 'website_tracking_dino'
+        self.store = LocalStore()
+        self.store.migrate_legacy_files(self.store_app, "dino_website_data.json")
+        self.menu_view = MenuView()
+        
+        # State changes only mark the save dirty; it is written in the background
+        self.saver = WriteBehindSaver(self.save_data, interval=5)
+        self.saver.install_signal_handlers()
+        
+        # Load saved data, re-scoring saved visits in case category rules changed
         self.load_data()
+        self.rescore_website_history()
         
         # Create menu
         self.create_static_menu()
@@ -133,6 +181,9 @@ class WebsiteTrackingDino(rumps.App):
                                     f"Now monitoring your browsing habits!",
                                     "Your dino will track specific websites and react accordingly!")
         
+        # One thread runs the periodic checks and delayed state resets
+        self.scheduler = Scheduler()
+        
         # Start monitoring
         self.start_monitoring()
         self.start_health_monitoring()
@@ -141,100 +192,38 @@ class WebsiteTrackingDino(rumps.App):
         print("🦕 Website-Tracking Dino Started!")
         print("Now monitoring Chrome tabs and categorizing websites!")
     
-    def get_current_browser_url(self):
-        """Get the current URL from Chrome using AppleScript"""
-        try:
-            # Try Chrome first
-            chrome_script = '''
-            tell application "Google Chrome"
-                if exists window 1 then
-                    set currentURL to URL of active tab of window 1
-                    set currentTitle to title of active tab of window 1
-                    return currentURL & "|" & currentTitle
-                else
-                    return ""
-                end if
-            end tell
-            '''
-            
-            result = subprocess.run(['osascript', '-e', chrome_script], 
-                                  capture_output=True, text=True, timeout=2)
-            
-            if result.returncode == 0 and result.stdout.strip():
-                url_and_title = result.stdout.strip()
-                if "|" in url_and_title:
-                    url, title = url_and_title.split("|", 1)
-                    return url.strip(), title.strip()
-                else:
-                    return url_and_title.strip(), ""
-            
-            # Fallback to Safari if Chrome fails
-            safari_script = '''
-            tell application "Safari"
-                if exists window 1 then
-                    set currentURL to URL of current tab of window 1
-                    set currentTitle to name of current tab of window 1
-                    return currentURL & "|" & currentTitle
-                else
-                    return ""
-                end if
-            end tell
-            '''
-            
-            result = subprocess.run(['osascript', '-e', safari_script], 
-                                  capture_output=True, text=True, timeout=2)
-            
-            if result.returncode == 0 and result.stdout.strip():
-                url_and_title = result.stdout.strip()
-                if "|" in url_and_title:
-                    url, title = url_and_title.split("|", 1)
-                    return url.strip(), title.strip()
-                else:
-                    return url_and_title.strip(), ""
-            
-            return None, None
-            
-        except Exception as e:
-            print(f"Error getting browser URL: {e}")
-            return None, None
-    
     def categorize_website(self, url, title=""):
         """Categorize a website based on URL and title"""
         if not url:
             return 'other'
         
         try:
-            # Parse the domain
-            parsed = urlparse(url.lower())
-            domain = parsed.netloc.replace('www.', '')
-            path = parsed.path.lower()
-            full_url = (url + " " + title).lower()
-            
-            # Check each category
-            for category, config in self.website_categories.items():
-                # Check domains
-                for domain_pattern in config['domains']:
-                    if domain_pattern in domain:
-                        return category
-                
-                # Check keywords in URL/title
-                for keyword in config['keywords']:
-                    if keyword in full_url:
-                        return category
-            
-            # Special cases
-            if any(term in full_url for term in ['login', 'auth', 'signin']):
-                return 'work'
-            
-            if any(term in domain for term in ['gov', 'edu']):
-                return 'productive'
-                
-            return 'other'
+            # Keyed by the matcher's rules, so rebuilding it with new rules drops stale results
+            matcher = self.category_matcher
+            return self.category_cache.categorize(matcher, url, title, matcher.rules_version)
             
         except Exception as e:
             print(f"Error categorizing website: {e}")
             return 'other'
     
+    def categorize_many(self, urls, titles=None):
+        """Categorize a batch of URLs with the compiled tables"""
+        urls = list(urls)
+        try:
+            return self.category_matcher.match_many(urls, titles)
+        except Exception as e:
+            print(f"Error categorizing websites: {e}")
+            return ['other'] * len(urls)
+    
+    def rescore_website_history(self):
+        """Re-categorize today's website visits if the category rules changed since they were scored"""
+        try:
+            self.store.recategorize_visits(self.store_app, self.categorize_many, self.category_matcher.rules_version)
+            self.daily_websites = deque(self.store.visits(self.store_app, limit=RECENT_VISITS),
+                                        maxlen=RECENT_VISITS)
+        except Exception as e:
+            print(f"Error re-scoring website history: {e}")
+    
     def get_website_display_info(self, category):
         """Get display info for a website category"""
         if category in self.website_categories:
@@ -263,8 +252,8 @@ class WebsiteTrackingDino(rumps.App):
         """Create static menu items"""
         self.status_item = rumps.MenuItem("Status: Just chilling")
         self.website_item = rumps.MenuItem("🌐 Website: None")
-        self.health_item = rumps.MenuItem(f"🦕 Health: ❤️❤️❤️❤️❤️ {self.health}%")
-        self.happiness_item = rumps.MenuItem(f"😊 Happiness: 😊😊😊😊😊 {self.happiness}%")
+        self.health_item = rumps.MenuItem(f"🦕 Health: ❤️❤️❤️❤️❤️ {self.health:.0f}%")
+        self.happiness_item = rumps.MenuItem(f"😊 Happiness: 😊😊😊😊😊 {self.happiness:.0f}%")
         self.energy_item = rumps.MenuItem(f"⚡ Energy: ⚡⚡⚡⚡⚡ {self.energy}%")
         
         self.session_item = rumps.MenuItem("⏰ Session: 0m")
@@ -312,16 +301,24 @@ class WebsiteTrackingDino(rumps.App):
             self.notifications_toggle,
             rumps.MenuItem("Reset Day", callback=self.reset),
             rumps.separator,
-            rumps.MenuItem("Quit", callback=rumps.quit_application)
+            rumps.MenuItem("Quit", callback=self.quit_app)
         ]
         
         # Initial update
         self.update_all_menu_items()
     
+    def quit_app(self, sender):
+        """Stop background jobs and the detection worker, flush pending saves and quit"""
+        self.scheduler.stop()
+        self.activity_source.stop()
+        self.detector.stop()
+        self.saver.stop()
+        rumps.quit_application()
+    
     @rumps.clicked("Website Report 📊")
     def show_website_report(self, sender):
         """Show detailed website usage report"""
-        top_sites = sorted(self.website_time.items(), key=lambda x: x[1], reverse=True)[:5]
+        top_sites = self.store.domain_totals(self.store_app, limit=5)
         
         if top_sites:
             report_lines = []
@@ -332,7 +329,7 @@ class WebsiteTrackingDino(rumps.App):
             
             self.send_native_notification(
                 "📊 Your Top Websites Today",
-                f"Total sites visited: {len(self.website_time)}",
+                f"Total sites visited: {self.store.domain_count(self.store_app)}",
                 report
             )
         else:
@@ -357,34 +354,24 @@ class WebsiteTrackingDino(rumps.App):
     def start_notification_scheduler(self):
         """Enhanced notification scheduler with website insights"""
         def notification_scheduler():
-            while True:
-                try:
-                    now = datetime.now()
-                    
-                    # Website usage report every hour
-                    if (not self.last_website_report or 
-                        now - self.last_website_report > timedelta(hours=1)):
-                        self.send_website_usage_report()
-                        self.last_website_report = now
-                        
-                except Exception as e:
-                    print(f"Notification scheduler error: {e}")
+            try:
+                now = datetime.now()
                 
-                time.sleep(600)  # Check every 10 minutes
+                # Website usage report every hour
+                if (not self.last_website_report or 
+                    now - self.last_website_report > timedelta(hours=1)):
+                    self.send_website_usage_report()
+                    self.last_website_report = now
+                    
+            except Exception as e:
+                print(f"Notification scheduler error: {e}")
         
-        threading.Thread(target=notification_scheduler, daemon=True).start()
+        self.scheduler.every('notifications', 600, notification_scheduler, delay=0)  # Check every 10 minutes
     
     def send_website_usage_report(self):
         """Send hourly website usage report"""
-        if not self.daily_websites:
-            return
-        
-        # Calculate category totals
-        category_totals = {}
-        for entry in self.daily_websites:
-            if 'category' in entry:
-                cat = entry['category']
-                category_totals[cat] = category_totals.get(cat, 0) + entry.get('duration', 0)
+        # Today's category totals, summed by the database
+        category_totals = self.store.category_totals(self.store_app)
         
         if category_totals:
             top_category = max(category_totals.items(), key=lambda x: x[1])
@@ -395,58 +382,61 @@ class WebsiteTrackingDino(rumps.App):
             self.send_native_notification(
                 "📊 Hourly Website Report",
                 f"Top category: {emoji} {category_name.title()} ({self.format_time(total_time)})",
-                f"Health impact: {self.health}% | Keep monitoring your digital wellness!"
+                f"Health impact: {self.health:.0f}% | Keep monitoring your digital wellness!"
             )
     
     def update_all_menu_items(self):
-        """Update all menu items with current data"""
+        """Update all menu items with current data (only changed titles are pushed)"""
         try:
-            status_text = self.get_current_status()
-            self.status_item.title = f"Status: {status_text}"
-            
-            # Website info
-            if self.current_website:
-                try:
-                    domain = urlparse(self.current_website).netloc.replace('www.', '')
-                    category_emoji = self.website_categories.get(self.current_website_category, {}).get('emoji', '🌐')
-                    self.website_item.title = f"{category_emoji} Website: {domain}"
-                except:
-                    self.website_item.title = "🌐 Website: Unknown"
-            else:
-                self.website_item.title = "🌐 Website: None"
-            
-            session_time = self.format_time((datetime.now() - self.session_start).total_seconds())
-            
-            health_bar = self.create_bar(self.health, "❤️", "💔")
-            happiness_bar = self.create_bar(self.happiness, "😊", "😢") 
-            energy_bar = self.create_bar(self.energy, "⚡", "😴")
-            
-            self.health_item.title = f"🦕 Health: {health_bar} {self.health}%"
-            self.happiness_item.title = f"😊 Happiness: {happiness_bar} {self.happiness}%"
-            self.energy_item.title = f"⚡ Energy: {energy_bar} {self.energy}%"
-            
-            self.session_item.title = f"⏰ Session: {session_time}"
-            
-            # Enhanced time breakdown
-            self.productive_item.title = f"  📖 Productive Sites: {self.format_time(self.time_spent['browsing_productive'])}"
-            self.work_item.title = f"  💼 Work Sites: {self.format_time(self.time_spent['browsing_work'])}"
-            self.social_item.title = f"  📱 Social Media: {self.format_time(self.time_spent['browsing_social'])}"
-            self.news_item.title = f"  📰 News Sites: {self.format_time(self.time_spent['browsing_news'])}"
-            self.entertainment_item.title = f"  🍿 Entertainment: {self.format_time(self.time_spent['browsing_entertainment'])}"
-            self.shopping_item.title = f"  🛒 Shopping: {self.format_time(self.time_spent['browsing_shopping'])}"
-            self.other_browsing_item.title = f"  🌐 Other Browsing: {self.format_time(self.time_spent['browsing_other'])}"
-            
-            self.coding_item.title = f"  💻 Coding: {self.format_time(self.time_spent['coding'])}"
-            self.designing_item.title = f"  🎨 Designing: {self.format_time(self.time_spent['designing'])}"
-            
-            # Update menu bar icon
-            health_indicator = ""
-            if self.health < 30:
-                health_indicator = "🚨"
-            elif self.health < 60:
-                health_indicator = "⚠️"
-            
-            self.title = f"{self.states[self.current_state]}{health_indicator}"
+            # Titles are built from one consistent view of the stats, then pushed outside the lock
+            with self.state.transaction():
+                status_text = self.get_current_status()
+                
+                # Website info
+                if self.current_website:
+                    try:
+                        domain = urlparse(self.current_website).netloc.replace('www.', '')
+                        category_emoji = self.website_categories.get(self.current_website_category, {}).get('emoji', '🌐')
+                        website_text = f"{category_emoji} Website: {domain}"
+                    except:
+                        website_text = "🌐 Website: Unknown"
+                else:
+                    website_text = "🌐 Website: None"
+                
+                session_time = self.format_time((datetime.now() - self.session_start).total_seconds())
+                
+                health_bar = self.create_bar(self.health, "❤️", "💔")
+                happiness_bar = self.create_bar(self.happiness, "😊", "😢") 
+                energy_bar = self.create_bar(self.energy, "⚡", "😴")
+                
+                # Menu bar icon
+                health_indicator = ""
+                if self.health < 30:
+                    health_indicator = "🚨"
+                elif self.health < 60:
+                    health_indicator = "⚠️"
+                
+                titles = [
+                    (self, f"{self.states[self.current_state]}{health_indicator}"),
+                    (self.status_item, f"Status: {status_text}"),
+                    (self.website_item, website_text),
+                    (self.health_item, f"🦕 Health: {health_bar} {self.health:.0f}%"),
+                    (self.happiness_item, f"😊 Happiness: {happiness_bar} {self.happiness:.0f}%"),
+                    (self.energy_item, f"⚡ Energy: {energy_bar} {self.energy}%"),
+                    (self.session_item, f"⏰ Session: {session_time}"),
+                    # Enhanced time breakdown
+                    (self.productive_item, f"  📖 Productive Sites: {self.format_time(self.time_spent['browsing_productive'])}"),
+                    (self.work_item, f"  💼 Work Sites: {self.format_time(self.time_spent['browsing_work'])}"),
+                    (self.social_item, f"  📱 Social Media: {self.format_time(self.time_spent['browsing_social'])}"),
+                    (self.news_item, f"  📰 News Sites: {self.format_time(self.time_spent['browsing_news'])}"),
+                    (self.entertainment_item, f"  🍿 Entertainment: {self.format_time(self.time_spent['browsing_entertainment'])}"),
+                    (self.shopping_item, f"  🛒 Shopping: {self.format_time(self.time_spent['browsing_shopping'])}"),
+                    (self.other_browsing_item, f"  🌐 Other Browsing: {self.format_time(self.time_spent['browsing_other'])}"),
+                    (self.coding_item, f"  💻 Coding: {self.format_time(self.time_spent['coding'])}"),
+                    (self.designing_item, f"  🎨 Designing: {self.format_time(self.time_spent['designing'])}"),
+                ]
+            
+            self.menu_view.render(titles)
             
         except Exception as e:
             print(f"Error updating menu: {e}")
@@ -500,70 +490,57 @@ class WebsiteTrackingDino(rumps.App):
             return f"{hours}h {minutes}m"
     
     def start_monitoring(self):
-        def monitor():
-            while True:
-                try:
-                    self.check_current_activity()
-                except Exception as e:
-                    print(f"Monitor error: {e}")
-                time.sleep(3)
-        
-        threading.Thread(target=monitor, daemon=True).start()
+        self.activity_source = create_activity_source(self.detector, interval=3)
+        self.activity_source.start(self.check_current_activity)
     
     def start_health_monitoring(self):
         """Enhanced health monitoring with website-specific warnings"""
         def health_monitor():
-            while True:
-                try:
-                    now = datetime.now()
-                    
-                    # Social media addiction warning
-                    if self.social_media_streak > 900:  # 15 minutes
-                        self.send_native_notification(
-                            "📱 Social Media Alert!",
-                            f"You've been on social media for {self.format_time(self.social_media_streak)}",
-                            "Consider taking a break to protect your mental health!"
-                        )
+            try:
+                now = datetime.now()
+                
+                with self.state.transaction():
+                    social_streak = self.social_media_streak
+                    if social_streak > 900:
                         self.social_media_streak = 0  # Reset to avoid spam
-                    
-                    # General health warnings
-                    if self.health < 30 and (not self.last_health_warning or 
-                       now - self.last_health_warning > timedelta(minutes=10)):
-                        self.send_native_notification(
-                            "🚨 Health Critical!",
-                            f"Health: {self.health}% - Distraction overload!",
-                            "Take immediate action: close distracting websites and focus!"
-                        )
-                        self.last_health_warning = now
-                        
-                except Exception as e:
-                    print(f"Health monitor error: {e}")
+                    health = self.health
+                
+                # Social media addiction warning
+                if social_streak > 900:  # 15 minutes
+                    self.send_native_notification(
+                        "📱 Social Media Alert!",
+                        f"You've been on social media for {self.format_time(social_streak)}",
+                        "Consider taking a break to protect your mental health!"
+                    )
                 
-                time.sleep(30)
+                # General health warnings
+                if health < 30 and (not self.last_health_warning or 
+                   now - self.last_health_warning > timedelta(minutes=10)):
+                    self.send_native_notification(
+                        "🚨 Health Critical!",
+                        f"Health: {health:.0f}% - Distraction overload!",
+                        "Take immediate action: close distracting websites and focus!"
+                    )
+                    self.last_health_warning = now
+                    
+            except Exception as e:
+                print(f"Health monitor error: {e}")
         
-        threading.Thread(target=health_monitor, daemon=True).start()
+        self.scheduler.every('health', 30, health_monitor, delay=0)
     
-    def check_current_activity(self):
+    def check_current_activity(self, probe=None):
         """Enhanced activity checking with website monitoring"""
         try:
-            # Get current app
-            app_script = '''
-            tell application "System Events"
-                set frontApp to name of first application process whose frontmost is true
-                return frontApp
-            end tell
-            '''
+            # Get current app and, for a browser, its active tab in one probe
+            if probe is None:
+                probe = self.detector.probe()
             
-            app_result = subprocess.run(['osascript', '-e', app_script], 
-                                      capture_output=True, text=True)
-            
-            if app_result.returncode == 0:
-                app_name = app_result.stdout.strip().lower()
+            if probe and probe.app:
+                app_name = probe.app.lower()
                 
-                # If it's a browser, get the URL
-                if any(browser in app_name for browser in ['chrome', 'safari', 'firefox']):
-                    url, title = self.get_current_browser_url()
-                    self.update_browsing_state(url, title, app_name)
+                # If it's a browser, use the URL
+                if probe.browser or any(browser in app_name for browser in ['chrome', 'safari', 'firefox']):
+                    self.update_browsing_state(probe.url, probe.title, app_name)
                 else:
                     self.update_non_browsing_state(app_name)
                 
@@ -572,53 +549,59 @@ class WebsiteTrackingDino(rumps.App):
     
     def update_browsing_state(self, url, title, browser):
         """Update state based on current website"""
-        # Track time for previous state/website
-        self.track_time_spent()
-        
-        # Update current website
-        old_website = self.current_website
-        self.current_website = url
-        
-        if url:
-            # Categorize the website
-            category = self.categorize_website(url, title)
-            self.current_website_category = category
-            
-            # Update website time tracking
-            try:
-                domain = urlparse(url).netloc.replace('www.', '')
-                if domain not in self.website_time:
-                    self.website_time[domain] = 0
+        # One transaction, so a feed or reset can't land between tracking the last
+        # stretch and switching to the new website
+        with self.state.transaction():
+            # Track time for the previous state and website, and apply their effects for it
+            state_seconds, website_seconds = self.track_time_spent()
+            self.apply_app_effects(self.current_state, state_seconds)
+            self.apply_website_effects(self.current_website_category, website_seconds)
+            
+            # Update current website
+            old_website = self.current_website
+            self.current_website = url
+            
+            if url:
+                # Categorize the website
+                category = self.categorize_website(url, title)
+                self.current_website_category = category
                 
-                # Track daily website entry
-                if old_website != url:
-                    self.daily_websites.append({
-                        'domain': domain,
-                        'category': category,
-                        'timestamp': datetime.now().isoformat(),
-                        'duration': 0
-                    })
+                # Update website time tracking
+                try:
+                    domain = urlparse(url).netloc.replace('www.', '')
+                    if domain not in self.website_time:
+                        self.website_time[domain] = 0
                     
-            except Exception as e:
-                print(f"Error tracking website: {e}")
-            
-            # Determine new state
-            emoji, new_state = self.get_website_display_info(category)
+                    # Track daily website entry
+                    if old_website != url:
+                        timestamp = datetime.now().isoformat()
+                        self.daily_websites.append({
+                            'id': self.store.log_visit(self.store_app, domain, category, timestamp,
+                                                       url=url, title=title),
+                            'domain': domain,
+                            'category': category,
+                            'timestamp': timestamp,
+                            'duration': 0
+                        })
+                        
+                except Exception as e:
+                    print(f"Error tracking website: {e}")
+                
+                # Determine new state
+                emoji, new_state = self.get_website_display_info(category)
+                
+            else:
+                # No URL detected, default browsing
+                new_state = 'browsing_other'
+                self.current_website_category = 'other'
             
-            # Apply website-specific effects
-            self.apply_website_effects(category, url)
+            # Update state
+            old_state = self.current_state
+            self.current_state = new_state
             
-        else:
-            # No URL detected, default browsing
-            new_state = 'browsing_other'
-            self.current_website_category = 'other'
-        
-        # Update state
-        old_state = self.current_state
-        self.current_state = new_state
-        
-        # Reset website timer
-        self.website_start_time = datetime.now()
+            # Reset website timer
+            self.website_start_time = datetime.now()
+            category, health = self.current_website_category, self.health
         
         # Update display
         self.update_all_menu_items()
@@ -627,11 +610,11 @@ class WebsiteTrackingDino(rumps.App):
         if old_website != url and url:
             try:
                 domain = urlparse(url).netloc.replace('www.', '')
-                category_emoji = self.website_categories.get(self.current_website_category, {}).get('emoji', '🌐')
+                category_emoji = self.website_categories.get(category, {}).get('emoji', '🌐')
                 
-                if self.current_website_category in ['social', 'entertainment']:
+                if category in ['social', 'entertainment']:
                     subtitle = f"⚠️ Entering distraction zone: {domain}"
-                elif self.current_website_category == 'productive':
+                elif category == 'productive':
                     subtitle = f"✅ Great choice: {domain}"
                 else:
                     subtitle = f"📍 Now on: {domain}"
@@ -639,66 +622,76 @@ class WebsiteTrackingDino(rumps.App):
                 self.send_native_notification(
                     f"{category_emoji} Website Change",
                     subtitle,
-                    f"Category: {self.current_website_category.title()} | Health: {self.health}%",
+                    f"Category: {category.title()} | Health: {health:.0f}%",
                     sound=False
                 )
                 
             except Exception as e:
                 print(f"Error sending website notification: {e}")
         
-        self.save_data()
+        self.saver.mark_dirty()
     
-    def apply_website_effects(self, category, url):
-        """Apply health/happiness effects based on website category"""
+    def apply_website_effects(self, category, seconds):
+        """Apply health/happiness effects of seconds spent on a website category"""
         if category in self.website_categories:
             config = self.website_categories[category]
             
-            # Apply modifiers
-            health_change = config['health_modifier'] * 0.5  # Per check (every 3 seconds)
-            happiness_change = config['happiness_modifier'] * 0.3
+            # Apply modifiers (rated per 3 seconds on the site, however often we sample)
+            checks = seconds / 3
+            health_change = config['health_modifier'] * 0.5 * checks
+            happiness_change = config['happiness_modifier'] * 0.3 * checks
             
-            self.health = max(0, min(100, self.health + health_change))
-            self.happiness = max(0, min(100, self.happiness + happiness_change))
-            
-            # Track social media streak
-            if category == 'social':
-                self.social_media_streak += 3
-            else:
-                self.social_media_streak = 0
+            with self.state.transaction():
+                self.health = max(0, min(100, self.health + health_change))
+                self.happiness = max(0, min(100, self.happiness + happiness_change))
+                
+                # Track social media streak
+                if category == 'social':
+                    self.social_media_streak += seconds
+                else:
+                    self.social_media_streak = 0
+    
+    def apply_app_effects(self, state, seconds):
+        """Apply happiness/health gained from seconds spent in an app state"""
+        if state in self.APP_STATE_EFFECTS:
+            happiness_rate, health_rate = self.APP_STATE_EFFECTS[state]
+            checks = seconds / 3
+            with self.state.transaction():
+                self.happiness = min(100, self.happiness + happiness_rate * checks)
+                self.health = min(100, self.health + health_rate * checks)
     
     def update_non_browsing_state(self, app_name):
         """Update state for non-browser applications"""
-        # Track time for previous state
-        self.track_time_spent()
-        
-        # Reset website tracking
-        self.current_website = None
-        self.current_website_category = None
-        self.social_media_streak = 0
-        
-        old_state = self.current_state
         new_state = 'idle'
         
         if 'slack' in app_name:
             new_state = 'working'
-            self.happiness = min(100, self.happiness + 1)
-            self.health = min(100, self.health + 0.5)
             
         elif any(code_app in app_name for code_app in ['code', 'xcode', 'terminal', 'iterm']):
             new_state = 'coding'
-            self.happiness = min(100, self.happiness + 2)
-            self.health = min(100, self.health + 1)
             
         elif 'figma' in app_name:
             new_state = 'designing'
-            self.happiness = min(100, self.happiness + 2)
-            self.health = min(100, self.health + 0.5)
             
         elif 'game' in app_name:
             new_state = 'gaming'
-            self.happiness = min(100, self.happiness + 3)
         
-        self.current_state = new_state
+        # One transaction, so a feed or reset can't land between tracking the last
+        # stretch and switching to the new app
+        with self.state.transaction():
+            # Track time for the previous state and website, and apply their effects for it
+            state_seconds, website_seconds = self.track_time_spent()
+            self.apply_app_effects(self.current_state, state_seconds)
+            self.apply_website_effects(self.current_website_category, website_seconds)
+            
+            # Reset website tracking
+            self.current_website = None
+            self.current_website_category = None
+            self.social_media_streak = 0
+            
+            old_state = self.current_state
+            self.current_state = new_state
+            health, happiness = self.health, self.happiness
         
         # Update display
         self.update_all_menu_items()
@@ -708,71 +701,84 @@ class WebsiteTrackingDino(rumps.App):
             status = self.get_current_status()
             self.send_native_notification(
                 f"🔄 App Change: {self.states[new_state]}",
-                f"Health: {self.health}% | Happiness: {self.happiness}%",
+                f"Health: {health:.0f}% | Happiness: {happiness:.0f}%",
                 status,
                 sound=False
             )
         
-        self.save_data()
+        self.saver.mark_dirty()
     
     def track_time_spent(self):
-        """Track time spent in current state and website"""
-        if hasattr(self, 'state_start_time'):
-            time_delta = (datetime.now() - self.state_start_time).total_seconds()
-            if self.current_state in self.time_spent:
-                self.time_spent[self.current_state] += time_delta
-        
-        # Track website-specific time
-        if hasattr(self, 'website_start_time') and self.current_website:
-            try:
-                website_delta = (datetime.now() - self.website_start_time).total_seconds()
-                domain = urlparse(self.current_website).netloc.replace('www.', '')
-                if domain in self.website_time:
-                    self.website_time[domain] += website_delta
-                
-                # Update daily websites duration
-                if self.daily_websites:
-                    self.daily_websites[-1]['duration'] += website_delta
+        """Track time spent in current state and website; returns the seconds tracked on each
+
+        (state_seconds, website_seconds), so effects can be scaled by time
+        actually spent rather than applied once per sample.
+        """
+        with self.state.transaction():
+            time_delta = 0
+            website_delta = 0
+            if hasattr(self, 'state_start_time'):
+                time_delta = (datetime.now() - self.state_start_time).total_seconds()
+                if self.current_state in self.time_spent:
+                    self.time_spent[self.current_state] += time_delta
+                    self.store.add_state_time(self.store_app, self.current_state, time_delta)
+            
+            # Track website-specific time
+            if hasattr(self, 'website_start_time') and self.current_website:
+                try:
+                    website_delta = (datetime.now() - self.website_start_time).total_seconds()
+                    domain = urlparse(self.current_website).netloc.replace('www.', '')
+                    if domain in self.website_time:
+                        self.website_time[domain] += website_delta
+                        self.store.add_domain_time(self.store_app, domain, website_delta)
                     
-            except Exception as e:
-                print(f"Error tracking website time: {e}")
-        
-        # Reset timers
-        self.state_start_time = datetime.now()
-        self.website_start_time = datetime.now()
+                    # Update daily websites duration
+                    if self.daily_websites:
+                        self.daily_websites[-1]['duration'] += website_delta
+                        latest = self.daily_websites[-1]
+                        self.store.add_visit_time(self.store_app, latest['id'], latest['category'], website_delta)
+                        
+                except Exception as e:
+                    print(f"Error tracking website time: {e}")
+            
+            # Reset timers
+            self.state_start_time = datetime.now()
+            self.website_start_time = datetime.now()
+        return time_delta, website_delta
     
     # ... (keeping all the existing menu callback methods: feed, pet, take_break, reset, etc.)
     
     @rumps.clicked("Feed 🍖")
     def feed(self, sender):
-        old_state = self.current_state
-        self.current_state = 'eating'
-        self.happiness = min(100, self.happiness + 20)
-        health_boost = min(100, self.health + 10)
-        old_health = self.health
-        self.health = health_boost
+        with self.state.transaction():
+            old_state = self.current_state
+            self.current_state = 'eating'
+            self.happiness = min(100, self.happiness + 20)
+            health_boost = min(100, self.health + 10)
+            old_health = self.health
+            self.health = health_boost
         
         self.update_all_menu_items()
         
         self.send_native_notification(
             "🍖 Dino Fed Successfully!",
-            f"Health: {old_health}% → {self.health}% | Happiness: +20",
+            f"Health: {old_health:.0f}% → {health_boost:.0f}% | Happiness: +20",
             "Your dino is much happier and healthier now!"
         )
         
         def reset_after_eating():
-            time.sleep(3)
             self.current_state = old_state
             self.update_all_menu_items()
         
-        threading.Thread(target=reset_after_eating, daemon=True).start()
+        self.scheduler.after(3, reset_after_eating)
     
     @rumps.clicked("Pet 🫳") 
     def pet(self, sender):
-        old_state = self.current_state
-        self.current_state = 'excited'
-        self.happiness = min(100, self.happiness + 15)
-        self.health = min(100, self.health + 5)
+        with self.state.transaction():
+            old_state = self.current_state
+            self.current_state = 'excited'
+            self.happiness = min(100, self.happiness + 15)
+            self.health = min(100, self.health + 5)
         
         self.update_all_menu_items()
         
@@ -783,49 +789,54 @@ class WebsiteTrackingDino(rumps.App):
         )
         
         def reset_after_petting():
-            time.sleep(2)
             self.current_state = old_state
             self.update_all_menu_items()
         
-        threading.Thread(target=reset_after_petting, daemon=True).start()
+        self.scheduler.after(2, reset_after_petting)
     
     @rumps.clicked("Take Break 🧘")
     def take_break(self, sender):
-        old_health = self.health
-        old_energy = self.energy
+        with self.state.transaction():
+            old_health = self.health
+            old_energy = self.energy
+            
+            self.health = min(100, self.health + 15)
+            self.energy = min(100, self.energy + 20)
+            self.happiness = min(100, self.happiness + 10)
+            self.social_media_streak = 0
+            health = self.health
         
-        self.health = min(100, self.health + 15)
-        self.energy = min(100, self.energy + 20)
-        self.happiness = min(100, self.happiness + 10)
-        self.social_media_streak = 0
         self.last_break_reminder = datetime.now()
         
         self.update_all_menu_items()
         
         self.send_native_notification(
             "🧘 Refreshing Break Taken!",
-            f"Health: +{self.health - old_health} | Social media streak reset",
+            f"Health: +{health - old_health} | Social media streak reset",
             "Excellent self-care! Your dino feels completely refreshed!"
         )
     
     @rumps.clicked("Reset Day")
     def reset(self, sender):
-        self.current_state = 'idle'
-        self.current_website = None
-        self.current_website_category = None
-        self.happiness = 50
-        self.energy = 50
-        self.health = 100
-        self.social_media_streak = 0
-        self.session_start = datetime.now()
-        
-        # Save old data for report
-        old_website_time = self.website_time.copy()
-        
-        # Reset tracking
-        self.time_spent = {key: 0 for key in self.time_spent}
-        self.website_time = {}
-        self.daily_websites = []
+        # One transaction, so time tracked meanwhile isn't added to the totals being cleared
+        with self.state.transaction():
+            self.current_state = 'idle'
+            self.current_website = None
+            self.current_website_category = None
+            self.happiness = 50
+            self.energy = 50
+            self.health = 100
+            self.social_media_streak = 0
+            self.session_start = datetime.now()
+            
+            # Save old data for report
+            old_website_time = self.website_time.copy()
+            
+            # Reset tracking
+            self.time_spent = {key: 0 for key in self.time_spent}
+            self.website_time = {}
+            self.daily_websites.clear()
+            self.store.reset_tracking(self.store_app)
         
         self.update_all_menu_items()
         
@@ -847,56 +858,48 @@ class WebsiteTrackingDino(rumps.App):
     def save_data(self):
         """Enhanced save with website data"""
         try:
-            data = {
-                'happiness': self.happiness,
-                'energy': self.energy, 
-                'health': self.health,
-                'time_spent': self.time_spent,
-                'website_time': self.website_time,
-                'daily_websites': self.daily_websites,
-                'session_start': self.session_start.isoformat(),
-                'social_media_streak': self.social_media_streak,
-                'notifications_enabled': self.notifications_enabled
-            }
-            
-            save_dir = os.path.expanduser("~/.dino_tamagotchi")
-            os.makedirs(save_dir, exist_ok=True)
-            
-            with open(os.path.join(save_dir, "dino_website_data.json"), "w") as f:
-                json.dump(data, f)
+            state = self.state.snapshot()
+            data = {field: state[field] for field in
+                    ('happiness', 'energy', 'health', 'social_media_streak')}
+            data['session_start'] = self.session_start.isoformat()
+            data['notifications_enabled'] = self.notifications_enabled
+            
+            # Time totals and visits were recorded as they happened; flush them with the stats
+            self.store.save_state(self.store_app, data)
+            self.store.flush()
         except Exception as e:
             print(f"Error saving data: {e}")
     
     def load_data(self):
         """Enhanced load with website data"""
         try:
-            save_dir = os.path.expanduser("~/.dino_tamagotchi")
-            data_file = os.path.join(save_dir, "dino_website_data.json")
-            
-            if os.path.exists(data_file):
-                with open(data_file, "r") as f:
-                    data = json.load(f)
-                
-                self.happiness = data.get('happiness', 50)
-                self.energy = data.get('energy', 50)
-                self.health = data.get('health', 100)
-                self.time_spent = data.get('time_spent', self.time_spent)
-                self.website_time = data.get('website_time', {})
-                self.daily_websites = data.get('daily_websites', [])
-                self.social_media_streak = data.get('social_media_streak', 0)
-                self.notifications_enabled = data.get('notifications_enabled', True)
-                
-                try:
-                    saved_start = datetime.fromisoformat(data.get('session_start', datetime.now().isoformat()))
-                    if (datetime.now() - saved_start).days > 0:
-                        # New day - reset daily data but keep website history
-                        self.time_spent = {key: 0 for key in self.time_spent}
-                        self.daily_websites = []
+            data = self.store.load_state(self.store_app)
+            
+            with self.state.transaction():
+                if data is not None:
+                    self.happiness = data.get('happiness', 50)
+                    self.energy = data.get('energy', 50)
+                    self.health = data.get('health', 100)
+                    self.social_media_streak = data.get('social_media_streak', 0)
+                    self.notifications_enabled = data.get('notifications_enabled', True)
+                    
+                    try:
+                        saved_start = datetime.fromisoformat(data.get('session_start', datetime.now().isoformat()))
+                        if (datetime.now() - saved_start).days > 0:
+                            # New day - daily totals are kept per day, so just start a fresh session
+                            self.session_start = datetime.now()
+                        else:
+                            self.session_start = saved_start
+                    except:
                         self.session_start = datetime.now()
-                    else:
-                        self.session_start = saved_start
-                except:
-                    self.session_start = datetime.now()
+                
+                # Today's totals and visits come straight from their tables
+                self.time_spent.update(self.store.state_totals(self.store_app))
+                self.website_time = dict(self.store.domain_totals(self.store_app))
+                self.daily_websites = deque(self.store.visits(self.store_app, limit=RECENT_VISITS),
+                                            maxlen=RECENT_VISITS)
+            
+            self.store.prune_visits(self.store_app)
                     
         except Exception as e:
             print(f"Error loading data: {e}")